@@ -0,0 +1,146 @@
+"""
+Cold start benchmark of the aos-mcp stdio server, as started by mcp clients for each session.
+
+Starts `python -m ale_aos_mcp --transport stdio` several times and measures, from the process
+start, the time to the `initialize` answer and to the first `tools/list` answer. Runs with the
+tool registry built beforehand (warm) and without registry (the tools file is parsed on each
+start), and saves the results as json so that a later run can be compared with `--compare`.
+
+    python bench/bench_startup.py --runs 20 --output before.json
+    python bench/bench_startup.py --runs 20 --compare before.json
+    python bench/bench_startup.py --import-time
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+PROTOCOL_VERSION = "2025-06-18"
+
+
+def send(process: subprocess.Popen, message: dict):
+    process.stdin.write(json.dumps(message) + "\n")
+    process.stdin.flush()
+
+
+def read_answer(process: subprocess.Popen, request_id: int) -> dict:
+    """Next json-rpc answer to request_id, notifications and other lines are skipped."""
+    while True:
+        line = process.stdout.readline()
+        if not line:
+            raise RuntimeError(f"aos-mcp exited with {process.wait()} before answering request {request_id}")
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        if message.get("id") == request_id:
+            return message
+
+
+def start_once(command: list[str], env: dict) -> dict:
+    """Times of one server start in seconds: initialize answer, tools/list answer, and the number of tools."""
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                               text=True, env=env)
+    try:
+        send(process, {"jsonrpc": "2.0", "id": 1, "method": "initialize",
+                       "params": {"protocolVersion": PROTOCOL_VERSION, "capabilities": {},
+                                  "clientInfo": {"name": "bench_startup", "version": "0"}}})
+        read_answer(process, 1)
+        initialized = time.perf_counter() - start
+        send(process, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+        send(process, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+        tools = read_answer(process, 2)["result"]["tools"]
+        return {"initialize": initialized, "tools_list": time.perf_counter() - start, "tools": len(tools)}
+    finally:
+        process.stdin.close()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def summarize(runs: list[dict]) -> dict:
+    result = {"runs": len(runs), "tools": runs[0]["tools"] if runs else 0}
+    for name in ("initialize", "tools_list"):
+        values = sorted(run[name] for run in runs)
+        result[f"{name}_min_ms"] = round(values[0] * 1000, 1)
+        result[f"{name}_p50_ms"] = round(statistics.median(values) * 1000, 1)
+        result[f"{name}_max_ms"] = round(values[-1] * 1000, 1)
+    return result
+
+
+def bench(args, tools_cache_dir: str) -> dict:
+    command = [sys.executable, "-m", "ale_aos_mcp", "--transport", "stdio", "--log-level", "WARNING",
+               "--tools-cache-dir", tools_cache_dir]
+    if args.aos_tools_file:
+        command += ["--aos-tools-file", args.aos_tools_file]
+    env = dict(os.environ)
+    if tools_cache_dir:
+        # build the registry first, as the first session after a tools file change does
+        subprocess.run(command + ["--build-tools-cache"], env=env, check=True)
+    start_once(command, env) # warm up the os file cache
+    return summarize([start_once(command, env) for _ in range(args.runs)])
+
+
+def import_time(top: int):
+    """Slowest imports of the server module (cumulative), from python -X importtime."""
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", "import ale_aos_mcp.server"],
+                             capture_output=True, text=True, check=True)
+    imports = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        imports.append((int(cumulative_us), int(self_us), name.strip()))
+    print(f"{'cumulative ms':>14}{'self ms':>9}  module")
+    for cumulative_us, self_us, name in sorted(imports, reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>14.1f}{self_us / 1000:>9.1f}  {name}")
+
+
+def print_report(results: dict, baseline: Optional[dict]):
+    print(f"{'registry':<10}{'runs':>5}{'tools':>6}{'init p50':>10}{'list min':>10}{'list p50':>10}{'list max':>10}  (ms)")
+    for mode, r in results.items():
+        print(f"{mode:<10}{r['runs']:>5}{r['tools']:>6}{r['initialize_p50_ms']:>10}{r['tools_list_min_ms']:>10}"
+              f"{r['tools_list_p50_ms']:>10}{r['tools_list_max_ms']:>10}")
+        previous = (baseline or {}).get(mode)
+        if previous:
+            deltas = [f"{name} {(r[name] - previous[name]) / previous[name] * 100:+.1f}%"
+                      for name in ("initialize_p50_ms", "tools_list_p50_ms") if previous.get(name)]
+            print(f"{'':<10}vs baseline: {', '.join(deltas)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="aos-mcp stdio cold start benchmark")
+    parser.add_argument("--runs", type=int, default=10, help="server starts per mode")
+    parser.add_argument("--aos-tools-file", type=str, default="", help="mcp tools file, the packaged one if not set")
+    parser.add_argument("--import-time", action="store_true", help="only print the slowest imports of the server module")
+    parser.add_argument("--top", type=int, default=20, help="imports printed with --import-time")
+    parser.add_argument("--output", type=str, help="json file receiving the results")
+    parser.add_argument("--compare", type=str, help="json results of a previous run to compare with")
+    args = parser.parse_args()
+    if args.import_time:
+        import_time(args.top)
+        return
+
+    with tempfile.TemporaryDirectory() as tools_cache_dir:
+        results = {"warm": bench(args, tools_cache_dir), "none": bench(args, "")}
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"parameters": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger("aos-mcp")
+
+# aos_ssh answers 429 when a switch queue is full and 503 when a switch is busy, the command didn't run
+RETRY_STATUS_CODES = {429, 503}
+# Errors before the request was sent: retried, and failed over by the router. Other transport errors
+# (read timeout of a slow command...) are not, the command may be running on the switch.
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+class AosSshClient:
+    """
+    Shared asynchronous client of the aos_ssh REST api.
+    Connections are kept alive in a pool so concurrent tool calls don't block each other
+    and don't open a new TCP connection each time. Transport errors and retryable status
+    codes are retried with an exponential backoff. Requests are not idempotent (commands run on
+    switches), so only requests which didn't reach aos_ssh or which it refused are retried.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 60, connect_timeout: float = 5, retries: int = 2,
+                 max_connections: int = 100):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.retries = retries
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                r = await self.client.request(method, path, **kwargs)
+                if r.status_code not in RETRY_STATUS_CODES or attempt >= self.retries:
+                    return r
+                delay = float(r.headers.get("Retry-After", 0.5 * 2 ** attempt))
+                logger.info(f"{method} {path} returned {r.status_code}, retrying in {delay}s")
+            except CONNECT_ERRORS as e:
+                if attempt >= self.retries:
+                    raise
+                delay = 0.5 * 2 ** attempt
+                logger.info(f"{method} {path} failed: {e!r}, retrying in {delay}s")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    def stream(self, method: str, path: str, **kwargs):
+        """Streamed request (async context manager), not retried as output may already be consumed."""
+        return self.client.stream(method, path, **kwargs)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
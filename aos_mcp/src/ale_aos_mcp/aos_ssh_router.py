@@ -0,0 +1,137 @@
+import asyncio
+import bisect
+import hashlib
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import httpx
+
+from .aos_ssh_client import CONNECT_ERRORS, AosSshClient
+
+logger = logging.getLogger("aos-mcp")
+
+
+def ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class AosSshRouter:
+    """
+    Routes aos_ssh requests over several aos_ssh nodes.
+    Requests for a switch go to its node on a consistent hash ring, so each node keeps the
+    sessions of its share of the switches, and adding or removing a node only moves the
+    switches of that node. Nodes are health checked in the background, requests skip
+    unhealthy nodes and fail over to the next node of the ring when a node can't be connected.
+    Other errors (read timeout of a slow command) don't fail over, the command may be running.
+    """
+
+    def __init__(self, urls: list[str], health_interval: float = 10, virtual_nodes: int = 100, **client_options):
+        self.nodes = [AosSshClient(url, **client_options) for url in urls]
+        self.healthy = [True] * len(self.nodes)
+        self.health_interval = health_interval
+        self.ring : list[tuple[int, int]] = sorted((ring_hash(f"{node.base_url}#{i}"), index)
+                                                   for index, node in enumerate(self.nodes) for i in range(virtual_nodes))
+        self._ring_keys = [key for key, _ in self.ring]
+        self._health_task : Optional[asyncio.Task] = None
+
+    def nodes_for(self, host: Optional[str]) -> list[int]:
+        """Node indexes in failover order for a switch (ring order from its hash), healthy nodes first."""
+        if host is None or len(self.nodes) == 1:
+            order = list(range(len(self.nodes)))
+        else:
+            start = bisect.bisect(self._ring_keys, ring_hash(host))
+            order = []
+            for i in range(len(self.ring)):
+                index = self.ring[(start + i) % len(self.ring)][1]
+                if index not in order:
+                    order.append(index)
+                    if len(order) == len(self.nodes):
+                        break
+        return [index for index in order if self.healthy[index]] + [index for index in order if not self.healthy[index]]
+
+    def node_index(self, r: httpx.Response) -> int:
+        """Index of the node which answered a response."""
+        url = str(r.request.url)
+        return next((index for index, node in enumerate(self.nodes) if url.startswith(node.base_url)), 0)
+
+    async def health_check(self, index: int):
+        try:
+            r = await self.nodes[index].client.get("/", timeout=5)
+            healthy = r.status_code == 200
+        except httpx.HTTPError:
+            healthy = False
+        if healthy != self.healthy[index]:
+            logger.warning(f"aos_ssh node {self.nodes[index].base_url} is {'up' if healthy else 'down'}")
+        self.healthy[index] = healthy
+
+    async def health_check_loop(self):
+        while True:
+            await asyncio.gather(*(self.health_check(index) for index in range(len(self.nodes))))
+            await asyncio.sleep(self.health_interval)
+
+    def _start_health_checks(self):
+        if self._health_task is None and len(self.nodes) > 1 and self.health_interval > 0:
+            self._health_task = asyncio.get_running_loop().create_task(self.health_check_loop())
+
+    async def request(self, method: str, path: str, host: Optional[str] = None, **kwargs) -> httpx.Response:
+        """Sends a request to the node of host (any node if not set), failing over to the next nodes."""
+        self._start_health_checks()
+        order = self.nodes_for(host)
+        for position, index in enumerate(order):
+            try:
+                return await self.nodes[index].request(method, path, **kwargs)
+            except CONNECT_ERRORS as e:
+                self.healthy[index] = False
+                if position == len(order) - 1:
+                    raise
+                logger.warning(f"aos_ssh node {self.nodes[index].base_url} failed: {e!r}, failing over to the next node")
+
+    async def get(self, path: str, host: Optional[str] = None, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, host, **kwargs)
+
+    async def post(self, path: str, host: Optional[str] = None, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, host, **kwargs)
+
+    async def get_node(self, index: int, path: str, **kwargs) -> httpx.Response:
+        """GET on one node, for requests tied to a node (command output pages)."""
+        return await self.nodes[index].get(path, **kwargs)
+
+    async def get_all(self, path: str, **kwargs) -> list[httpx.Response]:
+        """GET on every healthy node (all nodes if none is healthy), nodes failing with transport errors are skipped,
+        only unreachable ones are marked unhealthy."""
+        self._start_health_checks()
+        indexes = [index for index in range(len(self.nodes)) if self.healthy[index]] or list(range(len(self.nodes)))
+        responses = await asyncio.gather(*(self.nodes[index].get(path, **kwargs) for index in indexes), return_exceptions=True)
+        for index, r in zip(indexes, responses):
+            if isinstance(r, CONNECT_ERRORS):
+                self.healthy[index] = False
+            elif isinstance(r, BaseException) and not isinstance(r, httpx.TransportError):
+                raise r
+        results = [r for r in responses if isinstance(r, httpx.Response)]
+        if not results:
+            raise next(r for r in responses if isinstance(r, BaseException))
+        return results
+
+    @asynccontextmanager
+    async def stream(self, method: str, path: str, host: Optional[str] = None, **kwargs):
+        """Streamed request to the node of host, failing over only before the stream is opened."""
+        self._start_health_checks()
+        order = self.nodes_for(host)
+        for position, index in enumerate(order):
+            try:
+                async with self.nodes[index].stream(method, path, **kwargs) as r:
+                    yield r
+                return
+            except CONNECT_ERRORS as e:
+                self.healthy[index] = False
+                if position == len(order) - 1:
+                    raise
+                logger.warning(f"aos_ssh node {self.nodes[index].base_url} failed: {e!r}, failing over to the next node")
+
+    async def aclose(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for node in self.nodes:
+            await node.aclose()
@@ -0,0 +1,61 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+class ResultCache:
+    """
+    TTL cache of tool results keyed by tool name and arguments, shared by all mcp sessions.
+    Identical concurrent calls share one upstream request, entries are evicted in least
+    recently used order above max_entries. A ttl of 0 disables caching but calls are still coalesced.
+    """
+
+    def __init__(self, ttl: float = 10, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries : OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._in_flight : dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def key(tool: str, arguments: dict) -> str:
+        return json.dumps([tool, arguments], sort_keys=True, default=str)
+
+    async def get_or_call(self, tool: str, arguments: dict, call: Callable[[], Awaitable[Any]], fresh: bool = False,
+                          cacheable: Callable[[Any], bool] = lambda result: True) -> Any:
+        """
+        Returns the cached result of a tool call, or awaits call() once for all identical concurrent calls.
+        With fresh, the cached result is ignored and replaced by the new one.
+        """
+        key = self.key(tool, arguments)
+        now = time.monotonic()
+        if not fresh:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._call(key, call, cacheable))
+            self._in_flight[key] = task
+        # shield: a cancelled tool call doesn't cancel the request shared with other calls
+        return await asyncio.shield(task)
+
+    async def _call(self, key: str, call: Callable[[], Awaitable[Any]], cacheable: Callable[[Any], bool]) -> Any:
+        try:
+            result = await call()
+            if self.ttl > 0 and cacheable(result):
+                self._entries[key] = (time.monotonic() + self.ttl, result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return result
+        finally:
+            del self._in_flight[key]
@@ -1,37 +1,49 @@
 #from mcp import FastMCP
 from dataclasses import dataclass
+from typing import Optional
 from mcp.server.fastmcp import FastMCP, Context
 import argparse
-import requests
-import yaml
+import json
 import logging
 from pydantic import Field
-from importlib.resources import files
 import os 
 from pydantic import BaseModel, Field
+from .aos_ssh_router import AosSshRouter
+from .result_cache import ResultCache
+from .tool_registry import DEFAULT_CACHE_DIR, load_tools
 
 logging.basicConfig(level=logging.INFO)
 
 logger = logging.getLogger("aos-mcp")
 parser = argparse.ArgumentParser(description='AOS MCP Server Options')
-parser.add_argument('--aos-ssh-url', type=str, default=os.environ.get('ALE_AOS_MCP_SSH_URL',"http://localhost:8110"), help='AOS Server URL')
+parser.add_argument('--aos-ssh-url', type=str, default=os.environ.get('ALE_AOS_MCP_SSH_URL',"http://localhost:8110"), help='AOS Server URL, or comma separated URLs of several aos ssh servers')
 parser.add_argument('--transport', type=str, default=os.environ.get('ALE_AOS_MCP_TRANSPORT',"stdio"), help='transport method (stdio, streamable-http, sse, etc.)')
 parser.add_argument('--port', type=int, default=os.environ.get('ALE_AOS_MCP_PORT',8000), help='port for AOS MCP server')
 parser.add_argument('--aos-tools-file', type=str, default=os.environ.get('ALE_AOS_MCP_TOOLS_FILE',""), help='mcp Tools file')
+parser.add_argument('--aos-ssh-timeout', type=float, default=os.environ.get('ALE_AOS_MCP_SSH_TIMEOUT',60), help='aos ssh server request timeout in seconds')
+parser.add_argument('--aos-ssh-retries', type=int, default=os.environ.get('ALE_AOS_MCP_SSH_RETRIES',2), help='retries of failed aos ssh server requests')
+parser.add_argument('--aos-ssh-max-connections', type=int, default=os.environ.get('ALE_AOS_MCP_SSH_MAX_CONNECTIONS',100), help='max pooled connections to aos ssh server')
+parser.add_argument('--aos-ssh-health-interval', type=float, default=os.environ.get('ALE_AOS_MCP_SSH_HEALTH_INTERVAL',10), help='seconds between health checks of the aos ssh servers')
+parser.add_argument('--result-cache-ttl', type=float, default=os.environ.get('ALE_AOS_MCP_RESULT_CACHE_TTL',10), help='seconds tool results are cached, 0 disables the cache')
+parser.add_argument('--result-cache-max-entries', type=int, default=os.environ.get('ALE_AOS_MCP_RESULT_CACHE_MAX_ENTRIES',1024), help='max cached tool results')
+parser.add_argument('--tools-cache-dir', type=str, default=os.environ.get('ALE_AOS_MCP_TOOLS_CACHE_DIR',DEFAULT_CACHE_DIR), help='directory of the tool registry built from the mcp tools file, empty to parse the file on each start')
+parser.add_argument('--build-tools-cache', action='store_true', help='build the tool registry in --tools-cache-dir and exit')
 parser.add_argument('--log-level', type=str, default=os.environ.get('ALE_AOS_MCP_LOG_LEVEL',"INFO"), help='Log level (DEBUG, INFO, WARNING, ERROR, CRITICAL)')
-args = parser.parse_args()
-print(f"Using AOS SSH URL: {args.aos_ssh_url}")
-print(f"Using transport: {args.transport}")
 
+# Options are parsed and clients created by main(), a stdio server is started for each mcp session
+args : Optional[argparse.Namespace] = None
+mcp_tools_file = os.path.join(os.path.dirname(__file__), "data", "mcp_tools.yaml")
 
-resource_path = files('ale_aos_mcp.data')
-mcp_tools_file = resource_path / 'mcp_tools.yaml'
-if args.aos_tools_file:
-	mcp_tools_file = args.aos_tools_file
+mcp = FastMCP("AOS MCP Server",host="0.0.0.0")
+aos_ssh : Optional[AosSshRouter] = None
+result_cache = ResultCache()
 
-print(mcp_tools_file)
+# Description of the fresh parameter of the cached tools
+FRESH_DESCRIPTION = "Bypass the cached result (results are cached a few seconds) and get fresh data from the switch"
 
-mcp = FastMCP("AOS MCP Server",host="0.0.0.0", port=args.port)
+
+def cacheable(result: str) -> bool:
+    return not result.startswith("Error")
 
 
 class UserInfo(BaseModel):
@@ -57,23 +69,75 @@ async def test_elicit(ctx:Context) -> str:
     return   f"Hello {user.name}, you mail is {user.email}"
 
 @mcp.tool()
-def list_devices() -> str:
+async def list_devices(fresh: bool = Field(default=False, description=FRESH_DESCRIPTION)) -> str:
     """list all Alcatel aos switches devices.
     returns:
         str: The unstructured content of the command execution or an error message
     """
-    r = requests.get(f'{args.aos_ssh_url}/devices')
-    print(r.json())
-    if r.status_code == 200:
-        return r.text
-    else:
-        return f"Error executing list_devices: {r.status_code} - {r.text}"
+    return await result_cache.get_or_call("list_devices", {}, get_devices, fresh, cacheable)
+
+
+async def get_devices() -> str:
+    devices = {}
+    for r in await aos_ssh.get_all('/devices'):
+        logger.debug(r.text)
+        if r.status_code != 200:
+            return f"Error executing list_devices: {r.status_code} - {r.text}"
+        for device in r.json():
+            devices.setdefault(device["host"], device)
+    return json.dumps(list(devices.values()))
+
+
+
+# Long running diagnostics streamed line by line as progress notifications
+STREAMED_COMMANDS = ("ping", "traceroute")
 
+async def execute_streamed_command(host: str, command: str, ctx: Context) -> str:
+    """Run a command with /command/stream, relaying each output line as a progress notification.
+    Cancelling the tool call closes the stream, which stops the command on the switch.
+    """
+    lines = []
+    async with aos_ssh.stream("POST", "/command/stream", host=host, json={"host": host, "command": command}) as r:
+        if r.status_code != 200:
+            await r.aread()
+            return f"Error executing command: {r.status_code} - {r.text}"
+        async for data in r.aiter_lines():
+            if not data:
+                continue
+            item = json.loads(data)
+            if "line" in item:
+                lines.append(item["line"])
+                await ctx.report_progress(len(lines), message=item["line"])
+            elif "error" in item:
+                lines.append(f"Error: {item['error']}")
+    return "\n".join(lines).strip() or "No output returned"
+
+
+def format_output(result: dict, node: int = 0) -> str:
+    """stdout of a /command response, followed by how to read the next page when the output is paged.
+    The cursor is prefixed with the index of the aos ssh server holding the output."""
+    if result.get("delta") is not None:
+        if not result["delta"]:
+            return f"No change since {result.get('delta_since')}"
+        return f"Changes since {result.get('delta_since')} (~ changed fields [old->new], - removed, + added lines):\n" + "\n".join(result["delta"])
+    output = result.get("stdout", "No output returned")
+    if result.get("next_cursor"):
+        output += (f"\n[{result.get('total_lines')} lines selected, more lines available: "
+                   f"call read_command_output with cursor \"{node}~{result['next_cursor']}\"]")
+    return output
 
 
 #@mcp.tool()
 async def execute_command(host: str = Field(description="The host of the aos switch, host is the ip address or hostname of the switch"),
-                     command: str = Field(description="The command to execute on the aos switch"), ctx:Context= None) -> str:
+                     command: str = Field(description="The command to execute on the aos switch"),
+                     include: Optional[str] = Field(default=None, description="Only return output lines matching this regex"),
+                     exclude: Optional[str] = Field(default=None, description="Don't return output lines matching this regex"),
+                     line_start: int = Field(default=0, description="Index of the first returned line, after filtering"),
+                     line_end: Optional[int] = Field(default=None, description="Index of the line after the last returned line, after filtering"),
+                     page_size: Optional[int] = Field(default=None, description="Max lines returned, the next lines are read with read_command_output"),
+                     changes_only: bool = Field(default=False, description="Only return the lines changed since the previous call with changes_only, to monitor a switch"),
+                     fresh: bool = Field(default=False, description=FRESH_DESCRIPTION),
+                     ctx:Context= None) -> str:
     """execute a command on an Alcatel AOS switch via its ip address.
        Command list : 
          - `show system`: Displays basic system information for the switch. Information includes a switch name, user-defined system description, system version
@@ -92,21 +156,196 @@ name, administrative contact, location, object ID, up time, and system services.
          - `traceroute <addr>`: Traces the route to a destination IP address or hostname. This command sends a series of ICMP echo requests to the destination and then waits for replies. The command displays the IP address of each hop along the route to the destination. <addr> is hostname or IP address parameter to traceroute.
          - `show interfaces <port>`: Displays the switch interfaces. Optional parameter <port> is the port to display, in format chassis/slot/port.
 
+    For large outputs (routing or mac tables), use include/exclude regexes, a line range or page_size
+    to only get the needed lines. When polling a command to watch a problem, set changes_only to get
+    only what changed since the previous poll (the full output is returned on the first call).
     args:
         host (str): The host of the aos switch, host is the ip address or hostname of the switch
         command (str): The command to execute on the aos switch
+        include (str): Only return output lines matching this regex
+        exclude (str): Don't return output lines matching this regex
+        line_start (int): Index of the first returned line, after filtering
+        line_end (int): Index of the line after the last returned line, after filtering
+        page_size (int): Max lines returned, the next lines are read with read_command_output
+        changes_only (bool): Only return the lines changed since the previous call with changes_only
+        fresh (bool): Bypass the cached result of a same call
     returns:
         str: The unstructured content of the command execution or an error message
     """
     logger.info(f"Executing command: {command} on device with host: {host}")
-    r = requests.post(f'{args.aos_ssh_url}/command', json={"host": host, "command": command})
-    logger.debug(r.json())
+    if ctx is not None and command.strip().startswith(STREAMED_COMMANDS):
+        return await execute_streamed_command(host, command, ctx)
+    request = {"host": host, "command": command}
+    selection = {"include": include, "exclude": exclude, "line_end": line_end, "page_size": page_size}
+    request.update({name: value for name, value in selection.items() if value is not None})
+    if line_start:
+        request["line_start"] = line_start
+    if changes_only:
+        request["since"] = "last"
+    if changes_only or command.strip().startswith(STREAMED_COMMANDS):
+        # each delta call moves the reference output, and diagnostics are live: never cached nor shared
+        return await post_command(request)
+    return await result_cache.get_or_call("execute_command", request, lambda: post_command(request), fresh, cacheable)
+
+
+async def post_command(request: dict) -> str:
+    r = await aos_ssh.post('/command', host=request["host"], json=request)
+    logger.debug(r.text)
     if r.status_code == 200:
-        return r.json().get("stdout", "No output returned")
+        return format_output(r.json(), aos_ssh.node_index(r))
     else:
         return f"Error executing command: {r.status_code} - {r.text}"
 
 
+@mcp.tool()
+async def read_command_output(cursor: str = Field(description="Cursor returned with the previous page of the command output")) -> str:
+    """Read the next page of a command output paged by execute_aos_comnand (page_size), outputs are kept a few minutes.
+    returns:
+        str: The next lines of the command output or an error message
+    """
+    node, _, cursor = cursor.rpartition("~")
+    if not node.isdigit() or int(node) >= len(aos_ssh.nodes):
+        return "Error reading command output: invalid cursor"
+    r = await aos_ssh.get_node(int(node), f'/command/pages/{cursor}')
+    if r.status_code == 200:
+        return format_output(r.json(), int(node))
+    else:
+        return f"Error reading command output: {r.status_code} - {r.text}"
+
+
+@mcp.tool()
+async def execute_aos_commands(host: str = Field(description="The host of the aos switch, host is the ip address or hostname of the switch"),
+                         commands: list[str] = Field(description="Ordered list of commands to execute on the aos switch"),
+                         fresh: bool = Field(default=False, description=FRESH_DESCRIPTION)) -> str:
+    """execute several commands in a row on one Alcatel AOS switch via its hostname or ip address.
+       Prefer this tool to several calls when related commands are needed on a same switch (for example
+       `show system`, `show chassis`, `show hardware-info`, `show powersupply`).
+       Each command must be one of the commands allowed by the execute_aos_comnand tool.
+    args:
+        host (str): The hostname or IP address of the aos switch
+        commands (list[str]): The ordered commands to execute on the aos switch
+        fresh (bool): Bypass the cached result of a same call
+    returns:
+        str: json with the stdout, stderr and duration_ms of each command, or an error message
+    """
+    logger.info(f"Executing commands: {commands} on device with host: {host}")
+    request = {"host": host, "commands": commands}
+    return await result_cache.get_or_call("execute_aos_commands", request, lambda: post_pipeline(request), fresh, cacheable)
+
+
+async def post_pipeline(request: dict) -> str:
+    r = await aos_ssh.post('/commands/pipeline', host=request["host"], json=request)
+    if r.status_code == 200:
+        return r.text
+    else:
+        return f"Error executing commands: {r.status_code} - {r.text}"
+
+
+async def execute_structured_command(host: str, command: str, fresh: bool = False) -> str:
+    """Run a command with structured output, aos_ssh returns raw output when the command has no parser."""
+    return await result_cache.get_or_call("execute_structured_command", {"host": host, "command": command},
+                                          lambda: post_structured_command(host, command), fresh, cacheable)
+
+
+async def post_structured_command(host: str, command: str) -> str:
+    logger.info(f"Executing structured command: {command} on device with host: {host}")
+    r = await aos_ssh.post('/command', host=host, json={"host": host, "command": command, "format": "structured"})
+    if r.status_code != 200:
+        return f"Error executing command: {r.status_code} - {r.text}"
+    result = r.json()
+    if result.get("format") == "structured":
+        return json.dumps(result.get("structured"), separators=(",", ":"))
+    return result.get("stdout", "No output returned")
+
+
+@mcp.tool()
+async def show_ip_routes(host: str = Field(description="The hostname or IP address of the aos switch"),
+                         fresh: bool = Field(default=False, description=FRESH_DESCRIPTION)) -> str:
+    """Displays the IP routing table of an Alcatel AOS switch.
+    returns:
+        str: json table {"columns": [...], "rows": [[...]], "summary": [...]} or an error message
+    """
+    return await execute_structured_command(host, "show ip routes", fresh)
+
+
+@mcp.tool()
+async def show_vlan(host: str = Field(description="The hostname or IP address of the aos switch"),
+                    vlan_id: Optional[int] = Field(default=None, description="VLAN id, all vlans if not set"),
+                    fresh: bool = Field(default=False, description=FRESH_DESCRIPTION)) -> str:
+    """Displays VLAN information of an Alcatel AOS switch, for one VLAN or all VLANs.
+    returns:
+        str: json table {"columns": [...], "rows": [[...]], "summary": [...]} or an error message
+    """
+    return await execute_structured_command(host, "show vlan" if vlan_id is None else f"show vlan {vlan_id}", fresh)
+
+
+@mcp.tool()
+async def show_vlan_members(host: str = Field(description="The hostname or IP address of the aos switch"),
+                            vlan_id: Optional[int] = Field(default=None, description="VLAN id, all vlans if not set"),
+                            fresh: bool = Field(default=False, description=FRESH_DESCRIPTION)) -> str:
+    """Displays VLAN port associations (VPAs) of an Alcatel AOS switch, for one VLAN or all VLANs.
+    returns:
+        str: json table {"columns": [...], "rows": [[...]], "summary": [...]} or an error message
+    """
+    return await execute_structured_command(host, "show vlan members" if vlan_id is None else f"show vlan {vlan_id} members", fresh)
+
+
+@mcp.tool()
+async def show_interfaces(host: str = Field(description="The hostname or IP address of the aos switch"),
+                          port: Optional[str] = Field(default=None, description="Port in format chassis/slot/port, all ports if not set"),
+                          fresh: bool = Field(default=False, description=FRESH_DESCRIPTION)) -> str:
+    """Displays the interfaces status and counters of an Alcatel AOS switch, for one port or all ports.
+    returns:
+        str: json list with one object per port or an error message
+    """
+    return await execute_structured_command(host, "show interfaces" if port is None else f"show interfaces {port}", fresh)
+
+
+@mcp.tool()
+async def query_snapshots(command: Optional[str] = Field(default=None, description="Collected command, for example `show system`, all collected commands if not set"),
+                          host: Optional[str] = Field(default=None, description="The hostname or IP address of one aos switch"),
+                          tags: Optional[list[str]] = Field(default=None, description="Switches having at least one of these tags"),
+                          include: Optional[str] = Field(default=None, description="Only return output lines matching this regex, and switches having such lines")) -> str:
+    """Query the last outputs collected periodically from the switches, without connecting to them.
+       Prefer this tool to execute_aos_comnand for fleet wide questions that don't need live data
+       (for example switches running a firmware version, failing power supplies).
+    returns:
+        str: json list of {host, command, collected_at, stdout, stderr, error} or an error message
+    """
+    params = {name: value for name, value in {"command": command, "host": host, "tags": tags, "include": include}.items() if value is not None}
+    # Each aos ssh server may have collected snapshots, the last one of each host and command is kept
+    snapshots = {}
+    for r in await aos_ssh.get_all('/snapshots/latest', params=params):
+        if r.status_code == 404 and len(aos_ssh.nodes) > 1:
+            continue # no snapshot database on this server
+        if r.status_code != 200:
+            return f"Error querying snapshots: {r.status_code} - {r.text}"
+        for snapshot in r.json():
+            key = (snapshot["host"], snapshot["command"])
+            if key not in snapshots or snapshot["collected_at"] > snapshots[key]["collected_at"]:
+                snapshots[key] = snapshot
+    return json.dumps(sorted(snapshots.values(), key=lambda snapshot: (snapshot["host"], snapshot["command"])))
+
+
+@mcp.tool()
+async def snapshot_history(host: str = Field(description="The hostname or IP address of the aos switch"),
+                           command: str = Field(description="Collected command, for example `show powersupply`"),
+                           since: Optional[str] = Field(default=None, description="Oldest collection time, ISO 8601 datetime"),
+                           limit: int = Field(default=10, description="Max number of snapshots")) -> str:
+    """Previous collected outputs of a command on a switch, most recent first, to see how it changed over time.
+    returns:
+        str: json list of {host, command, collected_at, stdout, stderr, error} or an error message
+    """
+    params = {"host": host, "command": command, "limit": limit}
+    if since is not None:
+        params["since"] = since
+    r = await aos_ssh.get('/snapshots/history', host=host, params=params)
+    if r.status_code == 200:
+        return r.text
+    else:
+        return f"Error reading snapshot history: {r.status_code} - {r.text}"
+
+
 @mcp.prompt()
 async def aos_system_hardware_info(switch_host: str) -> str:
     return f"Display system information and hardware information of switch : {switch_host}"
@@ -120,27 +359,40 @@ def aos_hello(name: str) -> str:
     return f"Hello from aos mcp server, {name}!"
 
 def load_mcp_tools():
-    with open(mcp_tools_file) as f:
-        try:
-            logger.info("Loading MCP tools from YAML file...")
-            mcp_tools = yaml.safe_load(f)
-            for tool in mcp_tools.get("tools", []):
-                name = tool.get("name")
-                title = tool.get("title","")
-                description = tool.get("description", "")
-                if name:
-                    logger.info(f"Registering tool: {name} - {title}")
-                    mcp.add_tool(execute_command, name=name, title=title, description=description)
-                else:
-                    logger.error(f"Skipping tool with missing name : {tool}")
-        except yaml.YAMLError as exc:
-            logger.error(exc)
+    logger.info(f"Loading MCP tools from {mcp_tools_file}...")
+    try:
+        mcp_tools = load_tools(mcp_tools_file, args.tools_cache_dir)
+    except OSError:
+        raise
+    except Exception as exc: # yaml errors, yaml is only imported when the tool registry is rebuilt
+        logger.error(exc)
+        return
+    for tool in mcp_tools:
+        name = tool.get("name")
+        title = tool.get("title","")
+        description = tool.get("description", "")
+        if name:
+            logger.info(f"Registering tool: {name} - {title}")
+            mcp.add_tool(execute_command, name=name, title=title, description=description)
+        else:
+            logger.error(f"Skipping tool with missing name : {tool}")
 
 def main():
+    global args, mcp_tools_file, aos_ssh, result_cache
+    args = parser.parse_args()
     logger.setLevel(args.log_level.upper())
-    print(logger.getEffectiveLevel())
+    if args.aos_tools_file:
+        mcp_tools_file = args.aos_tools_file
+    if args.build_tools_cache:
+        load_tools(mcp_tools_file, args.tools_cache_dir)
+        return
     logger.info("aos-mcp starting port: %i, transport: %s ...", args.port, args.transport)
     logger.info("aos-ssh-url: %s",args.aos_ssh_url)
+    mcp.settings.port = int(args.port)
+    aos_ssh = AosSshRouter([url.strip() for url in args.aos_ssh_url.split(",") if url.strip()],
+                           health_interval=args.aos_ssh_health_interval, timeout=args.aos_ssh_timeout,
+                           retries=args.aos_ssh_retries, max_connections=args.aos_ssh_max_connections)
+    result_cache = ResultCache(ttl=float(args.result_cache_ttl), max_entries=int(args.result_cache_max_entries))
     load_mcp_tools()
     mcp.run(transport=args.transport)
 
@@ -0,0 +1,65 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger("aos-mcp")
+
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "ale_aos_mcp")
+
+
+def cache_file(tools_file: str, cache_dir: str) -> str:
+    name = hashlib.md5(os.path.abspath(tools_file).encode()).hexdigest()
+    return os.path.join(cache_dir, f"tools-{name}.json")
+
+
+def source_signature(tools_file: str) -> list:
+    stat = os.stat(tools_file)
+    return [os.path.abspath(tools_file), stat.st_mtime_ns, stat.st_size]
+
+
+def parse_tools_file(tools_file: str) -> list[dict]:
+    import yaml # only imported when the registry has to be rebuilt
+    with open(tools_file) as f:
+        return (yaml.safe_load(f) or {}).get("tools", [])
+
+
+def write_registry(path: str, signature: list, tools: list[dict]):
+    """Atomic write, so a concurrently starting server never reads a partial registry."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tools-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump({"source": signature, "tools": tools}, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_tools(tools_file: str, cache_dir: str = "") -> list[dict]:
+    """
+    Tool definitions of the mcp tools file.
+    With a cache_dir, they are read from a json registry built from the yaml file, rebuilt when
+    the file modification time or size changes: a new stdio server per mcp session then neither
+    imports yaml nor parses the file.
+    """
+    if not cache_dir:
+        return parse_tools_file(tools_file)
+    signature = source_signature(tools_file)
+    path = cache_file(tools_file, cache_dir)
+    try:
+        with open(path) as f:
+            registry = json.load(f)
+        if registry.get("source") == signature:
+            return registry["tools"]
+    except (OSError, ValueError):
+        pass
+    tools = parse_tools_file(tools_file)
+    try:
+        write_registry(path, signature, tools)
+        logger.info(f"Tool registry of {tools_file} written to {path}")
+    except OSError as e:
+        logger.warning(f"Failed to write tool registry {path}: {e}")
+    return tools
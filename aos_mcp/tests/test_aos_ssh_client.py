@@ -0,0 +1,72 @@
+import asyncio
+
+import httpx
+import pytest
+
+from ale_aos_mcp import aos_ssh_client
+from ale_aos_mcp.aos_ssh_client import AosSshClient
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(aos_ssh_client.asyncio, "sleep", sleep)
+    return delays
+
+
+def make_client(handler, retries: int = 2) -> AosSshClient:
+    client = AosSshClient("http://aos-ssh", retries=retries)
+    client._client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(handler))
+    return client
+
+
+def failing(errors: list[Exception], response: httpx.Response):
+    """Handler raising the errors in order then answering the response, records the requests."""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if len(requests) <= len(errors):
+            raise errors[len(requests) - 1]
+        return response
+    return handler, requests
+
+
+def test_connect_errors_are_retried(no_backoff):
+    handler, requests = failing([httpx.ConnectError("refused"), httpx.ConnectTimeout("timeout")], httpx.Response(200, json={}))
+    r = asyncio.run(make_client(handler).post("/command", json={"host": "sw1"}))
+    assert r.status_code == 200
+    assert len(requests) == 3
+    assert no_backoff == [0.5, 1.0]
+
+
+def test_read_timeout_is_not_retried():
+    handler, requests = failing([httpx.ReadTimeout("slow command")], httpx.Response(200))
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(make_client(handler).post("/command", json={"host": "sw1"}))
+    assert len(requests) == 1
+
+
+def test_last_connect_error_is_raised():
+    handler, requests = failing([httpx.ConnectError("refused")] * 3, httpx.Response(200))
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(make_client(handler, retries=1).get("/"))
+    assert len(requests) == 2
+
+
+@pytest.mark.parametrize("status_code, attempts", [(429, 2), (503, 2), (500, 1), (404, 1)])
+def test_only_refused_requests_are_retried(no_backoff, status_code, attempts):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(status_code, headers={"Retry-After": "3"})
+
+    r = asyncio.run(make_client(handler, retries=1).post("/command"))
+    assert r.status_code == status_code
+    assert len(requests) == attempts
+    assert no_backoff == [3.0] * (attempts - 1)
@@ -0,0 +1,93 @@
+import asyncio
+from collections import Counter
+
+import httpx
+import pytest
+
+from ale_aos_mcp.aos_ssh_router import AosSshRouter
+
+URLS = ["http://node0", "http://node1", "http://node2"]
+HOSTS = [f"10.0.{i // 256}.{i % 256}" for i in range(1000)]
+
+
+def make_router(urls: list[str], handler=None) -> AosSshRouter:
+    router = AosSshRouter(urls, health_interval=0, retries=0)
+    if handler is not None:
+        for node in router.nodes:
+            node._client = httpx.AsyncClient(base_url=node.base_url, transport=httpx.MockTransport(handler))
+    return router
+
+
+def test_hosts_are_spread_over_the_nodes():
+    router = make_router(URLS)
+    counts = Counter(router.nodes_for(host)[0] for host in HOSTS)
+    assert all(200 < counts[index] < 500 for index in range(3))
+    assert all(sorted(router.nodes_for(host)) == [0, 1, 2] for host in HOSTS[:10])
+
+
+def test_adding_a_node_only_moves_hosts_to_it():
+    before = make_router(URLS)
+    after = make_router(URLS + ["http://node3"])
+    moved = [host for host in HOSTS if before.nodes_for(host)[0] != after.nodes_for(host)[0]]
+    assert all(after.nodes_for(host)[0] == 3 for host in moved)
+    assert 100 < len(moved) < 400
+
+
+def test_unhealthy_nodes_go_last():
+    router = make_router(URLS)
+    first = router.nodes_for("sw1")[0]
+    router.healthy[first] = False
+    assert router.nodes_for("sw1")[-1] == first
+
+
+def node_handler(down: set[str], error=httpx.ConnectError):
+    requests = []
+
+    def handler(request):
+        requests.append(request.url.host)
+        if request.url.host in down:
+            raise error("node down")
+        return httpx.Response(200, json={"node": request.url.host})
+    return handler, requests
+
+
+def test_request_fails_over_when_a_node_cant_be_connected():
+    router = make_router(URLS)
+    first, second = (f"node{index}" for index in router.nodes_for("sw1")[:2])
+    handler, requests = node_handler({first})
+    router = make_router(URLS, handler)
+    r = asyncio.run(router.post("/command", host="sw1"))
+    assert r.json() == {"node": second}
+    assert requests == [first, second]
+    assert router.node_index(r) == int(second[-1])
+    assert not router.healthy[int(first[-1])]
+
+
+def test_request_does_not_fail_over_on_read_timeout():
+    first = f"node{make_router(URLS).nodes_for('sw1')[0]}"
+    handler, requests = node_handler({first}, httpx.ReadTimeout)
+    router = make_router(URLS, handler)
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(router.post("/command", host="sw1"))
+    assert requests == [first]
+    assert all(router.healthy)
+
+
+def test_last_node_error_is_raised():
+    handler, requests = node_handler({"node0", "node1", "node2"})
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(make_router(URLS, handler).post("/command", host="sw1"))
+    assert sorted(requests) == ["node0", "node1", "node2"]
+
+
+def test_get_all_skips_failing_nodes():
+    handler, _ = node_handler({"node1"})
+    router = make_router(URLS, handler)
+    responses = asyncio.run(router.get_all("/devices"))
+    assert sorted(r.json()["node"] for r in responses) == ["node0", "node2"]
+    assert router.healthy == [True, False, True]
+
+    handler, _ = node_handler({"node1"}, httpx.ReadTimeout)
+    router = make_router(URLS, handler)
+    assert len(asyncio.run(router.get_all("/devices"))) == 2
+    assert all(router.healthy)
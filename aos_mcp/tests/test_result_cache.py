@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+import pytest
+
+from ale_aos_mcp.result_cache import ResultCache
+
+
+def counting_call(results: list):
+    async def call():
+        await asyncio.sleep(0.01)
+        results.append(len(results) + 1)
+        return results[-1]
+    return call
+
+
+def test_result_is_cached_until_ttl():
+    async def run():
+        cache, calls = ResultCache(ttl=0.05), []
+        assert await cache.get_or_call("execute_command", {"host": "sw1"}, counting_call(calls)) == 1
+        assert await cache.get_or_call("execute_command", {"host": "sw1"}, counting_call(calls)) == 1
+        assert await cache.get_or_call("execute_command", {"host": "sw2"}, counting_call(calls)) == 2
+        time.sleep(0.06)
+        assert await cache.get_or_call("execute_command", {"host": "sw1"}, counting_call(calls)) == 3
+        assert (cache.hits, cache.misses) == (1, 3)
+    asyncio.run(run())
+
+
+def test_concurrent_identical_calls_share_one_request():
+    async def run():
+        cache, calls = ResultCache(ttl=0), []
+        results = await asyncio.gather(*(cache.get_or_call("list_devices", {}, counting_call(calls)) for _ in range(5)))
+        assert results == [1] * 5
+        assert (cache.misses, cache.coalesced) == (1, 4)
+        assert await cache.get_or_call("list_devices", {}, counting_call(calls)) == 2 # ttl 0: not cached
+    asyncio.run(run())
+
+
+def test_fresh_and_uncacheable_results():
+    async def run():
+        cache, calls = ResultCache(), []
+        await cache.get_or_call("list_devices", {}, counting_call(calls))
+        assert await cache.get_or_call("list_devices", {}, counting_call(calls), fresh=True) == 2
+        assert await cache.get_or_call("list_devices", {}, counting_call(calls)) == 2
+        await cache.get_or_call("execute_command", {}, counting_call(calls), cacheable=lambda result: False)
+        assert await cache.get_or_call("execute_command", {}, counting_call(calls)) == 4
+    asyncio.run(run())
+
+
+def test_error_is_raised_to_every_caller_and_not_cached():
+    async def run():
+        cache = ResultCache()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("aos_ssh failed")
+
+        results = await asyncio.gather(*(cache.get_or_call("list_devices", {}, fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert await cache.get_or_call("list_devices", {}, counting_call([])) == 1
+    asyncio.run(run())
+
+
+def test_cancelled_call_does_not_cancel_the_shared_request():
+    async def run():
+        cache, calls = ResultCache(), []
+        first = asyncio.ensure_future(cache.get_or_call("list_devices", {}, counting_call(calls)))
+        second = asyncio.ensure_future(cache.get_or_call("list_devices", {}, counting_call(calls)))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == 1
+        with pytest.raises(asyncio.CancelledError):
+            await first
+    asyncio.run(run())
+
+
+def test_least_recently_used_entries_are_evicted():
+    async def run():
+        cache, calls = ResultCache(max_entries=2), []
+        for host in ("sw1", "sw2", "sw1", "sw3"):
+            await cache.get_or_call("execute_command", {"host": host}, counting_call(calls))
+        assert await cache.get_or_call("execute_command", {"host": "sw1"}, counting_call(calls)) == 1
+        assert await cache.get_or_call("execute_command", {"host": "sw2"}, counting_call(calls)) == 4
+    asyncio.run(run())
+
+
+def test_key_does_not_depend_on_argument_order():
+    assert ResultCache.key("t", {"a": 1, "b": 2}) == ResultCache.key("t", {"b": 2, "a": 1})
@@ -0,0 +1,44 @@
+import json
+
+from ale_aos_mcp import tool_registry
+from ale_aos_mcp.tool_registry import cache_file, load_tools
+
+TOOLS = "tools:\n  - name: execute_command\n    description: Run a command\n"
+
+
+def test_registry_is_built_then_read(tmp_path, monkeypatch):
+    tools_file = tmp_path / "mcp_tools.yaml"
+    tools_file.write_text(TOOLS)
+    cache_dir = str(tmp_path / "cache")
+    assert load_tools(str(tools_file), cache_dir) == [{"name": "execute_command", "description": "Run a command"}]
+    with open(cache_file(str(tools_file), cache_dir)) as f:
+        assert json.load(f)["tools"][0]["name"] == "execute_command"
+
+    def parse_tools_file(path):
+        raise AssertionError("the tools file should not be parsed")
+
+    monkeypatch.setattr(tool_registry, "parse_tools_file", parse_tools_file)
+    assert load_tools(str(tools_file), cache_dir)[0]["name"] == "execute_command"
+
+
+def test_registry_is_rebuilt_when_the_tools_file_changes(tmp_path):
+    tools_file = tmp_path / "mcp_tools.yaml"
+    tools_file.write_text(TOOLS)
+    cache_dir = str(tmp_path / "cache")
+    load_tools(str(tools_file), cache_dir)
+    tools_file.write_text(TOOLS + "  - name: list_devices\n")
+    assert [tool["name"] for tool in load_tools(str(tools_file), cache_dir)] == ["execute_command", "list_devices"]
+
+
+def test_corrupted_or_unwritable_registry_falls_back_to_the_tools_file(tmp_path):
+    tools_file = tmp_path / "mcp_tools.yaml"
+    tools_file.write_text(TOOLS)
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    with open(cache_file(str(tools_file), str(cache_dir)), "w") as f:
+        f.write("{")
+    assert load_tools(str(tools_file), str(cache_dir))[0]["name"] == "execute_command"
+
+    not_a_directory = tmp_path / "file"
+    not_a_directory.write_text("")
+    assert load_tools(str(tools_file), str(not_a_directory))[0]["name"] == "execute_command"
@@ -0,0 +1,258 @@
+"""
+Throughput and latency benchmark of aos-ssh (and optionally aos-mcp) against mock AOS switches.
+
+Starts mock switches and a mock jump host (mock_aos_server.py) in a separate process, then an
+aos-ssh server on a generated host file, and drives `POST /command` at each concurrency level.
+Reports p50/p99 latency, requests/sec and aos-ssh memory (RSS), and saves them as json so that a
+later run can be compared with `--compare`. A request whose output is not the one the mock switches
+answer for the command is counted as an error.
+
+    python bench/bench_aos_ssh.py --devices 20 --jump-devices 20 --concurrency 1,8,32 --output run.json
+    python bench/bench_aos_ssh.py ... --compare run.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+import httpx
+import yaml
+
+from mock_aos_server import MockAosServer, MockConfig, command_output, device_address
+
+BENCH_COMMAND = "show vlan"
+
+
+def run_mock_servers(config: MockConfig, devices: int, jump_devices: int, port: int, jump_port: int):
+    addresses = [device_address(i) for i in range(devices + jump_devices)]
+    MockAosServer(config, port, addresses).start()
+    if jump_devices:
+        MockAosServer(config, jump_port, ["127.0.0.1"], forwarding=True).start()
+    while True:
+        time.sleep(3600)
+
+
+def write_host_file(path: str, args) -> list[str]:
+    config = MockConfig()
+    hosts = []
+    for i in range(args.devices + args.jump_devices):
+        entry = {"host": device_address(i), "port": args.ssh_port, "user": config.user, "password": config.password,
+                 "tags": ["bench"]}
+        if i >= args.devices:
+            entry["jump_ssh_name"] = "bench_jump"
+        hosts.append(entry)
+    data = {
+        "jump_ssh_hosts": [{
+            "name": "bench_jump", "public_host": "127.0.0.1", "public_port": args.jump_port,
+            "private_host": "127.0.0.1", "private_port": args.jump_port, "user": config.user, "password": config.password,
+        }] if args.jump_devices else [],
+        "hosts": hosts,
+    }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+    return [host["host"] for host in hosts]
+
+
+def write_config_file(path: str, args):
+    with open(args.aos_ssh_conf_file) as f:
+        config = yaml.safe_load(f) or {}
+    config.setdefault("ssh", {})["exec_mode"] = args.exec_mode
+    config["command_cache"] = {"rules": []} # measure the switch round trip, not the cache
+    config["reload"] = {"interval": 0}
+    with open(path, "w") as f:
+        yaml.safe_dump(config, f)
+
+
+def normalized(output: Optional[str]) -> list[str]:
+    """Output lines without carriage returns, trailing spaces and surrounding blank lines, to compare exec and shell modes."""
+    return [line.rstrip() for line in (output or "").replace("\r", "").strip().split("\n")]
+
+
+def memory_kb(pid: int) -> dict[str, Optional[int]]:
+    """Resident (VmRSS) and peak resident (VmHWM) memory of a process in kB, linux only."""
+    memory = {"rss_kb": None, "peak_rss_kb": None}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    memory["rss_kb"] = int(line.split()[1])
+                elif line.startswith("VmHWM:"):
+                    memory["peak_rss_kb"] = int(line.split()[1])
+    except OSError:
+        pass
+    return memory
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+async def drive(call, hosts: list[str], concurrency: int, requests: int) -> dict:
+    """Runs requests calls over hosts round robin with at most concurrency in flight."""
+    latencies : list[float] = []
+    errors = 0
+    next_request = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in next_request:
+            start = time.perf_counter()
+            try:
+                ok = await call(hosts[i % len(hosts)])
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def bench_aos_ssh(url: str, hosts: list[str], levels: list[int], requests: int, pid: int, expected: list[str]) -> dict:
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=httpx.Limits(max_connections=max(levels) + 10)) as client:
+
+        async def call(host):
+            response = await client.post("/command", json={"host": host, "command": BENCH_COMMAND, "no_cache": True})
+            return (response.status_code == 200 and not response.json().get("stderr")
+                    and normalized(response.json().get("stdout")) == expected)
+
+        results = {"cold": await drive(call, hosts, min(len(hosts), max(levels)), len(hosts)) | memory_kb(pid)}
+        for level in levels:
+            results[f"c{level}"] = await drive(call, hosts, level, requests) | memory_kb(pid)
+    return results
+
+
+async def bench_aos_mcp(url: str, tool: str, hosts: list[str], levels: list[int], requests: int, pid: int,
+                        expected: list[str]) -> dict:
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    results = {}
+    async with streamablehttp_client(url) as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+
+            async def call(host):
+                result = await session.call_tool(tool, {"host": host, "command": BENCH_COMMAND})
+                return not result.isError and bool(result.content) and normalized(result.content[0].text) == expected
+
+            for level in levels:
+                results[f"mcp_c{level}"] = await drive(call, hosts, level, requests) | memory_kb(pid)
+    return results
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{process.args} exited with {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def print_report(results: dict, baseline: Optional[dict]):
+    print(f"{'phase':<10}{'requests':>9}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}{'rss MB':>9}")
+    for phase, r in results.items():
+        rss = f"{r['rss_kb'] / 1024:.1f}" if r.get("rss_kb") else "-"
+        print(f"{phase:<10}{r['requests']:>9}{r['errors']:>8}{r['p50_ms']:>10}{r['p99_ms']:>10}{r['rps']:>10}{rss:>9}")
+        previous = (baseline or {}).get(phase)
+        if previous:
+            deltas = [f"{name} {(r[name] - previous[name]) / previous[name] * 100:+.1f}%"
+                      for name in ("p50_ms", "p99_ms", "rps") if previous.get(name)]
+            print(f"{'':<10}vs baseline: {', '.join(deltas)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="aos-ssh benchmark against mock AOS switches")
+    parser.add_argument("--devices", type=int, default=10, help="mock switches reached directly")
+    parser.add_argument("--jump-devices", type=int, default=10, help="mock switches reached through the mock jump host")
+    parser.add_argument("--concurrency", type=str, default="1,8,32", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=500, help="requests per concurrency level")
+    parser.add_argument("--handshake-delay", type=float, default=0.05, help="mock ssh handshake delay in seconds")
+    parser.add_argument("--command-latency", type=float, default=0.02, help="mock command latency in seconds")
+    parser.add_argument("--output-lines", type=int, default=50, help="lines of mock command output")
+    parser.add_argument("--exec-mode", type=str, default="exec", help="aos-ssh ssh.exec_mode (exec or shell)")
+    parser.add_argument("--ssh-port", type=int, default=2222, help="ssh port of the mock switches")
+    parser.add_argument("--jump-port", type=int, default=2200, help="ssh port of the mock jump host")
+    parser.add_argument("--aos-ssh-port", type=int, default=8190, help="port of the benchmarked aos-ssh server")
+    parser.add_argument("--aos-ssh-conf-file", type=str, default=os.path.join(os.path.dirname(__file__), "..", "data", "aos-ssh-conf.yaml"),
+                        help="aos-ssh configuration used as a base")
+    parser.add_argument("--mcp", action="store_true", help="also drive aos-mcp over streamable http")
+    parser.add_argument("--mcp-port", type=int, default=8191, help="port of the benchmarked aos-mcp server")
+    parser.add_argument("--mcp-tool", type=str, default="execute_aos_comnand", help="aos-mcp tool running a command")
+    parser.add_argument("--output", type=str, help="json file receiving the results")
+    parser.add_argument("--compare", type=str, help="json results of a previous run to compare with")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    mock_config = MockConfig(handshake_delay=args.handshake_delay, command_latency=args.command_latency, output_lines=args.output_lines)
+    mock = multiprocessing.Process(target=run_mock_servers, daemon=True,
+                                   args=(mock_config, args.devices, args.jump_devices, args.ssh_port, args.jump_port))
+    mock.start()
+    processes = []
+    with tempfile.TemporaryDirectory() as tmp:
+        host_file, conf_file = os.path.join(tmp, "aos-ssh-host.json"), os.path.join(tmp, "aos-ssh-conf.yaml")
+        hosts = write_host_file(host_file, args)
+        write_config_file(conf_file, args)
+        try:
+            aos_ssh = subprocess.Popen([sys.executable, "-m", "ale_aos_ssh", "--port", str(args.aos_ssh_port), "--log-level", "warning",
+                                        "--aos-ssh-conf-file", conf_file, "--aos-ssh-host-file", host_file])
+            processes.append(aos_ssh)
+            aos_ssh_url = f"http://127.0.0.1:{args.aos_ssh_port}"
+            wait_ready(aos_ssh_url, aos_ssh)
+            expected = normalized(command_output(BENCH_COMMAND, args.output_lines))
+            results = asyncio.run(bench_aos_ssh(aos_ssh_url, hosts, levels, args.requests, aos_ssh.pid, expected))
+            if args.mcp:
+                aos_mcp = subprocess.Popen([sys.executable, "-m", "ale_aos_mcp", "--transport", "streamable-http",
+                                            "--port", str(args.mcp_port), "--aos-ssh-url", aos_ssh_url, "--log-level", "WARNING"],
+                                           stdout=subprocess.DEVNULL)
+                processes.append(aos_mcp)
+                mcp_url = f"http://127.0.0.1:{args.mcp_port}/mcp"
+                wait_ready(f"http://127.0.0.1:{args.mcp_port}", aos_mcp)
+                results |= asyncio.run(bench_aos_mcp(mcp_url, args.mcp_tool, hosts, levels, args.requests, aos_mcp.pid, expected))
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait()
+            mock.terminate()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"parameters": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Local ssh servers imitating AOS switches and a jump host, for benchmarks without real switches.
+
+Each mock switch listens on its own loopback address (127.0.x.y, same port) since devices are
+identified by host in the aos-ssh host file. Commands answer with `output_lines` lines of a
+`show vlan` like table, specific to each command, after `command_latency` seconds, on exec channels and on an interactive
+shell with an AOS like prompt. The jump host accepts direct-tcpip channels and forwards them to
+the requested address, like an ssh bastion.
+
+run standalone:
+    python mock_aos_server.py --devices 10 --port 2222 --jump-port 2200
+"""
+import argparse
+import logging
+import selectors
+import socket
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Optional
+
+import paramiko
+
+logger = logging.getLogger("mock-aos")
+
+PROMPT = "mock-aos-> "
+
+
+@dataclass
+class MockConfig:
+    user: str = "admin"
+    password: str = "switch"
+    handshake_delay: float = 0.0 # seconds before the ssh handshake of each connection
+    command_latency: float = 0.0 # seconds before a command answers
+    output_lines: int = 50 # lines of command output
+
+
+def device_address(index: int) -> str:
+    """Loopback address of the mock switch index (127.0.1.1, 127.0.1.2, ...)."""
+    return f"127.0.{index // 250 + 1}.{index % 250 + 1}"
+
+
+def command_output(command: str, lines: int) -> str:
+    """`show vlan` like table, the vlan names are derived from the command so that each command has its own output."""
+    tag = f"{zlib.crc32(command.encode()):08x}"
+    header = [
+        " vlan    type   admin   oper    ip    mtu          name",
+        "------+-------+-------+------+------+------+------------------",
+    ]
+    rows = [f"{i + 1:>5}   std      Ena     Ena    Dis   1500    {tag}-{i + 1:<10}" for i in range(max(0, lines - 2))]
+    return "\r\n".join((header + rows)[:lines])
+
+
+class _ServerInterface(paramiko.ServerInterface):
+
+    def __init__(self, server: "MockAosServer"):
+        self.server = server
+        self.forwards : dict[int, socket.socket] = {}
+        # paramiko only keeps weak references to channels, session channels are held here until closed
+        self.channels : set[paramiko.Channel] = set()
+        # exec and shell handlers by channel id, started once the request is acknowledged
+        self.pending : dict[int, tuple] = {}
+
+    def check_auth_password(self, username, password):
+        config = self.server.config
+        if username == config.user and password == config.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_direct_tcpip_request(self, chanid, origin, destination):
+        if not self.server.forwarding:
+            return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+        try:
+            self.forwards[chanid] = socket.create_connection(destination, timeout=10)
+        except OSError:
+            return paramiko.OPEN_FAILED_CONNECT_FAILED
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        self.pending[channel.get_id()] = (self.server.run_exec, (self, channel, command.decode()))
+        return True
+
+    def check_channel_shell_request(self, channel):
+        self.pending[channel.get_id()] = (self.server.run_shell, (self, channel))
+        return True
+
+    def start_pending(self, channel: paramiko.Channel):
+        """Starts the exec or shell handler of a channel, called after the request reply was sent:
+        output sent earlier could close the channel before the client got the reply."""
+        handler = self.pending.pop(channel.get_id(), None)
+        if handler is not None:
+            threading.Thread(target=handler[0], args=handler[1], daemon=True).start()
+
+
+class MockAosServer:
+    """
+    Mock AOS ssh server listening on one port of several addresses.
+    With forwarding set, it behaves as a jump host forwarding direct-tcpip channels.
+    """
+
+    host_key : Optional[paramiko.RSAKey] = None
+
+    def __init__(self, config: MockConfig, port: int, addresses: list[str], forwarding: bool = False):
+        self.config = config
+        self.port = port
+        self.addresses = addresses
+        self.forwarding = forwarding
+        self.selector = selectors.DefaultSelector()
+        self.connections = 0
+        self.commands = 0
+        self.stopped = threading.Event()
+        if MockAosServer.host_key is None:
+            MockAosServer.host_key = paramiko.RSAKey.generate(2048)
+
+    def start(self) -> "MockAosServer":
+        for address in self.addresses:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((address, self.port))
+            sock.listen(128)
+            sock.setblocking(False)
+            self.selector.register(sock, selectors.EVENT_READ)
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def _accept_loop(self):
+        while not self.stopped.is_set():
+            for key, _ in self.selector.select(timeout=0.5):
+                try:
+                    conn, _ = key.fileobj.accept()
+                except BlockingIOError:
+                    continue
+                conn.setblocking(True)
+                self.connections += 1
+                threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+        for key in list(self.selector.get_map().values()):
+            key.fileobj.close()
+
+    def _serve(self, conn: socket.socket):
+        if self.config.handshake_delay:
+            time.sleep(self.config.handshake_delay)
+        transport = paramiko.Transport(conn)
+        transport.add_server_key(self.host_key)
+        interface = _ServerInterface(self)
+        # paramiko has no hook after a channel request is acknowledged, its handler is wrapped for this transport
+        handle_request = transport._channel_handler_table[paramiko.common.MSG_CHANNEL_REQUEST]
+
+        def handle_request_then_start(channel, m):
+            handle_request(channel, m)
+            interface.start_pending(channel)
+
+        transport._channel_handler_table = dict(transport._channel_handler_table)
+        transport._channel_handler_table[paramiko.common.MSG_CHANNEL_REQUEST] = handle_request_then_start
+        try:
+            transport.start_server(server=interface)
+        except (paramiko.SSHException, EOFError, OSError):
+            return
+        while transport.is_active() and not self.stopped.is_set():
+            channel = transport.accept(timeout=1)
+            if channel is None:
+                continue
+            forward = interface.forwards.pop(channel.get_id(), None)
+            if forward is not None:
+                threading.Thread(target=self._pipe, args=(channel, forward), daemon=True).start()
+            else:
+                interface.channels.add(channel)
+        transport.close()
+
+    @staticmethod
+    def _pipe(channel: paramiko.Channel, sock: socket.socket):
+        """Relays a forwarded channel and its tcp connection until one of them closes."""
+        selector = selectors.DefaultSelector()
+        selector.register(channel, selectors.EVENT_READ)
+        selector.register(sock, selectors.EVENT_READ)
+        try:
+            while True:
+                for key, _ in selector.select():
+                    if key.fileobj is sock:
+                        data = sock.recv(65536)
+                        if not data:
+                            return
+                        channel.sendall(data)
+                    else:
+                        data = channel.recv(65536)
+                        if not data:
+                            return
+                        sock.sendall(data)
+        except OSError:
+            return
+        finally:
+            channel.close()
+            sock.close()
+
+    def _answer(self, command: str) -> str:
+        self.commands += 1
+        if self.config.command_latency:
+            time.sleep(self.config.command_latency)
+        return command_output(command, self.config.output_lines)
+
+    def run_exec(self, interface: _ServerInterface, channel: paramiko.Channel, command: str):
+        try:
+            channel.sendall(self._answer(command).encode() + b"\r\n")
+            channel.send_exit_status(0)
+        except OSError:
+            pass
+        finally:
+            channel.close()
+            interface.channels.discard(channel)
+
+    def run_shell(self, interface: _ServerInterface, channel: paramiko.Channel):
+        buffer = ""
+        try:
+            channel.sendall(PROMPT.encode())
+            while True:
+                data = channel.recv(4096)
+                if not data:
+                    return
+                buffer += data.decode(errors="replace")
+                while "\n" in buffer or "\r" in buffer:
+                    line, _, buffer = buffer.replace("\r\n", "\n").replace("\r", "\n").partition("\n")
+                    command = line.strip()
+                    if command in ("exit", "logout"):
+                        return
+                    output = self._answer(command) + "\r\n" if command and command != "no more" else ""
+                    channel.sendall(f"{line}\r\n{output}{PROMPT}".encode())
+        except OSError:
+            pass
+        finally:
+            channel.close()
+            interface.channels.discard(channel)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock AOS ssh servers")
+    parser.add_argument("--devices", type=int, default=10, help="number of mock switches")
+    parser.add_argument("--port", type=int, default=2222, help="ssh port of the mock switches")
+    parser.add_argument("--jump-port", type=int, default=0, help="ssh port of the mock jump host on 127.0.0.1 (0: no jump host)")
+    parser.add_argument("--handshake-delay", type=float, default=0.0)
+    parser.add_argument("--command-latency", type=float, default=0.0)
+    parser.add_argument("--output-lines", type=int, default=50)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    config = MockConfig(handshake_delay=args.handshake_delay, command_latency=args.command_latency, output_lines=args.output_lines)
+    MockAosServer(config, args.port, [device_address(i) for i in range(args.devices)]).start()
+    if args.jump_port:
+        MockAosServer(config, args.jump_port, ["127.0.0.1"], forwarding=True).start()
+    logger.info(f"{args.devices} mock switches listening on port {args.port}, user {config.user}, password {config.password}")
+    threading.Event().wait()
+
+
+if __name__ == "__main__":
+    main()
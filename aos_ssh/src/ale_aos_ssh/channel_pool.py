@@ -0,0 +1,65 @@
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+
+class ChannelWaitTimeout(Exception):
+    """Raised when no channel of a device became free within the wait timeout."""
+
+
+class ChannelPool:
+    """
+    Bounds the number of exec channels opened at once on one SSH transport.
+    Waiting callers are served in arrival order (FIFO): a released slot is handed over
+    directly to the oldest waiter, so a burst of new requests cannot overtake it.
+    """
+
+    def __init__(self, max_channels: int):
+        self.max_channels = max(1, max_channels)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._waiters: deque[threading.Event] = deque()
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def acquire(self, timeout: float = None) -> bool:
+        with self._lock:
+            if self._in_use < self.max_channels and not self._waiters:
+                self._in_use += 1
+                return True
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+        if waiter.wait(timeout):
+            return True
+        with self._lock:
+            if waiter.is_set(): # slot handed over while timing out
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def release(self):
+        with self._lock:
+            # Hand the slot over while max_channels still allows it (it may have been lowered)
+            if self._waiters and self._in_use <= self.max_channels:
+                self._waiters.popleft().set()
+            else:
+                self._in_use -= 1
+                while self._waiters and self._in_use < self.max_channels:
+                    self._in_use += 1
+                    self._waiters.popleft().set()
+
+    @contextmanager
+    def channel(self, timeout: float = None):
+        """Hold one channel slot, raising ChannelWaitTimeout if none is free in time."""
+        if not self.acquire(timeout):
+            raise ChannelWaitTimeout(f"No free channel after {timeout} seconds ({self._in_use} in use, {len(self._waiters)} waiting)")
+        try:
+            yield
+        finally:
+            self.release()
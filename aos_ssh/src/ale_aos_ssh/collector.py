@@ -0,0 +1,184 @@
+import sqlite3
+import threading
+import time
+import zlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from . import sharding
+from .device_manager import Device, inventory
+
+logger = logging.getLogger("aos-ssh")
+
+
+@dataclass
+class CollectorJob:
+    name: str
+    commands: list[str]
+    tags: Optional[list[str]] = None # all devices if not set
+    interval: float = 3600 # seconds between runs
+    next_run: float = field(default=0, compare=False)
+
+
+class SnapshotStore:
+    """
+    Command outputs collected from devices, zlib compressed in a SQLite database.
+    One row per (host, command, collection time), collected_at is a unix timestamp.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        # timeout: workers of the multi-process mode share the database
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS snapshots (
+                                id INTEGER PRIMARY KEY,
+                                host TEXT NOT NULL,
+                                command TEXT NOT NULL,
+                                collected_at REAL NOT NULL,
+                                stdout BLOB,
+                                stderr TEXT,
+                                error TEXT)""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS snapshots_host_command ON snapshots (host, command, collected_at)")
+        self._db.commit()
+
+    def save(self, rows: list[tuple[str, str, float, Optional[str], Optional[str], Optional[str]]]):
+        """Stores (host, command, collected_at, stdout, stderr, error) rows."""
+        with self._lock:
+            self._db.executemany("INSERT INTO snapshots (host, command, collected_at, stdout, stderr, error) VALUES (?, ?, ?, ?, ?, ?)",
+                                 [(host, command, collected_at, zlib.compress(stdout.encode()) if stdout is not None else None, stderr, error)
+                                  for host, command, collected_at, stdout, stderr, error in rows])
+            self._db.commit()
+
+    @staticmethod
+    def _entry(row) -> dict:
+        host, command, collected_at, stdout, stderr, error = row
+        return {"host": host, "command": command, "collected_at": collected_at,
+                "stdout": zlib.decompress(stdout).decode() if stdout is not None else None,
+                "stderr": stderr, "error": error}
+
+    def latest(self, hosts: Optional[list[str]] = None, command: Optional[str] = None) -> list[dict]:
+        """Last snapshot of each (host, command), for some hosts and/or one command."""
+        where, params = [], []
+        if command is not None:
+            where.append("command = ?")
+            params.append(command)
+        if hosts is not None:
+            where.append(f"host IN ({','.join('?' * len(hosts))})")
+            params.extend(hosts)
+        condition = f"WHERE {' AND '.join(where)}" if where else ""
+        with self._lock:
+            rows = self._db.execute(f"""SELECT s.host, s.command, s.collected_at, s.stdout, s.stderr, s.error FROM snapshots s
+                                        JOIN (SELECT host, command, MAX(collected_at) AS last FROM snapshots {condition} GROUP BY host, command) l
+                                        ON s.host = l.host AND s.command = l.command AND s.collected_at = l.last
+                                        ORDER BY s.host, s.command""", params).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def history(self, host: str, command: str, since: Optional[float] = None, until: Optional[float] = None,
+                limit: int = 10) -> list[dict]:
+        """Snapshots of a command on a host, most recent first."""
+        with self._lock:
+            rows = self._db.execute("""SELECT host, command, collected_at, stdout, stderr, error FROM snapshots
+                                       WHERE host = ? AND command = ? AND collected_at >= ? AND collected_at <= ?
+                                       ORDER BY collected_at DESC LIMIT ?""",
+                                    (host, command, since or 0, until or float("inf"), limit)).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def purge(self, before: float) -> int:
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM snapshots WHERE collected_at < ?", (before,)).rowcount
+            self._db.commit()
+        return deleted
+
+
+class Collector:
+    """
+    Runs the command sets of the `collector` section of aos-ssh-conf.yaml on the devices
+    having one of the job tags, every job interval, and stores the outputs as snapshots.
+    """
+
+    def __init__(self):
+        self.store : Optional[SnapshotStore] = None
+        self.jobs : dict[str, CollectorJob] = {}
+        self.parallelism = 8
+        self.retention_days = 7
+        self.run_command : Optional[Callable[[Device, str], tuple]] = None
+        self._wakeup = threading.Event()
+        self._running_lock = threading.Lock()
+        self._thread : Optional[threading.Thread] = None
+
+    def configure(self, config: dict):
+        """Apply the `collector` section of aos-ssh-conf.yaml, jobs keep their schedule when reloaded."""
+        self.parallelism = config.get("parallelism", self.parallelism)
+        self.retention_days = config.get("retention_days", self.retention_days)
+        jobs = {}
+        for job_config in config.get("jobs", []):
+            job = CollectorJob(job_config["name"], job_config["commands"], job_config.get("tags"), job_config.get("interval", 3600))
+            previous = self.jobs.get(job.name)
+            job.next_run = previous.next_run if previous is not None and previous.interval == job.interval else 0
+            jobs[job.name] = job
+        self.jobs = jobs
+        if config.get("database") and (self.store is None or self.store.path != config["database"]):
+            try:
+                self.store = SnapshotStore(config["database"])
+            except (sqlite3.Error, OSError) as e:
+                logger.error(f"Failed to open snapshot database {config['database']}, snapshots are not collected: {e}")
+        if self.run_command is not None:
+            self._start_thread() # database set by a reload after startup
+        self._wakeup.set()
+        logger.info(f"Collector jobs: {[(job.name, job.interval) for job in jobs.values()]}, parallelism: {self.parallelism}")
+
+    def run_job(self, job: CollectorJob) -> int:
+        """Runs a job now, returns the number of stored snapshots."""
+        devices = [device for device in inventory.select(job.tags) if sharding.owns(device.host)]
+        if not devices or self.store is None:
+            return 0
+
+        def collect(device: Device) -> list[tuple]:
+            rows = []
+            for command in job.commands:
+                try:
+                    stdout, stderr, error = self.run_command(device, command)
+                except Exception as e:
+                    stdout, stderr, error = None, None, str(e)
+                rows.append((device.host, command, time.time(), stdout, stderr, error))
+            return rows
+
+        start = time.perf_counter()
+        with self._running_lock, ThreadPoolExecutor(max_workers=self.parallelism, thread_name_prefix="aos-collector") as executor:
+            rows = [row for device_rows in executor.map(collect, devices) for row in device_rows]
+        self.store.save(rows)
+        purged = self.store.purge(time.time() - self.retention_days * 86400)
+        logger.info(f"Collector job {job.name}: {len(rows)} snapshots of {len(devices)} devices in {time.perf_counter() - start:.1f}s, {purged} purged")
+        return len(rows)
+
+    def collector_thread(self):
+        while True:
+            now = time.time()
+            for job in list(self.jobs.values()):
+                if job.next_run <= now:
+                    job.next_run = now + job.interval
+                    try:
+                        self.run_job(job)
+                    except Exception as e:
+                        logger.error(f"Collector job {job.name} failed: {e}")
+            next_run = min((job.next_run for job in self.jobs.values()), default=None)
+            self._wakeup.clear()
+            self._wakeup.wait(None if next_run is None else max(0, next_run - time.time()))
+
+    def start(self, run_command: Callable[[Device, str], tuple]):
+        """Starts the schedule, run_command(device, command) returns (stdout, stderr, error)."""
+        self.run_command = run_command
+        self._start_thread()
+
+    def _start_thread(self):
+        if self._thread is None and self.store is not None:
+            self._thread = threading.Thread(target=self.collector_thread, daemon=True)
+            self._thread.start()
+            logger.info(f"Collector started, snapshots stored in {self.store.path}")
+
+
+collector = Collector()
@@ -0,0 +1,133 @@
+import re
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Callable
+
+logger = logging.getLogger("aos-ssh")
+
+
+class _InFlight:
+    """Device execution shared by concurrent identical requests."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException = None
+
+
+class CommandCache:
+    """
+    In-memory TTL cache of command outputs keyed by (host, normalized command).
+    The TTL of a command is given by the first matching rule of the `command_cache` section
+    of aos-ssh-conf.yaml, commands without a matching rule are never cached.
+    Entries are evicted in least recently used order when max_entries is reached and
+    concurrent identical requests share a single in-flight device execution.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.rules: list[tuple[re.Pattern, float]] = []
+        self._entries: OrderedDict[tuple[str, str], tuple[float, Any]] = OrderedDict()
+        self._in_flight: dict[tuple[str, str], _InFlight] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.bypassed = 0
+
+    def configure(self, cache_config: dict):
+        """Apply the `command_cache` section of aos-ssh-conf.yaml."""
+        with self._lock:
+            self.max_entries = cache_config.get("max_entries", self.max_entries)
+            self.rules = [(re.compile(rule["pattern"]), float(rule["ttl"])) for rule in cache_config.get("rules", [])]
+            self._entries.clear()
+        logger.info(f"Command cache max entries: {self.max_entries}, rules: {[(r.pattern, ttl) for r, ttl in self.rules]}")
+
+    @staticmethod
+    def normalize(command: str) -> str:
+        return " ".join(command.split())
+
+    def ttl_for(self, command: str) -> float:
+        for pattern, ttl in self.rules:
+            if pattern.match(command):
+                return ttl
+        return 0
+
+    def get_or_execute(self, host: str, command: str, execute: Callable[[], Any], bypass: bool = False,
+                       cacheable: Callable[[Any], bool] = lambda result: True) -> Any:
+        """
+        Returns the cached output of a command, or runs execute() once for all concurrent
+        identical requests and caches its result when cacheable(result) is true.
+        With bypass, the cache is not read but is refreshed with the new result.
+        """
+        command = self.normalize(command)
+        ttl = self.ttl_for(command)
+        if ttl <= 0:
+            return execute()
+        key = (host, command)
+        with self._lock:
+            if not bypass:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                in_flight = self._in_flight.get(key)
+                if in_flight is not None:
+                    self.coalesced += 1
+                else:
+                    self.misses += 1
+            else:
+                self.bypassed += 1
+                in_flight = None
+            if in_flight is None:
+                in_flight = self._in_flight[key] = _InFlight()
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            in_flight.done.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return in_flight.result
+
+        try:
+            in_flight.result = execute()
+            if cacheable(in_flight.result):
+                self._store(key, ttl, in_flight.result)
+            return in_flight.result
+        except BaseException as e:
+            in_flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._in_flight.get(key) is in_flight:
+                    del self._in_flight[key]
+            in_flight.done.set()
+
+    def _store(self, key: tuple[str, str], ttl: float, result: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "bypassed": self.bypassed,
+                "evictions": self.evictions,
+            }
+
+
+command_cache = CommandCache() # Global command output cache
@@ -0,0 +1,90 @@
+import re
+import logging
+from functools import lru_cache
+from typing import Optional
+
+from .device_manager import Device
+
+logger = logging.getLogger("aos-ssh")
+
+DEFAULT_PROFILE = "default"
+
+
+class CommandMatcher:
+    """
+    Allowlist of command regexes compiled once into a single alternation, each pattern keeps
+    its re.match semantic. Decisions of recent commands are kept in a bounded cache.
+    """
+
+    def __init__(self, patterns: list[str], cache_size: int = 4096):
+        self.patterns = list(patterns)
+        try:
+            self._regexes = [re.compile("|".join(f"(?:{p})" for p in self.patterns))] if self.patterns else []
+        except re.error as e:
+            # ex: inline global flags are only allowed at the start of a regex
+            logger.info(f"Allowlist can't be combined into one regex ({e}), patterns are matched one by one")
+            self._regexes = [re.compile(p) for p in self.patterns]
+        self.is_allowed = lru_cache(maxsize=cache_size)(self._match)
+
+    def _match(self, command: str) -> bool:
+        return any(regex.match(command) for regex in self._regexes)
+
+
+class CommandPolicy:
+    """
+    Command allowlists by profile. The `default` profile is `allowed_aos_commands`, named profiles
+    are attached to devices (`command_profiles` of the host entry) or to tags (`tag_command_profiles`).
+    A device is allowed the commands of all its profiles, or of the `default` profile if it has none.
+    Matchers are compiled when the config is loaded and resolved once per device.
+    """
+
+    def __init__(self):
+        self.cache_size = 4096
+        self.profiles : dict[str, list[str]] = {DEFAULT_PROFILE: []}
+        self.tag_profiles : dict[str, list[str]] = {}
+        self._matchers : dict[tuple[str, ...], CommandMatcher] = {}
+        self._device_matchers : dict[str, tuple[Device, CommandMatcher]] = {}
+
+    def configure(self, allowed_commands: list[str], profiles: dict = None, tag_profiles: dict = None,
+                  cache_size: int = 4096):
+        self.cache_size = cache_size
+        self.profiles = {DEFAULT_PROFILE: list(allowed_commands or []), **(profiles or {})}
+        self.tag_profiles = tag_profiles or {}
+        self._matchers = {(DEFAULT_PROFILE,): CommandMatcher(self.profiles[DEFAULT_PROFILE], cache_size)}
+        self._device_matchers = {}
+        logger.info(f"Command profiles: {list(self.profiles)}, tag profiles: {self.tag_profiles}")
+
+    def profiles_for(self, device: Device) -> tuple[str, ...]:
+        names = list(device.command_profiles or [])
+        for tag in device.tags or []:
+            names.extend(self.tag_profiles.get(tag, []))
+        profiles = []
+        for name in dict.fromkeys(names):
+            if name in self.profiles:
+                profiles.append(name)
+            else:
+                logger.warning(f"Unknown command profile '{name}' for device {device.host}")
+        return tuple(profiles) or (DEFAULT_PROFILE,)
+
+    def matcher(self, profiles: tuple[str, ...]) -> CommandMatcher:
+        matcher = self._matchers.get(profiles)
+        if matcher is None:
+            patterns = [p for name in profiles for p in self.profiles[name]]
+            matcher = self._matchers.setdefault(profiles, CommandMatcher(patterns, self.cache_size))
+        return matcher
+
+    def matcher_for(self, device: Optional[Device]) -> CommandMatcher:
+        if device is None:
+            return self.matcher((DEFAULT_PROFILE,))
+        cached = self._device_matchers.get(device.host)
+        if cached is not None and cached[0] is device:
+            return cached[1]
+        matcher = self.matcher(self.profiles_for(device))
+        self._device_matchers[device.host] = (device, matcher)
+        return matcher
+
+    def is_allowed(self, command: str, device: Optional[Device] = None) -> bool:
+        return self.matcher_for(device).is_allowed(command)
+
+
+command_policy = CommandPolicy() # Global command allowlist policy
@@ -1,5 +1,6 @@
 
 import dataclasses
+import threading
 from typing import Any, List,Optional
 from dataclasses import dataclass
 from dataclasses import field
@@ -14,9 +15,11 @@ class JumpHost:
    password : str
    public_port : int = field(default=22)
    private_port : int = field(default=22)
+   max_channels : Optional[int] = None # default concurrent channels for devices behind this jump host
+   transport_pool_size : Optional[int] = None # transports opened to this jump host, default from ssh.jump_transport_pool_size
 
    @classmethod
-   def load(cls, data):
+   def parse(cls, data):
         jump_box = cls(
             *[data.get(fld.name) for fld in dataclasses.fields(JumpHost)]
         )
@@ -24,7 +27,11 @@ class JumpHost:
             jump_box.public_port = 22
         if jump_box.private_port is None:
             jump_box.private_port = 22
-        jump_ssh_boxes.append(jump_box)
+        return jump_box
+
+   @classmethod
+   def load(cls, data):
+        inventory.set_jump_host(cls.parse(data))
 
 
 @dataclass
@@ -35,6 +42,9 @@ class Device :
    port : int = field(default=22)
    tags : List[str] = field(default_factory=list)
    jump_ssh_name : Optional[str] = None
+   max_channels : Optional[int] = None # concurrent exec channels on the device session
+   exec_mode : Optional[str] = None # "exec" or "shell" (persistent shell), default from ssh.exec_mode
+   command_profiles : Optional[List[str]] = None # named allowlist profiles, "default" if not set
 #   serial_number : Optional[List[str]] = None
 #   name : Optional[str] = None
 #   description : Optional[str] = None
@@ -48,23 +58,109 @@ class Device :
    """
 
    @classmethod
-   def load(cls, data):
+   def parse(cls, data):
         device = cls(
             *[data.get(fld.name) for fld in dataclasses.fields(Device)]
         )
         if device.port is None:
             device.port = 22
-        devices.append(device)
+        if device.tags is None:
+            device.tags = []
+        return device
+
+   @classmethod
+   def load(cls, data):
+        inventory.set_device(cls.parse(data))
    
     
 
 
-
-devices : list[Device]= [] # Global list to store devices
-jump_ssh_boxes : list[JumpHost]= [] # Global list to store jump boxes
+class Inventory:
+    """
+    Devices and jump hosts indexed by host, jump host name and tag.
+    Updated in place by the management api, lookups don't scan the device list.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.devices : dict[str, Device] = {} # host -> device, in insertion order
+        self.jump_hosts : dict[str, JumpHost] = {} # name -> jump host
+        self.tag_index : dict[str, dict[str, None]] = {} # tag -> hosts (ordered set)
+        self._summaries : dict[str, dict] = {} # host -> device listing entry
+
+    def __len__(self) -> int:
+        return len(self.devices)
+
+    def get_device(self, host: str) -> Optional[Device]:
+        return self.devices.get(host)
+
+    def get_jump_host(self, name: str) -> Optional[JumpHost]:
+        return self.jump_hosts.get(name)
+
+    def set_jump_host(self, jump_host: JumpHost):
+        with self.lock:
+            self.jump_hosts[jump_host.name] = jump_host
+
+    def remove_jump_host(self, name: str) -> Optional[JumpHost]:
+        with self.lock:
+            return self.jump_hosts.pop(name, None)
+
+    def set_device(self, device: Device) -> Optional[Device]:
+        """Create or replace a device, returns the replaced device."""
+        with self.lock:
+            previous = self._remove_from_index(device.host)
+            self.devices[device.host] = device
+            for tag in device.tags or []:
+                self.tag_index.setdefault(tag, {})[device.host] = None
+            self._summaries[device.host] = {"host": device.host, "tags": device.tags}
+            return previous
+
+    def remove_device(self, host: str) -> Optional[Device]:
+        with self.lock:
+            return self._remove_from_index(host)
+
+    def _remove_from_index(self, host: str) -> Optional[Device]:
+        device = self.devices.pop(host, None)
+        if device is not None:
+            self._summaries.pop(host, None)
+            for tag in device.tags or []:
+                hosts = self.tag_index.get(tag)
+                if hosts is not None:
+                    hosts.pop(host, None)
+                    if not hosts:
+                        del self.tag_index[tag]
+        return device
+
+    def _select_hosts(self, tags: Optional[list[str]]) -> list[str]:
+        if tags is None:
+            return list(self.devices)
+        if len(tags) == 1:
+            return list(self.tag_index.get(tags[0], {}))
+        hosts : dict[str, None] = {}
+        for tag in tags:
+            hosts.update(self.tag_index.get(tag, {}))
+        return list(hosts)
+
+    def select(self, tags: Optional[list[str]] = None) -> list[Device]:
+        """Devices having at least one of the tags, all devices if tags is None."""
+        with self.lock:
+            return [self.devices[host] for host in self._select_hosts(tags)]
+
+    def list_page(self, tags: Optional[list[str]] = None, offset: int = 0, limit: Optional[int] = None) -> tuple[int, list[dict]]:
+        """Page of device listing entries having at least one of the tags.
+        returns:
+            (total number of matching devices, entries of the page)
+        """
+        with self.lock:
+            hosts = self._select_hosts(tags)
+            page = hosts[offset:] if limit is None else hosts[offset:offset + limit]
+            return len(hosts), [self._summaries[host] for host in page]
+
+
+inventory = Inventory() # Global device inventory
 
 def get_device_by_host(host: str) -> Optional['Device']:
-    return next((d for d in devices if d.host == host), None)
+    return inventory.get_device(host)
 
 
 
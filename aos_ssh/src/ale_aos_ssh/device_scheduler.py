@@ -0,0 +1,154 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Optional
+
+from . import metrics as Metrics
+
+logger = logging.getLogger("aos-ssh")
+
+# Priority classes, lower runs first
+PRIORITIES = {"interactive": 0, "bulk": 1, "background": 2}
+
+
+class DeviceBusy(Exception):
+    """Raised when a device queue (or the global waiting bound) is full, or the wait timed out."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Waiter:
+
+    def __init__(self, caller: str):
+        self.caller = caller
+        self.granted = threading.Event()
+
+
+class _DeviceQueue:
+
+    def __init__(self):
+        self.running = 0
+        self.waiters : list[tuple[int, int, int, _Waiter]] = [] # heap of (priority, caller turn, arrival, waiter)
+        self.callers : dict[str, int] = {} # requests of each caller queued or running on the device
+        self.run_seconds = 1.0 # moving average of the slot hold time, for Retry-After
+
+
+class DeviceScheduler:
+    """
+    Admission of the commands run on each device, see `scheduler` section of aos-ssh-conf.yaml.
+    At most max_running commands run at once on a device, the next ones wait in a bounded
+    per-device queue ordered by priority class (interactive, bulk, background), then by caller
+    turn: a caller with fewer requests queued or running on the device goes first, so one caller
+    cannot monopolize a switch. The per-device queue and max_waiting, which bounds the threads
+    waiting over all devices, keep one busy switch from using the whole threadpool: requests above
+    them, or waiting longer than queue_timeout, are rejected with DeviceBusy (HTTP 429).
+    """
+
+    def __init__(self):
+        self.max_running = 4
+        self.max_queued = 16
+        self.max_waiting = 32
+        self.queue_timeout = 30
+        self._lock = threading.Lock()
+        self._queues : dict[str, _DeviceQueue] = {}
+        self._waiting = 0
+        self._arrivals = itertools.count()
+
+    def configure(self, config: dict):
+        """Apply the `scheduler` section of aos-ssh-conf.yaml."""
+        with self._lock:
+            self.max_running = max(1, config.get("max_running_per_device", self.max_running))
+            self.max_queued = config.get("max_queued_per_device", self.max_queued)
+            self.max_waiting = config.get("max_waiting", self.max_waiting)
+            self.queue_timeout = config.get("queue_timeout", self.queue_timeout)
+        logger.info(f"Scheduler max running per device: {self.max_running}, max queued per device: {self.max_queued}, "
+                    f"max waiting: {self.max_waiting}, queue timeout: {self.queue_timeout}")
+
+    def _retry_after(self, queue: _DeviceQueue) -> int:
+        """Seconds for the queue ahead to drain, estimated from the average slot hold time."""
+        return max(1, math.ceil(queue.run_seconds * (len(queue.waiters) + 1) / self.max_running))
+
+    def _acquire(self, host: str, priority: str, caller: str):
+        rank = PRIORITIES[priority]
+        with self._lock:
+            queue = self._queues.get(host)
+            if queue is None:
+                queue = self._queues[host] = _DeviceQueue()
+            turn = queue.callers.get(caller, 0)
+            if queue.running < self.max_running and not queue.waiters:
+                queue.running += 1
+                queue.callers[caller] = turn + 1
+                return
+            if len(queue.waiters) >= self.max_queued or self._waiting >= self.max_waiting:
+                Metrics.SCHEDULER_REJECTIONS.inc(priority=priority)
+                full = "queue" if len(queue.waiters) >= self.max_queued else "server"
+                raise DeviceBusy(f"Device {host} busy: {full} full ({queue.running} running, {len(queue.waiters)} queued)",
+                                 self._retry_after(queue))
+            waiter = _Waiter(caller)
+            entry = (rank, turn, next(self._arrivals), waiter)
+            heapq.heappush(queue.waiters, entry)
+            queue.callers[caller] = turn + 1
+            self._waiting += 1
+        if waiter.granted.wait(self.queue_timeout):
+            return
+        with self._lock:
+            if waiter.granted.is_set(): # slot handed over while timing out
+                return
+            queue.waiters.remove(entry)
+            heapq.heapify(queue.waiters)
+            self._waiting -= 1
+            self._leave(host, queue, caller)
+            Metrics.SCHEDULER_REJECTIONS.inc(priority=priority)
+            raise DeviceBusy(f"Device {host} busy: queued more than {self.queue_timeout} seconds", self._retry_after(queue))
+
+    def _leave(self, host: str, queue: _DeviceQueue, caller: str):
+        if queue.callers[caller] <= 1:
+            del queue.callers[caller]
+        else:
+            queue.callers[caller] -= 1
+        if not queue.callers:
+            del self._queues[host]
+
+    def _release(self, host: str, caller: str, seconds: float):
+        with self._lock:
+            queue = self._queues[host]
+            queue.run_seconds = 0.8 * queue.run_seconds + 0.2 * seconds
+            queue.running -= 1
+            while queue.waiters and queue.running < self.max_running:
+                _, _, _, waiter = heapq.heappop(queue.waiters)
+                queue.running += 1
+                self._waiting -= 1
+                waiter.granted.set()
+            self._leave(host, queue, caller)
+
+    @contextmanager
+    def slot(self, host: str, priority: str = "interactive", caller: Optional[str] = None):
+        """Hold one running slot of the device, raising DeviceBusy when it can't be granted."""
+        caller = caller or ""
+        self._acquire(host, priority, caller)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(host, caller, time.perf_counter() - start)
+
+    def queued(self) -> dict[tuple, int]:
+        """Waiting requests by priority class."""
+        counts = {(priority,): 0 for priority in PRIORITIES}
+        names = {rank: priority for priority, rank in PRIORITIES.items()}
+        with self._lock:
+            for queue in self._queues.values():
+                for rank, _, _, _ in queue.waiters:
+                    counts[(names[rank],)] += 1
+        return counts
+
+
+device_scheduler = DeviceScheduler() # Global scheduler of device commands
+
+Metrics.register_gauge("aos_ssh_scheduler_queued", "Commands waiting in device queues", device_scheduler.queued, ("priority",))
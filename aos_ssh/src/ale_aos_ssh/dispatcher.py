@@ -0,0 +1,255 @@
+import asyncio
+import atexit
+import json
+import logging
+import subprocess
+import sys
+import threading
+import time
+from typing import Optional
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+from . import sharding
+
+logger = logging.getLogger("aos-ssh")
+
+# Front process of the multi-process mode: hosts are spread over worker processes (sharding.worker_for),
+# requests for a host go to the worker owning its sessions, others are fanned out or sent to the first worker.
+dispatcher_app = FastAPI()
+worker_urls : list[str] = []
+worker_processes : list[Optional[subprocess.Popen]] = []
+client : Optional[httpx.AsyncClient] = None
+
+# Response headers of a worker returned to the client
+FORWARDED_HEADERS = ("content-type", "retry-after", "x-total-count")
+
+
+def get_client() -> httpx.AsyncClient:
+    global client
+    if client is None:
+        client = httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100))
+    return client
+
+
+def worker_headers(request: Request) -> dict[str, str]:
+    """Headers sent to a worker, the caller is kept for the fairness of the device scheduler."""
+    return {"content-type": request.headers.get("content-type", "application/json"),
+            "x-aos-caller": request.headers.get("x-aos-caller") or (request.client.host if request.client else "")}
+
+
+def worker_request(worker: int, request: Request, body: bytes) -> httpx.Request:
+    return get_client().build_request(request.method, worker_urls[worker] + request.url.path, params=request.query_params,
+                                      content=body, headers=worker_headers(request))
+
+
+async def forward(worker: int, request: Request, body: bytes = None) -> Response:
+    """Sends a request to a worker and returns its response."""
+    body = await request.body() if body is None else body
+    try:
+        r = await get_client().send(worker_request(worker, request, body))
+    except httpx.TransportError as e:
+        raise HTTPException(status_code=503, detail=f"aos-ssh worker {worker} unavailable: {e}", headers={"Retry-After": "1"})
+    return Response(content=r.content, status_code=r.status_code,
+                    headers={name: r.headers[name] for name in FORWARDED_HEADERS if name in r.headers})
+
+
+async def forward_stream(worker: int, request: Request, body: bytes) -> Response:
+    """Sends a request to a worker and streams its response, closing the worker stream when the client disconnects."""
+    try:
+        r = await get_client().send(worker_request(worker, request, body), stream=True)
+    except httpx.TransportError as e:
+        raise HTTPException(status_code=503, detail=f"aos-ssh worker {worker} unavailable: {e}", headers={"Retry-After": "1"})
+    if r.status_code != 200:
+        await r.aread()
+        await r.aclose()
+        return Response(content=r.content, status_code=r.status_code, headers={"content-type": r.headers.get("content-type", "")})
+
+    async def relay():
+        try:
+            async for chunk in r.aiter_raw():
+                yield chunk
+        finally:
+            await r.aclose()
+
+    return StreamingResponse(relay(), media_type=r.headers.get("content-type"))
+
+
+async def body_host(request: Request) -> tuple[bytes, int]:
+    """Request body and the worker owning the host of the body."""
+    body = await request.body()
+    try:
+        host = json.loads(body).get("host")
+    except (ValueError, AttributeError):
+        host = None
+    if not isinstance(host, str):
+        return body, 0 # invalid request, answered by a worker
+    return body, sharding.worker_for(host, len(worker_urls))
+
+
+@dispatcher_app.post("/command")
+@dispatcher_app.post("/commands/pipeline")
+async def dispatch_host_command(request: Request):
+    body, worker = await body_host(request)
+    return await forward(worker, request, body)
+
+
+@dispatcher_app.post("/command/stream")
+async def dispatch_command_stream(request: Request):
+    body, worker = await body_host(request)
+    return await forward_stream(worker, request, body)
+
+
+@dispatcher_app.get("/command/pages/{cursor}")
+async def dispatch_command_page(cursor: str, request: Request):
+    worker, _, _ = cursor.partition("_")
+    if not worker.isdigit() or int(worker) >= len(worker_urls):
+        raise HTTPException(status_code=404, detail="Unknown or expired cursor, run the command again")
+    return await forward(int(worker), request)
+
+
+@dispatcher_app.post("/commands/batch")
+async def dispatch_batch_command(request: Request):
+    """Each worker runs the batch command on the hosts it owns, results are merged."""
+    body = await request.body()
+    try:
+        stream = bool(json.loads(body).get("stream"))
+    except (ValueError, AttributeError):
+        stream = False
+    if not stream:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(forward(worker, request, body) for worker in range(len(worker_urls))))
+        for response in responses:
+            if response.status_code != 200:
+                return response
+        merged = json.loads(responses[0].body)
+        for response in responses[1:]:
+            merged["results"].extend(json.loads(response.body)["results"])
+        merged["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return merged
+
+    async def merged_lines():
+        queue : asyncio.Queue = asyncio.Queue()
+
+        async def read(worker):
+            try:
+                async with get_client().stream("POST", worker_urls[worker] + request.url.path, content=body,
+                                               headers=worker_headers(request)) as r:
+                    async for line in r.aiter_lines():
+                        if line:
+                            await queue.put(line + "\n")
+            except httpx.TransportError as e:
+                await queue.put(json.dumps({"error": f"aos-ssh worker {worker} unavailable: {e}"}) + "\n")
+            finally:
+                await queue.put(None)
+
+        tasks = [asyncio.create_task(read(worker)) for worker in range(len(worker_urls))]
+        try:
+            remaining = len(tasks)
+            while remaining:
+                line = await queue.get()
+                if line is None:
+                    remaining -= 1
+                else:
+                    yield line
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(merged_lines(), media_type="application/x-ndjson")
+
+
+async def broadcast(request: Request) -> list[Response]:
+    body = await request.body()
+    return await asyncio.gather(*(forward(worker, request, body) for worker in range(len(worker_urls))))
+
+
+@dispatcher_app.api_route("/management/{path:path}", methods=["GET", "POST", "DELETE"])
+async def dispatch_management(path: str, request: Request):
+    """The first worker writes the host file, the others reload it."""
+    response = await forward(0, request)
+    if request.method != "GET" and response.status_code < 300:
+        await asyncio.gather(*(get_client().post(worker_urls[worker] + "/management/reload") for worker in range(1, len(worker_urls))),
+                             return_exceptions=True)
+    return response
+
+
+@dispatcher_app.post("/snapshots/collect/{job}")
+async def dispatch_collector_job(job: str, request: Request):
+    responses = await broadcast(request)
+    for response in responses:
+        if response.status_code != 200:
+            return response
+    return {"job": job, "snapshots": sum(json.loads(response.body)["snapshots"] for response in responses)}
+
+
+@dispatcher_app.get("/cache/stats")
+async def dispatch_cache_stats(request: Request):
+    stats = {}
+    for response in await broadcast(request):
+        for name, value in json.loads(response.body).items():
+            stats[name] = stats.get(name, 0) + value if isinstance(value, (int, float)) else value
+    return stats
+
+
+@dispatcher_app.get("/metrics")
+async def dispatch_metrics(request: Request):
+    """Metrics of all workers, with a `worker` label."""
+    lines, seen = [], set()
+    for worker, response in enumerate(await broadcast(request)):
+        for line in response.body.decode().splitlines():
+            if line.startswith("#"):
+                if line not in seen:
+                    seen.add(line)
+                    lines.append(line)
+            elif line:
+                name, _, value = line.rpartition(" ")
+                if name.endswith("}"):
+                    lines.append(f'{name[:-1]},worker="{worker}"}} {value}')
+                else:
+                    lines.append(f'{name}{{worker="{worker}"}} {value}')
+    return Response("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+
+@dispatcher_app.api_route("/{path:path}", methods=["GET"])
+async def dispatch_read(path: str, request: Request):
+    """Inventory and snapshot reads, answered by the first worker."""
+    return await forward(0, request)
+
+
+def start_worker(index: int, worker_args: list[str], port: int) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", "ale_aos_ssh", *worker_args,
+                             "--worker-index", str(index), "--port", str(port)])
+
+
+def supervise_workers(worker_args: list[str], base_port: int):
+    """Restarts the workers which exit."""
+    while True:
+        time.sleep(1)
+        for index, process in enumerate(worker_processes):
+            if process.poll() is not None:
+                logger.error(f"aos-ssh worker {index} exited with {process.returncode}, restarting it")
+                worker_processes[index] = start_worker(index, worker_args, base_port + index)
+
+
+def stop_workers():
+    for process in worker_processes:
+        if process.poll() is None:
+            process.terminate()
+    for process in worker_processes:
+        process.wait()
+
+
+def run_dispatcher(workers: int, port: int, base_port: int, worker_args: list[str], log_level: str):
+    """Starts the worker processes on base_port, base_port + 1... and serves the dispatcher on port."""
+    sharding.configure(workers)
+    for index in range(workers):
+        worker_urls.append(f"http://127.0.0.1:{base_port + index}")
+        worker_processes.append(start_worker(index, worker_args, base_port + index))
+    atexit.register(stop_workers)
+    threading.Thread(target=supervise_workers, args=(worker_args, base_port), daemon=True).start()
+    logger.info(f"Dispatching to {workers} aos-ssh workers: {worker_urls}")
+    uvicorn.run(dispatcher_app, host="0.0.0.0", port=port, log_level=log_level)
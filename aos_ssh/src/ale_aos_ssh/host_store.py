@@ -0,0 +1,288 @@
+import atexit
+import dataclasses
+import errno
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Iterable, Optional
+
+from .device_manager import Device, JumpHost, inventory
+
+logger = logging.getLogger("aos-ssh")
+
+# Fields whose change makes the open sessions of a device or jump host stale
+DEVICE_CONNECTION_FIELDS = ("user", "password", "port", "jump_ssh_name")
+JUMP_HOST_CONNECTION_FIELDS = ("public_host", "public_port", "private_host", "private_port", "user", "password")
+
+
+def _connection(entry, fields: tuple[str, ...]) -> tuple:
+    return tuple(getattr(entry, name) for name in fields)
+
+
+class HostStore:
+    """
+    Persistence of the inventory to the host file.
+    Management changes are appended to a journal (<host file>.journal, one json line per change)
+    and applied to the inventory under the same lock, so a change is durable once it is written.
+    The journal is compacted in the background: the whole inventory is written to a temporary
+    file which atomically replaces the host file, then the journal is emptied. When the host file
+    can't be replaced (a single file bind mounted in a container), the temporary file is kept as
+    <host file>.compact while the host file is rewritten in place.
+    At startup, the host file (or a .compact file left by an interrupted rewrite) is loaded and the
+    journal replayed on top of it. Pending changes are compacted when the server exits.
+    Changes made to the host file by others are applied with reload().
+    A read only store (workers of the multi-process mode but the first one) never writes
+    the files, it follows the changes of the writer with reload().
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.path : Optional[str] = None
+        self.journal_path : Optional[str] = None
+        self.compact_path : Optional[str] = None
+        self.journal = None
+        self.pending = 0 # changes in the journal not yet compacted into the host file
+        self.disk_state : Optional[tuple] = None # host file modification time and journal size when last read or written
+        self.read_only = False
+        self.compact_interval = 30 # seconds between compactions when there are pending changes
+        self.compact_after = 1000 # pending changes triggering a compaction without waiting
+        self.fsync = True
+        self.compaction_requested = threading.Event()
+        self.thread : Optional[threading.Thread] = None
+
+    def configure(self, config: dict):
+        """Settings of the `persistence` section of aos-ssh-conf.yaml."""
+        self.compact_interval = config.get("compact_interval", self.compact_interval)
+        self.compact_after = config.get("compact_after", self.compact_after)
+        self.fsync = config.get("fsync", self.fsync)
+
+    def load(self, path: str):
+        """Loads the host file and replays the journal left by a previous run, then compacts it."""
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.compact_path = path + ".compact"
+        with self.lock:
+            jump_hosts, devices, replayed = self._read()
+            for jump_host in jump_hosts.values():
+                inventory.set_jump_host(jump_host)
+            for device in devices.values():
+                inventory.set_device(device)
+        if replayed:
+            logger.info(f"Replayed {replayed} changes from {self.journal_path}")
+        if (replayed or os.path.exists(self.compact_path)) and not self.read_only:
+            self.compact()
+
+    def _read(self) -> tuple[dict[str, JumpHost], dict[str, Device], int]:
+        """Jump hosts by name and devices by host of the host file with the journal replayed on top,
+        and the number of replayed changes. Called with the lock held."""
+        disk_state = self._disk_state()
+        # a complete inventory left by an interrupted in place rewrite of the host file
+        path = self.compact_path if os.path.exists(self.compact_path) else self.path
+        if path != self.path:
+            logger.warning(f"Loading {path} left by an interrupted rewrite of {self.path}")
+        with open(path) as f:
+            data = json.load(f)
+        if isinstance(data, list): # host list saved by previous versions
+            data = {"hosts": data}
+        jump_hosts = {jump_host.name: jump_host for jump_host in map(JumpHost.parse, data.get('jump_ssh_hosts', []))}
+        devices = {device.host: device for device in map(Device.parse, data.get('hosts', []))}
+        replayed = self._replay(jump_hosts, devices)
+        self.disk_state = disk_state
+        return jump_hosts, devices, replayed
+
+    def _replay(self, jump_hosts: dict[str, JumpHost], devices: dict[str, Device]) -> int:
+        if not os.path.exists(self.journal_path):
+            return 0
+        count = 0
+        with open(self.journal_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Ignoring truncated journal entry in {self.journal_path}")
+                    break # only the last write of a crashed process can be incomplete
+                if entry.get("op") == "set_device":
+                    device = Device.parse(entry["device"])
+                    devices[device.host] = device
+                elif entry.get("op") == "set_jump_host":
+                    jump_host = JumpHost.parse(entry["jump_host"])
+                    jump_hosts[jump_host.name] = jump_host
+                elif entry.get("op") == "remove_device":
+                    devices.pop(entry["host"], None)
+                count += 1
+        return count
+
+    def _disk_state(self) -> tuple:
+        journal_size = os.stat(self.journal_path).st_size if os.path.exists(self.journal_path) else 0
+        return os.stat(self.path).st_mtime_ns, journal_size
+
+    def changed_on_disk(self) -> bool:
+        """True when the host file or the journal were modified by someone else since they were last read or written."""
+        try:
+            return self.path is not None and self._disk_state() != self.disk_state
+        except OSError:
+            return False
+
+    def reload(self) -> tuple[list[Device], list[JumpHost]]:
+        """
+        Applies the host file, as modified by someone else, to the inventory. Changes still in
+        the journal are newer than the file and are kept.
+        returns:
+            (devices, jump hosts) removed or whose connection settings changed, their sessions are stale
+        """
+        stale_devices : list[Device] = []
+        stale_jump_hosts : list[JumpHost] = []
+        with self.lock:
+            jump_hosts, devices, _ = self._read()
+            with inventory.lock:
+                for name, jump_host in list(inventory.jump_hosts.items()):
+                    new_jump_host = jump_hosts.get(name)
+                    if new_jump_host is None:
+                        inventory.remove_jump_host(name)
+                    if new_jump_host is None or _connection(new_jump_host, JUMP_HOST_CONNECTION_FIELDS) != _connection(jump_host, JUMP_HOST_CONNECTION_FIELDS):
+                        stale_jump_hosts.append(jump_host)
+                for jump_host in jump_hosts.values():
+                    if inventory.get_jump_host(jump_host.name) != jump_host:
+                        inventory.set_jump_host(jump_host)
+                for host, device in list(inventory.devices.items()):
+                    new_device = devices.get(host)
+                    if new_device is None:
+                        inventory.remove_device(host)
+                    if new_device is None or _connection(new_device, DEVICE_CONNECTION_FIELDS) != _connection(device, DEVICE_CONNECTION_FIELDS):
+                        stale_devices.append(device)
+                added = 0
+                for device in devices.values():
+                    if inventory.get_device(device.host) != device:
+                        added += inventory.get_device(device.host) is None
+                        inventory.set_device(device)
+        logger.info(f"Reloaded {self.path}: {len(devices)} devices ({added} added), {len(jump_hosts)} jump ssh hosts, "
+                    f"stale sessions of {len(stale_devices)} devices and {len(stale_jump_hosts)} jump ssh hosts")
+        return stale_devices, stale_jump_hosts
+
+    def _append(self, entries: list[dict]):
+        """Writes journal entries, called with the lock held."""
+        if self.journal_path is None:
+            return # no host file loaded, changes are kept in memory only
+        if self.read_only:
+            logger.warning(f"Read only host store, change not saved: {entries}")
+            return
+        if self.journal is None:
+            self.journal = open(self.journal_path, "a")
+        self.journal.write("".join(json.dumps(entry) + "\n" for entry in entries))
+        self.journal.flush()
+        if self.fsync:
+            os.fsync(self.journal.fileno())
+        self.pending += len(entries)
+        self.disk_state = self._disk_state()
+        if self.pending >= self.compact_after:
+            self.compaction_requested.set()
+
+    def set_devices(self, devices: Iterable[Device], jump_hosts: Iterable[JumpHost] = ()) -> tuple[int, int]:
+        """Creates or updates devices and jump hosts with a single journal write, returns (created, updated) device counts."""
+        created = updated = 0
+        entries = []
+        with self.lock:
+            for jump_host in jump_hosts:
+                inventory.set_jump_host(jump_host)
+                entries.append({"op": "set_jump_host", "jump_host": dataclasses.asdict(jump_host)})
+            for device in devices:
+                if device.tags is None:
+                    device.tags = []
+                if inventory.set_device(device) is None:
+                    created += 1
+                else:
+                    updated += 1
+                entries.append({"op": "set_device", "device": dataclasses.asdict(device)})
+            self._append(entries)
+        return created, updated
+
+    def remove_device(self, host: str) -> Optional[Device]:
+        """Removes a device, returns it or None if unknown."""
+        with self.lock:
+            device = inventory.remove_device(host)
+            if device is not None:
+                self._append([{"op": "remove_device", "host": host}])
+        return device
+
+    def compact(self):
+        """Writes the inventory to the host file atomically and empties the journal."""
+        with self.lock:
+            with inventory.lock:
+                data = {
+                    "jump_ssh_hosts": [dataclasses.asdict(j) for j in inventory.jump_hosts.values()],
+                    "hosts": [dataclasses.asdict(d) for d in inventory.devices.values()],
+                }
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(prefix=".aos-ssh-host.", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(data, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                if os.path.exists(self.path):
+                    os.chmod(tmp_path, os.stat(self.path).st_mode & 0o777)
+                try:
+                    os.replace(tmp_path, self.path)
+                    if os.path.exists(self.compact_path):
+                        os.unlink(self.compact_path)
+                except OSError as e:
+                    if e.errno not in (errno.EBUSY, errno.EXDEV):
+                        raise
+                    self._write_in_place(tmp_path, data)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+            # The host file now holds every journaled change
+            if self.journal is not None:
+                self.journal.close()
+            self.journal = open(self.journal_path, "w")
+            self.pending = 0
+            self.disk_state = self._disk_state()
+        logger.info(f"Saved {len(data['hosts'])} devices and {len(data['jump_ssh_hosts'])} jump ssh hosts to {self.path}")
+
+    def _write_in_place(self, tmp_path: str, data: dict):
+        """Rewrites the host file in place when it can't be replaced (bind mounted file, other file system).
+        The complete inventory is kept as the .compact file until the host file is written, so a crash
+        while it is truncated loses nothing. Called with the lock held."""
+        os.replace(tmp_path, self.compact_path)
+        with open(self.path, "r+") as f:
+            f.truncate(0)
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.unlink(self.compact_path)
+
+    def flush(self):
+        """Compacts the pending changes, so they don't stay in the journal once the server is stopped."""
+        if self.pending and not self.read_only:
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"Failed to save {self.path}, {self.pending} changes left in {self.journal_path}: {e}")
+
+    def compaction_thread(self):
+        while True:
+            self.compaction_requested.wait(self.compact_interval)
+            self.compaction_requested.clear()
+            if self.pending == 0:
+                continue
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"Failed to save {self.path}, {self.pending} changes left in {self.journal_path}: {e}")
+                time.sleep(self.compact_interval)
+
+    def start(self):
+        """Starts the background compaction thread."""
+        if self.thread is None and self.path is not None and not self.read_only:
+            self.thread = threading.Thread(target=self.compaction_thread, daemon=True)
+            self.thread.start()
+            atexit.register(self.flush)
+            logger.info(f"Host file compaction thread started, interval: {self.compact_interval}s, after {self.compact_after} changes")
+
+
+host_store = HostStore()
@@ -0,0 +1,188 @@
+import threading
+import time
+import logging
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from .device_manager import inventory
+
+logger = logging.getLogger("aos-ssh")
+
+# Labelling of per-switch metrics, see `metrics` section of aos-ssh-conf.yaml
+#  - host: label by switch host, tag: label by first switch tag, none: no per-switch label
+LABEL_BY = "host"
+# Distinct target label values kept, others are reported as "other"
+MAX_LABEL_VALUES = 200
+OTHER_LABEL = "other"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def configure(metrics_config: dict):
+    """Apply the `metrics` section of aos-ssh-conf.yaml."""
+    global LABEL_BY, MAX_LABEL_VALUES
+    LABEL_BY = metrics_config.get("label_by", LABEL_BY)
+    MAX_LABEL_VALUES = metrics_config.get("max_label_values", MAX_LABEL_VALUES)
+    logger.info(f"Metrics label by: {LABEL_BY}, max label values: {MAX_LABEL_VALUES}")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self._lock = threading.Lock()
+        self._values: dict[tuple, object] = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.label_names)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return super().render() + [f"{self.name}{_format_labels(self.label_names, key)} {value}" for key, value in values]
+
+
+class Gauge(_Metric):
+    """Gauge computed when scraped by a callback returning {label values: value}."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, label_names: tuple[str, ...] = (), callback: Callable[[], dict] = None):
+        super().__init__(name, help, label_names)
+        self.callback = callback
+
+    def render(self) -> list[str]:
+        try:
+            values = self.callback().items()
+        except Exception as e:
+            logger.info(f"Failed to collect {self.name}: {e}")
+            values = []
+        return super().render() + [f"{self.name}{_format_labels(self.label_names, key)} {value}" for key, value in values]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, label_names: tuple[str, ...] = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, label_names)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with self._lock:
+            values = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+_label_values : set[str] = set()
+_label_values_lock = threading.Lock()
+
+def target_label(host: str, jump_name: Optional[str] = None, is_jump_box: bool = False) -> str:
+    """Per-switch label value, capped to MAX_LABEL_VALUES distinct values."""
+    if LABEL_BY == "none":
+        return ""
+    if is_jump_box:
+        value = f"jump:{jump_name}"
+    elif LABEL_BY == "tag":
+        device = inventory.get_device(host)
+        value = device.tags[0] if device is not None and device.tags else ""
+    else:
+        value = host
+    if value in _label_values:
+        return value
+    with _label_values_lock:
+        if len(_label_values) >= MAX_LABEL_VALUES:
+            return OTHER_LABEL
+        _label_values.add(value)
+    return value
+
+
+STAGE_SECONDS = Histogram("aos_ssh_stage_duration_seconds",
+                          "Duration of session and command stages (jump_connect, jump_channel, connect, liveness_probe, session_lock_wait, channel_wait, exec, read)",
+                          ("stage", "target"))
+RECONNECTS = Counter("aos_ssh_reconnects_total", "SSH sessions re-created after being found inactive or broken", ("target",))
+FAILURES = Counter("aos_ssh_failures_total", "Failed session creations and command executions", ("stage", "target"))
+COMMANDS = Counter("aos_ssh_commands_total", "Commands executed on switches", ("target",))
+EVICTIONS = Counter("aos_ssh_session_evictions_total", "Idle sessions closed to stay under ssh.max_open_sessions")
+SCHEDULER_REJECTIONS = Counter("aos_ssh_scheduler_rejections_total", "Commands rejected with 429 by the device scheduler", ("priority",))
+
+metrics : list[_Metric] = [STAGE_SECONDS, RECONNECTS, FAILURES, COMMANDS, EVICTIONS, SCHEDULER_REJECTIONS]
+
+
+def register_gauge(name: str, help: str, callback: Callable[[], dict], label_names: tuple[str, ...] = ()):
+    metrics.append(Gauge(name, help, label_names, callback))
+
+
+@contextmanager
+def timed(stage: str, target: str):
+    """Observe the duration of the block as a stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage, target=target)
+
+
+@contextmanager
+def timed_enter(context_manager, stage: str, target: str):
+    """Enter a context manager (lock, channel pool, ...) observing how long entering it took as a stage."""
+    start = time.perf_counter()
+    with context_manager as value:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage, target=target)
+        yield value
+
+
+def render() -> str:
+    """Metrics in prometheus text exposition format."""
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
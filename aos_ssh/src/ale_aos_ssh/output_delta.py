@@ -0,0 +1,104 @@
+import difflib
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger("aos-ssh")
+
+
+def _field_change(old: str, new: str) -> Optional[str]:
+    """`a b [old->new] c` when two lines only differ by some whitespace separated fields, else None."""
+    old_fields, new_fields = old.split(), new.split()
+    if len(old_fields) != len(new_fields):
+        return None
+    return " ".join(n if o == n else f"[{o}->{n}]" for o, n in zip(old_fields, new_fields))
+
+
+def _first_field(line: str) -> Optional[str]:
+    fields = line.split(None, 1)
+    return fields[0] if fields else None
+
+
+def _pair_lines(previous: list[str], current: list[str]) -> list[tuple[Optional[int], Optional[int]]]:
+    """
+    Pairs the lines of a replaced block, (previous index, current index) with None for a removed or added line.
+    Table rows are paired by their first field (port, vlan, address...), other lines by position.
+    """
+    previous_keys = [_first_field(line) for line in previous]
+    if len(set(previous_keys)) != len(previous_keys):
+        previous_keys = list(range(len(previous)))
+        current_keys = list(range(len(current)))
+    else:
+        current_keys = [_first_field(line) for line in current]
+    remaining = {key: i for i, key in enumerate(previous_keys)}
+    pairs = [(remaining.pop(key, None), j) for j, key in enumerate(current_keys)]
+    removed = [(i, None) for i in remaining.values()]
+    return removed + pairs
+
+
+def line_delta(previous: list[str], current: list[str]) -> list[str]:
+    """
+    Compact diff of two outputs, one entry per changed line, numbered as in the current output:
+    `~12: a [old->new] c` for changed fields, `-12: line` for removed and `+12: line` for added lines.
+    """
+    delta = []
+    matcher = difflib.SequenceMatcher(None, previous, current, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        for i, j in _pair_lines(previous[i1:i2], current[j1:j2]):
+            if i is None:
+                delta.append(f"+{j1 + j + 1}: {current[j1 + j]}")
+                continue
+            if j is None:
+                delta.append(f"-{j1 + 1}: {previous[i1 + i]}")
+                continue
+            change = _field_change(previous[i1 + i], current[j1 + j])
+            if change is not None:
+                delta.append(f"~{j1 + j + 1}: {change}")
+            else:
+                delta.append(f"-{j1 + j + 1}: {previous[i1 + i]}")
+                delta.append(f"+{j1 + j + 1}: {current[j1 + j]}")
+    return delta
+
+
+class OutputHistory:
+    """
+    Last output of each (host, normalized command) returned with `since=last`, to send only what
+    changed on the next call. Bounded by max_entries and max_bytes, least recently used outputs
+    are dropped first.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._outputs : OrderedDict[tuple[str, str], tuple[float, str]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def configure(self, config: dict):
+        """Apply the `output_delta` section of aos-ssh-conf.yaml."""
+        with self._lock:
+            self.max_entries = config.get("max_entries", self.max_entries)
+            self.max_bytes = config.get("max_bytes", self.max_bytes)
+        logger.info(f"Output delta max entries: {self.max_entries}, max bytes: {self.max_bytes}")
+
+    def swap(self, host: str, command: str, output: str) -> Optional[tuple[float, str]]:
+        """Stores the output of a command, returns the previous one as (time, output) or None."""
+        key = (host, " ".join(command.split()))
+        with self._lock:
+            previous = self._outputs.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[1])
+            if len(output) <= self.max_bytes:
+                self._outputs[key] = (time.time(), output)
+                self._bytes += len(output)
+            while self._outputs and (len(self._outputs) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, dropped) = self._outputs.popitem(last=False)
+                self._bytes -= len(dropped)
+        return previous
+
+
+output_history = OutputHistory()
@@ -0,0 +1,101 @@
+import re
+import secrets
+import threading
+import time
+import logging
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+
+logger = logging.getLogger("aos-ssh")
+
+
+@lru_cache(maxsize=256)
+def compile_filter(pattern: str) -> re.Pattern:
+    return re.compile(pattern)
+
+
+def select_lines(output: str, include: Optional[str] = None, exclude: Optional[str] = None,
+                 line_start: int = 0, line_end: Optional[int] = None) -> list[str]:
+    """
+    Lines of a command output matching include and not matching exclude (re.search),
+    then sliced to [line_start, line_end) of the remaining lines.
+    Raises re.error for an invalid regex.
+    """
+    lines = output.splitlines()
+    if include:
+        regex = compile_filter(include)
+        lines = [line for line in lines if regex.search(line)]
+    if exclude:
+        regex = compile_filter(exclude)
+        lines = [line for line in lines if not regex.search(line)]
+    return lines[line_start:line_end]
+
+
+class OutputPages:
+    """
+    Outputs held server side to be read page by page with a cursor.
+    A cursor is `<output id>.<first line>`, outputs expire ttl seconds after their last read and
+    the least recently read ones are dropped above max_entries.
+    """
+
+    def __init__(self, ttl: float = 300, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.id_prefix = "" # `<worker index>_` in multi-process mode, for the dispatcher to route cursors
+        self._outputs : OrderedDict[str, tuple[float, int, list[str]]] = OrderedDict() # id -> (expiry, page size, lines)
+        self._lock = threading.Lock()
+
+    def configure(self, config: dict):
+        """Apply the `output_pages` section of aos-ssh-conf.yaml."""
+        with self._lock:
+            self.ttl = config.get("ttl", self.ttl)
+            self.max_entries = config.get("max_entries", self.max_entries)
+        logger.info(f"Output pages ttl: {self.ttl}, max entries: {self.max_entries}")
+
+    def _purge(self, now: float):
+        for output_id, (expiry, _, _) in list(self._outputs.items()):
+            if expiry <= now:
+                del self._outputs[output_id]
+        while len(self._outputs) > self.max_entries:
+            self._outputs.popitem(last=False)
+
+    def first_page(self, lines: list[str], page_size: int) -> tuple[list[str], Optional[str]]:
+        """First page of lines and the cursor of the next page, the lines are only held if there is one."""
+        if len(lines) <= page_size:
+            return lines, None
+        output_id = self.id_prefix + secrets.token_urlsafe(12)
+        now = time.monotonic()
+        with self._lock:
+            self._outputs[output_id] = (now + self.ttl, page_size, lines)
+            self._purge(now)
+        return lines[:page_size], f"{output_id}.{page_size}"
+
+    def page(self, cursor: str) -> Optional[tuple[list[str], Optional[str], int, int]]:
+        """
+        Page of an held output.
+        returns:
+            (lines, next page cursor, index of the first line, total lines) or None if the cursor is unknown or expired
+        """
+        output_id, _, start = cursor.rpartition(".")
+        if not start.isdigit():
+            return None
+        start = int(start)
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            entry = self._outputs.get(output_id)
+            if entry is None:
+                return None
+            _, page_size, lines = entry
+            end = start + page_size
+            if end < len(lines):
+                self._outputs[output_id] = (now + self.ttl, page_size, lines)
+                self._outputs.move_to_end(output_id)
+                next_cursor = f"{output_id}.{end}"
+            else:
+                next_cursor = None
+        return lines[start:end], next_cursor, start, len(lines)
+
+
+output_pages = OutputPages()
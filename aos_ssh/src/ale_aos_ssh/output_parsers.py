@@ -0,0 +1,114 @@
+import re
+import logging
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger("aos-ssh")
+
+# Column separator line of aos tables, ex: "------+-------+-------+------"
+TABLE_SEPARATOR = re.compile(r"^\s*-{2,}[-+ ]*$")
+COLUMN_SPAN = re.compile(r"-+")
+HEADER_WORD = re.compile(r"\S+")
+# "Key : value" / "Key: value," (a colon followed by a digit is part of a value, ex: 09:31:54)
+KEY_VALUE = re.compile(r"^\s*(?P<key>[^:]+?)\s*:(?:\s+|$)(?P<value>.*?),?\s*$")
+INTERFACE_BLOCK = re.compile(r"^\s*(Chassis/)?Slot/Port\s*:", re.IGNORECASE)
+
+
+def _column_name(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", name.strip().lower()).strip("_")
+
+
+def parse_table(output: str) -> Optional[dict]:
+    """
+    Parse a fixed-width aos table. Column boundaries are given by the dash runs of the
+    separator line, header lines above it are merged per column.
+    returns:
+        {"columns": [...], "rows": [[...]], "summary": [...]} or None if there is no table.
+    """
+    lines = output.splitlines()
+    separator_index = next((i for i, line in enumerate(lines) if TABLE_SEPARATOR.match(line)), None)
+    if separator_index is None:
+        return None
+    starts = [m.start() for m in COLUMN_SPAN.finditer(lines[separator_index])]
+    bounds = list(zip(starts, starts[1:] + [None]))
+
+    header_start = separator_index
+    while header_start > 0 and lines[header_start - 1].strip():
+        header_start -= 1
+    columns = [""] * len(bounds)
+    for line in lines[header_start:separator_index]:
+        # Header words may overhang their column, each word goes to the column it overlaps most
+        for word in HEADER_WORD.finditer(line):
+            overlaps = [min(word.end(), end if end is not None else word.end()) - max(word.start(), start)
+                        for start, end in bounds]
+            i = overlaps.index(max(overlaps))
+            columns[i] = f"{columns[i]} {word.group()}".strip()
+    rows = []
+    for line in lines[separator_index + 1:]:
+        if not line.strip():
+            continue
+        rows.append([line[start:end].strip() for start, end in bounds])
+    return {
+        "columns": [_column_name(column) or f"column_{i}" for i, column in enumerate(columns)],
+        "rows": rows,
+        "summary": [line.strip() for line in lines[:header_start] if line.strip()],
+    }
+
+
+def parse_key_values(output: str) -> Optional[dict]:
+    """Parse "Key : value," lines, ex: show system, show chassis, show hardware-info."""
+    result = {}
+    for line in output.splitlines():
+        match = KEY_VALUE.match(line)
+        if match:
+            result[_column_name(match["key"])] = match["value"].strip()
+    return result or None
+
+
+def parse_interfaces(output: str) -> Optional[list[dict]]:
+    """Parse show interfaces output into one dict per port."""
+    ports = []
+    for line in output.splitlines():
+        if INTERFACE_BLOCK.match(line):
+            ports.append({})
+        if not ports:
+            continue
+        # Counter lines hold several pairs: "Bytes Received  :  7467420, Unicast Frames :  21354,"
+        for part in re.split(r",\s+(?=[A-Za-z][^:,]*:)", line):
+            match = KEY_VALUE.match(part)
+            if match:
+                ports[-1][_column_name(match["key"])] = match["value"].strip()
+    return ports or None
+
+
+# (command regex, parser) compiled once at startup, first match wins
+PARSERS : list[tuple[re.Pattern, Callable[[str], Any]]] = [
+    (re.compile(p), parser) for p, parser in [
+        (r"show vlan( \d+)?$", parse_table),
+        (r"show vlan( \d+)? members( port \S+)?$", parse_table),
+        (r"show ip routes?\b.*$", parse_table),
+        (r"show ip interface$", parse_table),
+        (r"show linkagg\b.*$", parse_table),
+        (r"show powersupply\b.*$", parse_table),
+        (r"show virtual-chassis topology$", parse_table),
+        (r"show interfaces( \S+)? status$", parse_table),
+        (r"show interfaces( \d+/\d+(/\d+)?)?$", parse_interfaces),
+        (r"show (system|chassis|hardware-info)$", parse_key_values),
+    ]
+]
+
+
+def get_parser(command: str) -> Optional[Callable[[str], Any]]:
+    command = " ".join(command.split())
+    return next((parser for pattern, parser in PARSERS if pattern.match(command)), None)
+
+
+def parse_output(command: str, output: str) -> Optional[Any]:
+    """Structured form of a command output, or None when the command has no parser or parsing fails."""
+    parser = get_parser(command)
+    if parser is None or output is None:
+        return None
+    try:
+        return parser(output)
+    except Exception as e:
+        logger.info(f"Failed to parse output of '{command}': {e}")
+        return None
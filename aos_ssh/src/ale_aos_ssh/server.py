@@ -1,21 +1,51 @@
 
-import dataclasses
+import datetime
 import json
-from typing import Optional
-from .device_manager import Device, JumpHost, devices, jump_ssh_boxes, get_device_by_host 
-from fastapi import FastAPI, HTTPException, Query
+import re
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Literal, Optional
+from .device_manager import Device, JumpHost, inventory, get_device_by_host 
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 import uvicorn
 from . import ssh_session_manager as SSHSessionManager
-from pydantic import BaseModel
+from . import metrics as Metrics
+from . import warm_pool as WarmPool
+from .channel_pool import ChannelWaitTimeout
+from .collector import collector
+from .command_cache import command_cache
+from .command_policy import command_policy
+from .device_scheduler import DeviceBusy, device_scheduler
+from .host_store import host_store
+from . import sharding
+from .output_parsers import parse_output
+from .output_delta import line_delta, output_history
+from .output_pages import output_pages, select_lines
+from pydantic import BaseModel, Field
 import argparse
 import os
 import logging
 import yaml
-import re
 
 aos_host_file : str = "data/aos-ssh-host.json"
 allowed_aos_commands : list[str] = []
 
+# Batch execution limits, see `batch` section of aos-ssh-conf.yaml
+BATCH_MAX_WORKERS = 32
+BATCH_MAX_PER_JUMP_HOST = 8
+batch_executor : Optional[ThreadPoolExecutor] = None
+batch_executor_lock = threading.Lock()
+jump_host_semaphores : dict[str, threading.BoundedSemaphore] = {}
+jump_host_semaphores_lock = threading.Lock()
+
+# Seconds between checks of the config and host files modification time (0: no live reload), see `reload` section
+RELOAD_INTERVAL = 5
+
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s.%(msecs)03d %(levelname)s %(module)s - %(funcName)s: %(message)s',
                     datefmt='%Y-%m-%d %H:%M:%S',)
@@ -23,12 +53,7 @@ logger = logging.getLogger("aos-ssh")
 app = FastAPI(debug=True)
 
 def load_host(aos_file):
-    with open(aos_file) as f:
-        data = json.load(f)
-        for fields in data.get('jump_ssh_hosts',[]) :
-            JumpHost.load(fields)
-        for fields in data.get('hosts',[]) :
-            Device.load(fields)
+    host_store.load(aos_file)
 
 
 def load_config(config_file):
@@ -38,17 +63,68 @@ def load_config(config_file):
             ssh_config = yaml.safe_load(f)
             globals()["allowed_aos_commands"] = ssh_config.get("allowed_aos_commands", [])
             logger.info(f"Allowed commands: {globals()['allowed_aos_commands']}")
+            command_policy.configure(allowed_aos_commands, ssh_config.get("command_profiles"),
+                                     ssh_config.get("tag_command_profiles"),
+                                     ssh_config.get("command_decision_cache_size", 4096))
+            SSHSessionManager.configure(ssh_config.get("ssh") or {})
+            command_cache.configure(ssh_config.get("command_cache") or {})
+            Metrics.configure(ssh_config.get("metrics") or {})
+            WarmPool.configure(ssh_config.get("warm_pool") or {})
+            host_store.configure(ssh_config.get("persistence") or {})
+            output_pages.configure(ssh_config.get("output_pages") or {})
+            output_history.configure(ssh_config.get("output_delta") or {})
+            collector.configure(ssh_config.get("collector") or {})
+            device_scheduler.configure(ssh_config.get("scheduler") or {})
+            configure_batch(ssh_config.get("batch") or {})
+            globals()["RELOAD_INTERVAL"] = (ssh_config.get("reload") or {}).get("interval", RELOAD_INTERVAL)
         except yaml.YAMLError as exc:
             logger.error(exc)
 
 
-def check_command(command: str) -> bool:
-    """Check if the command is allowed."""
-    logger.info(f"Checking command: {command}, allowed commands: {allowed_aos_commands}")
-    for allowed in allowed_aos_commands:
-        if re.match(allowed, command):
-            return True
-    return False
+def reload_host():
+    """Applies changes of the host file, closing the sessions of removed devices and of those whose credentials, port or jump host changed."""
+    try:
+        stale_devices, stale_jump_hosts = host_store.reload()
+    except (OSError, ValueError) as e:
+        logger.error(f"Failed to reload {aos_host_file}, keeping current devices: {e}")
+        return
+    for jump_host in stale_jump_hosts:
+        SSHSessionManager.close_jump_host_sessions(jump_host.name)
+    for device in stale_devices:
+        SSHSessionManager.close_device_sessions(device.host)
+
+
+def file_mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def reload_thread(config_file: str):
+    """Polls the modification time of the config and host files and reloads them when they change."""
+    config_mtime = file_mtime(config_file)
+    while RELOAD_INTERVAL > 0:
+        time.sleep(RELOAD_INTERVAL)
+        mtime = file_mtime(config_file)
+        if mtime is not None and mtime != config_mtime:
+            config_mtime = mtime
+            logger.info(f"{config_file} changed, reloading config")
+            try:
+                load_config(config_file)
+            except Exception as e:
+                logger.error(f"Failed to reload {config_file}: {e}")
+        if host_store.changed_on_disk():
+            logger.info(f"{aos_host_file} changed, reloading devices")
+            reload_host()
+    logger.info("Live reload stopped")
+
+
+def check_command(command: str, device: Optional[Device] = None) -> bool:
+    """Check if the command is allowed, for the device command profiles if a device is given."""
+    allowed = command_policy.is_allowed(command, device)
+    logger.debug(f"Checking command: {command}, allowed: {allowed}")
+    return allowed
 
 
 @app.get("/")
@@ -59,29 +135,38 @@ def read_root():
 @app.post("/management/devices")
 def set_device(device: Device):
     """Create/upadte a device entry."""
-    current_device = get_device_by_host(device.host)
-    if current_device is not None:
-        devices.remove(current_device)
-    devices.append(device)
-    data = [dataclasses.asdict(d) for d in devices]
-    with open(aos_host_file, 'w') as fd:
-        json.dump(data, fd, indent=2)
+    host_store.set_devices([device])
     return {"status": "success", "device": device}
 
+
+class DeviceImport(BaseModel):
+    hosts: list[Device] = []
+    jump_ssh_hosts: list[JumpHost] = []
+
+@app.post("/management/devices/bulk")
+def set_devices(devices: DeviceImport):
+    """Create/update many devices and jump hosts at once, in the host file format."""
+    created, updated = host_store.set_devices(devices.hosts, devices.jump_ssh_hosts)
+    logger.info(f"Bulk import: {created} devices created, {updated} updated, {len(devices.jump_ssh_hosts)} jump ssh hosts")
+    return {"status": "success", "created": created, "updated": updated, "jump_ssh_hosts": len(devices.jump_ssh_hosts)}
+
 @app.delete("/management/devices/{host}")
 def delete_device(host: str):
     """Delete a device entry by IP address."""
-    device = get_device_by_host(host)
+    device = host_store.remove_device(host)
     if device is None:
         raise HTTPException(status_code=404, detail="Device not found")
-    devices.remove(device)
-    data = [dataclasses.asdict(d) for d in devices]
-    with open(aos_host_file, 'w') as fd:
-        json.dump(data, fd, indent=2)
     return {"status": "success", "message": f"Device {host} deleted successfully."}
 
 
     
+@app.post("/management/reload")
+def reload_devices():
+    """Reload the host file, used by the dispatcher of the multi-process mode after a change."""
+    reload_host()
+    return {"status": "success", "devices": len(inventory)}
+
+
 @app.get("/devices/{host}") 
 def get_device(host: str) -> Device:      
     """Get a device entry by host.""" 
@@ -96,65 +181,482 @@ def get_device(host: str) -> Device:
 
 
 @app.get("/devices")
-def read_devices(tags: Optional[list[str]] = Query(None, description="Filter devices by tags")) -> list[dict]:
-    def to_dict(device: Device) -> dict:
-        return {
-            "host": device.host,
-            "tags": device.tags,            
-        }
-    def device_matches_tags(device_dict: dict) -> bool:
-        if tags is None:
-            return True
-        # Return True if the device has at least one of the specified tags
-        return any(tag in device_dict['tags'] for tag in tags)
-    
-    arr = list(filter(device_matches_tags, map(to_dict, devices)))
-    return arr
+def read_devices(response: Response,
+                 tags: Optional[list[str]] = Query(None, description="Filter devices by tags"),
+                 offset: int = Query(0, ge=0, description="Index of the first device returned"),
+                 limit: Optional[int] = Query(None, ge=1, description="Max number of devices returned")) -> list[dict]:
+    """List devices having at least one of the tags, the total number of matching devices is set in X-Total-Count header."""
+    total, page = inventory.list_page(tags, offset, limit)
+    response.headers["X-Total-Count"] = str(total)
+    return page
     
 
+# Scheduling class of a request, see device_scheduler
+Priority = Literal["interactive", "bulk", "background"]
+
 class Command(BaseModel):
     host: str
     command: str 
+    no_cache: bool = False
+    format: Literal["raw", "structured"] = "raw"
+    # Raw output selection, applied in this order
+    include: Optional[str] = None # keep lines matching this regex
+    exclude: Optional[str] = None # drop lines matching this regex
+    line_start: int = Field(0, ge=0) # first line kept, after filtering
+    line_end: Optional[int] = Field(None, ge=0) # line after the last line kept
+    page_size: Optional[int] = Field(None, ge=1) # lines returned, the others are read with next_cursor
+    since: Optional[Literal["last"]] = None # only return the lines changed since the last `since=last` call
+    priority: Priority = "interactive"
 class CommandResponse(BaseModel):
     stdout: Optional[str] = None
     stderr :Optional[str] = None
+    format: Literal["raw", "structured"] = "raw"
+    structured: Optional[Any] = None
+    total_lines: Optional[int] = None # selected lines, when the output is filtered or paged
+    next_cursor: Optional[str] = None # cursor of the next page, GET /command/pages/{cursor}
+    delta: Optional[list[str]] = None # changed lines with `since=last`, stdout is not returned
+    delta_since: Optional[datetime.datetime] = None # time of the output the delta is computed from
+
+def select_output(command: Command, stdout: str) -> CommandResponse:
+    """Applies the line filters, range and first page of a command to its raw output."""
+    try:
+        lines = select_lines(stdout, command.include, command.exclude, command.line_start, command.line_end)
+    except re.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filter regex: {e}")
+    total_lines = len(lines)
+    next_cursor = None
+    if command.page_size is not None:
+        lines, next_cursor = output_pages.first_page(lines, command.page_size)
+    return CommandResponse(stdout="\n".join(lines), total_lines=total_lines, next_cursor=next_cursor)
+
+def delta_output(command: Command, stdout: str) -> Optional[CommandResponse]:
+    """Changes of the output (include/exclude applied) since the previous `since=last` call, None on the first call."""
+    previous = output_history.swap(command.host, command.command, stdout)
+    if previous is None:
+        return None
+    previous_at, previous_stdout = previous
+    try:
+        delta = line_delta(select_lines(previous_stdout, command.include, command.exclude),
+                           select_lines(stdout, command.include, command.exclude))
+    except re.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filter regex: {e}")
+    return CommandResponse(delta=delta, delta_since=datetime.datetime.fromtimestamp(previous_at, datetime.timezone.utc))
+
+def caller_id(request: Request) -> str:
+    """Caller of a request for the scheduler fairness: X-Aos-Caller header, or client address."""
+    return request.headers.get("x-aos-caller") or (request.client.host if request.client else "")
+
+
+def device_busy(e: DeviceBusy) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def run_command(device: Device, command: str, no_cache: bool = False, priority: Priority = "interactive",
+                caller: Optional[str] = None) -> tuple[Optional[str], Optional[str], Optional[str]]:
+    """Open (or reuse) the device session and run a command, going through the command output cache.
+    Cache misses wait for a slot of the device scheduler, DeviceBusy is raised when none is granted.
+    returns:
+        (stdout, stderr, error) where error is set when no session could be established.
+    """
+    def execute():
+        with device_scheduler.slot(device.host, priority, caller):
+            session, error_msg = SSHSessionManager.get_session(device)
+            if session is None:
+                return None, None, f"Failed to create SSH session: {error_msg}"
+            stdin, stdout, stderr = SSHSessionManager.execute_command(device.host, command, device.jump_ssh_name, device.exec_mode)
+        logger.debug(f"Command executed: {command} on {device.host}\n[stsdout]\n{stdout}\n[stderr]\n{stderr}")
+        return stdout, stderr, None
+
+    return command_cache.get_or_execute(device.host, command, execute, bypass=no_cache,
+                                        cacheable=lambda result: result[0] is not None and result[2] is None)
+
 
 @app.post("/command")
-def execute_command(command:Command):
+def execute_command(command:Command, request: Request):
     device = get_device_by_host(command.host)
     if device is None:
         raise HTTPException(status_code=404, detail="Device not found")
-    if not check_command(command.command):
+    if not check_command(command.command, device):
         raise HTTPException(status_code=403, detail=f"Command '{command.command}' is not allowed")
 #    session, error_msg = SSHSessionManager.get_or_create_session(command.host, device.user, device.password,port=device.port,jump_ssh_host=device)
-    session, error_msg = SSHSessionManager.get_session(device)
-    if session is None: 
-        raise HTTPException(status_code=404, detail=f"Failed to create SSH session: {error_msg}")
-    stdin, stdout, stderr = SSHSessionManager.execute_command(command.host, command.command, device.jump_ssh_name)
-    logger.debug(f"Command executed: {command.command} on {command.host}\n[stsdout]\n{stdout}\n[stderr]\n{stderr}")
+    try:
+        stdout, stderr, error_msg = run_command(device, command.command, command.no_cache, command.priority, caller_id(request))
+    except DeviceBusy as e:
+        raise device_busy(e)
+    except ChannelWaitTimeout as e:
+        raise HTTPException(status_code=503, detail=f"Device {device.host} busy: {e}", headers={"Retry-After": "5"})
+    if error_msg is not None: 
+        raise HTTPException(status_code=404, detail=error_msg)
+    if command.format == "structured":
+        structured = parse_output(command.command, stdout)
+        if structured is not None:
+            return CommandResponse(stderr=stderr, format="structured", structured=structured)
+    if stdout is not None and command.since == "last":
+        response = delta_output(command, stdout)
+        if response is not None:
+            response.stderr = stderr
+            return response
+    if stdout is not None and (command.include or command.exclude or command.line_start or
+                               command.line_end is not None or command.page_size is not None):
+        response = select_output(command, stdout)
+        response.stderr = stderr
+        return response
     return CommandResponse(
         stdout=stdout,
         stderr=stderr
     )
 
+
+@app.get("/command/pages/{cursor}")
+def read_command_page(cursor: str) -> CommandResponse:
+    """Next page of a command output returned with a next_cursor, outputs are held for `output_pages.ttl` seconds."""
+    page = output_pages.page(cursor)
+    if page is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired cursor, run the command again")
+    lines, next_cursor, _, total_lines = page
+    return CommandResponse(stdout="\n".join(lines), total_lines=total_lines, next_cursor=next_cursor)
+
+
+@app.post("/command/stream")
+async def execute_command_stream(command: Command, request: Request):
+    """Run a command and stream its output as newline delimited json while it runs (ex: ping, traceroute).
+    Lines are sent as {"line": ...}, then {"exit_status": ...} or {"error": ...}.
+    The command is stopped on the switch when the client disconnects. A device scheduler slot is held while it runs.
+    """
+    device = get_device_by_host(command.host)
+    if device is None:
+        raise HTTPException(status_code=404, detail="Device not found")
+    if not check_command(command.command, device):
+        raise HTTPException(status_code=403, detail=f"Command '{command.command}' is not allowed")
+    # The slot is taken before answering, to answer 429 when the device is busy
+    slot = device_scheduler.slot(device.host, command.priority, caller_id(request))
+    try:
+        await run_in_threadpool(slot.__enter__)
+    except DeviceBusy as e:
+        raise device_busy(e)
+    released = threading.Lock()
+
+    def release_slot():
+        """Releases the slot once, whichever of the stream end, the response end or the stream garbage collection comes first."""
+        if released.acquire(blocking=False):
+            slot.__exit__(None, None, None)
+
+    try:
+        session, error_msg = await run_in_threadpool(SSHSessionManager.get_session, device)
+    except BaseException:
+        release_slot()
+        raise
+    if session is None:
+        release_slot()
+        raise HTTPException(status_code=404, detail=f"Failed to create SSH session: {error_msg}")
+
+    async def stream():
+        cancel = threading.Event()
+        items = SSHSessionManager.stream_command(device.host, command.command, device.jump_ssh_name, cancel)
+        try:
+            while True:
+                item = await run_in_threadpool(next, items, None)
+                if item is None:
+                    break
+                kind, value = item
+                yield json.dumps({kind: value}) + "\n"
+        except Exception as e:
+            logger.info(f"Streaming of '{command.command}' on {device.host} failed: {e}")
+            yield json.dumps({"error": str(e)}) + "\n"
+        finally:
+            cancel.set() # stops the command when the client went away
+            try:
+                items.close()
+            except ValueError:
+                pass # still running in the threadpool, it returns within a second once cancel is set
+            release_slot()
+
+    # A stream never iterated (client gone before the response started) never runs its finally
+    output = stream()
+    weakref.finalize(output, release_slot)
+    return StreamingResponse(output, media_type="application/x-ndjson", background=BackgroundTask(release_slot))
+
+
+class CommandPipeline(BaseModel):
+    host: str
+    commands: list[str]
+    priority: Priority = "interactive"
+
+class PipelineCommandResult(BaseModel):
+    command: str
+    stdout: Optional[str] = None
+    stderr: Optional[str] = None
+    duration_ms: float = 0.0
+
+class PipelineResponse(BaseModel):
+    host: str
+    results: list[PipelineCommandResult]
+    duration_ms: float = 0.0
+
+
+@app.post("/commands/pipeline")
+def execute_command_pipeline(pipeline: CommandPipeline, request: Request) -> PipelineResponse:
+    """Run an ordered list of commands on one device, back-to-back on a single held session."""
+    device = get_device_by_host(pipeline.host)
+    if device is None:
+        raise HTTPException(status_code=404, detail="Device not found")
+    if not pipeline.commands:
+        raise HTTPException(status_code=400, detail="At least one command is required")
+    for command in pipeline.commands:
+        if not check_command(command, device):
+            raise HTTPException(status_code=403, detail=f"Command '{command}' is not allowed")
+    start = time.perf_counter()
+    try:
+        with device_scheduler.slot(device.host, pipeline.priority, caller_id(request)):
+            session, error_msg = SSHSessionManager.get_session(device)
+            if session is None:
+                raise HTTPException(status_code=404, detail=f"Failed to create SSH session: {error_msg}")
+            results = SSHSessionManager.execute_commands(device.host, pipeline.commands, device.jump_ssh_name, device.exec_mode)
+    except DeviceBusy as e:
+        raise device_busy(e)
+    except ChannelWaitTimeout as e:
+        raise HTTPException(status_code=503, detail=f"Device {device.host} busy: {e}", headers={"Retry-After": "5"})
+    if results is None:
+        raise HTTPException(status_code=404, detail=f"No active SSH session for {device.host}")
+    return PipelineResponse(
+        host=device.host,
+        results=[PipelineCommandResult(command=command, stdout=stdout, stderr=stderr, duration_ms=round(duration_ms, 3))
+                 for command, stdout, stderr, duration_ms in results],
+        duration_ms=round((time.perf_counter() - start) * 1000, 3)
+    )
+
+
+class BatchCommand(BaseModel):
+    command: str
+    hosts: Optional[list[str]] = None
+    tags: Optional[list[str]] = None
+    stream: bool = False
+    no_cache: bool = False
+    priority: Priority = "bulk"
+
+class BatchCommandResult(BaseModel):
+    host: str
+    stdout: Optional[str] = None
+    stderr: Optional[str] = None
+    error: Optional[str] = None
+    duration_ms: float = 0.0
+
+
+def configure_batch(config: dict):
+    """Apply the `batch` section of aos-ssh-conf.yaml. When a limit changes on reload, the executor or the
+    jump host semaphores are replaced: batches already submitted finish under the previous limits."""
+    global BATCH_MAX_WORKERS, BATCH_MAX_PER_JUMP_HOST, batch_executor
+    max_workers = config.get("max_workers", BATCH_MAX_WORKERS)
+    max_per_jump_host = config.get("max_per_jump_host", BATCH_MAX_PER_JUMP_HOST)
+    with batch_executor_lock:
+        if max_workers != BATCH_MAX_WORKERS and batch_executor is not None:
+            batch_executor.shutdown(wait=False)
+            batch_executor = None
+        BATCH_MAX_WORKERS = max_workers
+    with jump_host_semaphores_lock:
+        if max_per_jump_host != BATCH_MAX_PER_JUMP_HOST:
+            jump_host_semaphores.clear()
+        BATCH_MAX_PER_JUMP_HOST = max_per_jump_host
+    logger.info(f"Batch max workers: {BATCH_MAX_WORKERS}, max per jump host: {BATCH_MAX_PER_JUMP_HOST}")
+
+
+def get_batch_executor() -> ThreadPoolExecutor:
+    """Shared executor bounding the number of batch commands running at once, called with batch_executor_lock held."""
+    global batch_executor
+    if batch_executor is None:
+        batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix="aos-batch")
+    return batch_executor
+
+
+def get_jump_host_semaphore(jump_name: str) -> threading.BoundedSemaphore:
+    with jump_host_semaphores_lock:
+        if jump_name not in jump_host_semaphores:
+            jump_host_semaphores[jump_name] = threading.BoundedSemaphore(BATCH_MAX_PER_JUMP_HOST)
+        return jump_host_semaphores[jump_name]
+
+
+def select_batch_devices(batch: BatchCommand) -> tuple[list[Device], list[str]]:
+    """Resolve the batch hosts and tags selectors.
+    In multi-process mode, each worker only runs the hosts it owns.
+    returns:
+        (devices, unknown hosts)
+    """
+    selected : dict[str, Device] = {}
+    unknown : list[str] = []
+    for host in batch.hosts or []:
+        if not sharding.owns(host):
+            continue
+        device = get_device_by_host(host)
+        if device is None:
+            unknown.append(host)
+        else:
+            selected[device.host] = device
+    if batch.tags:
+        for device in inventory.select(batch.tags):
+            if sharding.owns(device.host):
+                selected[device.host] = device
+    return list(selected.values()), unknown
+
+
+def run_batch_command(device: Device, command: str, no_cache: bool = False, priority: Priority = "bulk",
+                      caller: Optional[str] = None) -> BatchCommandResult:
+    """Run one host of a batch, never raising so one switch cannot fail the whole batch."""
+    if not check_command(command, device):
+        return BatchCommandResult(host=device.host, error=f"Command '{command}' is not allowed")
+    start = time.perf_counter()
+    try:
+        if device.jump_ssh_name is not None:
+            with get_jump_host_semaphore(device.jump_ssh_name):
+                stdout, stderr, error_msg = run_command(device, command, no_cache, priority, caller)
+        else:
+            stdout, stderr, error_msg = run_command(device, command, no_cache, priority, caller)
+    except Exception as e:
+        logger.info(f"Batch command failed on {device.host}: {e}")
+        stdout, stderr, error_msg = None, None, str(e)
+    return BatchCommandResult(host=device.host, stdout=stdout, stderr=stderr, error=error_msg,
+                              duration_ms=round((time.perf_counter() - start) * 1000, 3))
+
+
+def iter_batch_results(batch_devices: list[Device], unknown: list[str], command: str, no_cache: bool = False,
+                       priority: Priority = "bulk", caller: Optional[str] = None):
+    """Yield batch results as soon as each host finishes."""
+    for host in unknown:
+        yield BatchCommandResult(host=host, error="Device not found")
+    with batch_executor_lock: # not shut down by a reload while submitting
+        executor = get_batch_executor()
+        futures = [executor.submit(run_batch_command, device, command, no_cache, priority, caller) for device in batch_devices]
+    for future in as_completed(futures):
+        yield future.result()
+
+
+@app.post("/commands/batch")
+def execute_batch_command(batch: BatchCommand, request: Request):
+    """Run the same command on several devices in parallel.
+    Devices are selected by hosts and/or tags. With `stream` set, results are returned
+    as newline delimited json as each host finishes, otherwise they are returned at once
+    in completion order.
+    """
+    if not batch.hosts and not batch.tags:
+        raise HTTPException(status_code=400, detail="At least one host or tag is required")
+    batch_devices, unknown = select_batch_devices(batch)
+    logger.info(f"Batch command '{batch.command}' on {len(batch_devices)} devices")
+    results = iter_batch_results(batch_devices, unknown, batch.command, batch.no_cache, batch.priority, caller_id(request))
+    if batch.stream:
+        return StreamingResponse((result.model_dump_json() + "\n" for result in results),
+                                 media_type="application/x-ndjson")
+    start = time.perf_counter()
+    return {
+        "command": batch.command,
+        "results": list(results),
+        "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
+
+def collect_command(device: Device, command: str) -> tuple[Optional[str], Optional[str], Optional[str]]:
+    """Runs a collector command, bypassing the command output cache."""
+    if not check_command(command, device):
+        return None, None, f"Command '{command}' is not allowed"
+    return run_command(device, command, no_cache=True, priority="background", caller="collector")
+
+
+class Snapshot(BaseModel):
+    host: str
+    command: str
+    collected_at: datetime.datetime
+    stdout: Optional[str] = None
+    stderr: Optional[str] = None
+    error: Optional[str] = None
+
+def to_snapshot(entry: dict, include: Optional[str] = None) -> Snapshot:
+    entry["collected_at"] = datetime.datetime.fromtimestamp(entry["collected_at"], datetime.timezone.utc)
+    if include and entry["stdout"] is not None:
+        entry["stdout"] = "\n".join(select_lines(entry["stdout"], include))
+    return Snapshot(**entry)
+
+def get_snapshot_store():
+    if collector.store is None:
+        raise HTTPException(status_code=404, detail="No snapshot database, see `collector` section of the configuration")
+    return collector.store
+
+@app.get("/snapshots/latest")
+def read_latest_snapshots(host: Optional[str] = None, command: Optional[str] = None,
+                          tags: Optional[list[str]] = Query(None, description="Devices having at least one of the tags"),
+                          include: Optional[str] = Query(None, description="Only return output lines matching this regex, and devices having such lines")) -> list[Snapshot]:
+    """Last collected output of commands on devices, without connecting to them."""
+    store = get_snapshot_store()
+    hosts = [host] if host is not None else [device.host for device in inventory.select(tags)] if tags else None
+    try:
+        snapshots = [to_snapshot(entry, include) for entry in store.latest(hosts, command)]
+    except re.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filter regex: {e}")
+    if include:
+        snapshots = [snapshot for snapshot in snapshots if snapshot.stdout]
+    return snapshots
+
+@app.get("/snapshots/history")
+def read_snapshot_history(host: str, command: str,
+                          since: Optional[datetime.datetime] = None, until: Optional[datetime.datetime] = None,
+                          limit: int = Query(10, ge=1, le=1000)) -> list[Snapshot]:
+    """Collected outputs of a command on a device, most recent first."""
+    entries = get_snapshot_store().history(host, command, since.timestamp() if since else None,
+                                           until.timestamp() if until else None, limit)
+    return [to_snapshot(entry) for entry in entries]
+
+@app.post("/snapshots/collect/{job}")
+def run_collector_job(job: str) -> dict:
+    """Runs a collector job now."""
+    get_snapshot_store()
+    collector_job = collector.jobs.get(job)
+    if collector_job is None:
+        raise HTTPException(status_code=404, detail=f"Collector job {job} not found")
+    return {"job": job, "snapshots": collector.run_job(collector_job)}
+
+@app.get("/cache/stats")
+def read_cache_stats() -> dict:
+    """Command output cache counters."""
+    return command_cache.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    """Prometheus metrics: per stage latency histograms, session gauges, reconnect and failure counters."""
+    return PlainTextResponse(Metrics.render(), media_type="text/plain; version=0.0.4")
+
 def main():
     parser = argparse.ArgumentParser(description='AOS MCP Server Options')
     parser.add_argument('--port', type=int, default=os.environ.get('ALE_AOS_SSH_PORT',8110), help='AOS SSH Server Port')
     parser.add_argument('--log-level', type=str, default=os.environ.get('ALE_AOS_SSH_LOG_LEVEL',"info"), help='Log level (debug, info, warning, error, critical)')
     parser.add_argument('--aos-ssh-conf-file', type=str, default=os.environ.get('ALE_AOS_SSH_CONF_FILE',"data/aos-ssh-conf.yaml"), help='aos ssh configuration file')
     parser.add_argument('--aos-ssh-host-file', type=str, default=os.environ.get('ALE_AOS_SSH_HOST_FILE',"data/aos-ssh-host.json"), help='aos ssh host file')
+    parser.add_argument('--workers', type=int, default=os.environ.get('ALE_AOS_SSH_WORKERS',1), help='worker processes, hosts are spread over them')
+    parser.add_argument('--worker-base-port', type=int, default=os.environ.get('ALE_AOS_SSH_WORKER_BASE_PORT',None), help='port of the first worker process (default: port + 1)')
+    parser.add_argument('--worker-index', type=int, default=None, help=argparse.SUPPRESS) # set by the dispatcher on its workers
     args = parser.parse_args()
     logger.setLevel(args.log_level.upper())
+    if args.workers > 1 and args.worker_index is None:
+        from .dispatcher import run_dispatcher
+        worker_args = ['--log-level', args.log_level, '--workers', str(args.workers),
+                       '--aos-ssh-conf-file', args.aos_ssh_conf_file, '--aos-ssh-host-file', args.aos_ssh_host_file]
+        run_dispatcher(args.workers, args.port, args.worker_base_port or args.port + 1, worker_args, args.log_level)
+        return
+    sharding.configure(args.workers, args.worker_index)
+    if args.worker_index is not None:
+        host_store.read_only = not sharding.is_writer()
+        output_pages.id_prefix = f"{args.worker_index}_"
     logger.info(f"Start AOS SSH Server Port: {args.port}, log-level: {args.log_level}, aos-ssh-conf-file: {args.aos_ssh_conf_file}, aos-ssh-host-file: {args.aos_ssh_host_file}")
     globals()["aos_host_file"]  = args.aos_ssh_host_file
     print(globals()["aos_host_file"] )
     load_config(args.aos_ssh_conf_file)
     load_host(args.aos_ssh_host_file)
 #    print(devices)
-    logger.info(f"Loaded {len(jump_ssh_boxes)} jump ssh hosts")
-    logger.info(f"Loaded {len(devices)} devices")
+    logger.info(f"Loaded {len(inventory.jump_hosts)} jump ssh hosts")
+    logger.info(f"Loaded {len(inventory)} devices")
+    host_store.start()
+    collector.start(collect_command)
+    if RELOAD_INTERVAL > 0:
+        threading.Thread(target=reload_thread, args=(args.aos_ssh_conf_file,), daemon=True).start()
+        logger.info(f"Live reload of {args.aos_ssh_conf_file} and {args.aos_ssh_host_file} every {RELOAD_INTERVAL}s")
     SSHSessionManager.init_ssh_session_manager()
-    uvicorn.run(app, host="0.0.0.0", port=args.port, log_level=args.log_level)
+    WarmPool.init_warm_pool()
+    uvicorn.run(app, host="0.0.0.0" if args.worker_index is None else "127.0.0.1", port=args.port, log_level=args.log_level)
 
 
 if __name__ == "__main__":
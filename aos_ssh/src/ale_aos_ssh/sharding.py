@@ -0,0 +1,27 @@
+import zlib
+
+# Multi-process mode (--workers): hosts are spread over the worker processes with a stable hash,
+# each worker only opens sessions to the hosts it owns. WORKER_INDEX is None in single process mode.
+WORKERS = 1
+WORKER_INDEX = None
+
+
+def configure(workers: int, worker_index: int = None):
+    global WORKERS, WORKER_INDEX
+    WORKERS = max(1, workers)
+    WORKER_INDEX = worker_index
+
+
+def worker_for(host: str, workers: int = None) -> int:
+    """Index of the worker owning the sessions of a host."""
+    return zlib.crc32(host.encode()) % (workers or WORKERS)
+
+
+def owns(host: str) -> bool:
+    """True when this process handles the host: single process mode or worker owning it."""
+    return WORKER_INDEX is None or worker_for(host) == WORKER_INDEX
+
+
+def is_writer() -> bool:
+    """True when this process persists the host file: single process mode or the first worker."""
+    return not WORKER_INDEX
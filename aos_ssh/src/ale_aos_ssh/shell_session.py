@@ -0,0 +1,117 @@
+import re
+import socket
+import time
+import logging
+from typing import Optional
+
+import paramiko
+
+logger = logging.getLogger("aos-ssh")
+
+
+class ShellPromptTimeout(Exception):
+    """Raised when the AOS prompt is not seen within the timeout."""
+
+
+class PersistentShell:
+    """
+    Interactive AOS cli kept open on a device session.
+    Paging is disabled once when the shell is opened and the prompt found at that time is
+    used to detect the end of each command output, so later commands reuse the same channel
+    and cli context instead of opening a new channel each time.
+    The output of a command is what follows its echo up to the next prompt, so a prompt left
+    over by an earlier exchange (banner, newline sent at open) can't be taken as its end.
+    Not thread safe, the session manager runs one command at a time on it (session 'shell_lock').
+    """
+
+    quiet_period = 0.3 # seconds without output ending the banner read at open
+
+    def __init__(self, client: paramiko.SSHClient, prompt_pattern: str, disable_paging_command: str = None,
+                 timeout: float = 10):
+        self.client = client
+        self.prompt_re = re.compile(prompt_pattern)
+        self.disable_paging_command = disable_paging_command
+        self.timeout = timeout
+        self.channel: paramiko.Channel = None
+        self.prompt: str = None
+
+    def open(self):
+        """Open the shell channel, wait for the prompt and disable paging."""
+        self.channel = self.client.invoke_shell(width=511, height=0)
+        self.channel.settimeout(0.5)
+        self.channel.send("\n")
+        banner = self._read_until(lambda buffer: self._find_prompt(buffer) is not None, self.timeout)
+        # the prompt answering the newline may follow the banner prompt, both are read
+        rest = self._read_until_quiet(self.quiet_period, self.timeout)
+        self.prompt = self._find_prompt(banner + rest) or self._find_prompt(banner)
+        logger.info(f"Persistent shell opened, prompt: '{self.prompt}'")
+        if self.disable_paging_command:
+            self.run(self.disable_paging_command, self.timeout)
+
+    def _find_prompt(self, buffer: str):
+        last_line = buffer.replace("\r", "").rsplit("\n", 1)[-1]
+        return last_line if self.prompt_re.search(last_line) else None
+
+    def _read_until(self, is_complete, timeout: float) -> str:
+        buffer = ""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                data = self.channel.recv(65535)
+                if not data:
+                    raise EOFError("Shell channel closed")
+                buffer += data.decode(errors="replace")
+                if is_complete(buffer):
+                    return buffer
+            except socket.timeout:
+                pass
+            if time.monotonic() > deadline:
+                raise ShellPromptTimeout(f"Prompt not detected after {timeout} seconds")
+
+    def _read_until_quiet(self, quiet: float, timeout: float) -> str:
+        """Output received until nothing comes for quiet seconds."""
+        buffer = ""
+        deadline = time.monotonic() + timeout
+        self.channel.settimeout(quiet)
+        try:
+            while time.monotonic() < deadline:
+                try:
+                    data = self.channel.recv(65535)
+                except socket.timeout:
+                    break
+                if not data:
+                    raise EOFError("Shell channel closed")
+                buffer += data.decode(errors="replace")
+        finally:
+            self.channel.settimeout(0.5)
+        return buffer
+
+    def _command_output(self, buffer: str, command: str) -> Optional[str]:
+        """Output of command once the prompt follows its echo, else None."""
+        lines = buffer.replace("\r", "").split("\n")
+        echo = next((i for i, line in enumerate(lines[:-1]) if line.rstrip().endswith(command)), None)
+        if echo is None or lines[-1] != self.prompt:
+            return None
+        return "\n".join(lines[echo + 1:-1]).strip()
+
+    def run(self, command: str, timeout: float) -> str:
+        """Run a command and return its output, without the echoed command and the trailing prompt."""
+        command = command.strip()
+        self.channel.send(command + "\n")
+        output = None
+
+        def is_complete(buffer: str) -> bool:
+            nonlocal output
+            output = self._command_output(buffer, command)
+            return output is not None
+
+        self._read_until(is_complete, timeout)
+        return output
+
+    def close(self):
+        if self.channel is not None:
+            try:
+                self.channel.close()
+            except Exception as e:
+                logger.info(f"Error closing persistent shell: {e}")
+            self.channel = None
@@ -3,20 +3,91 @@ import time
 import socket
 import threading
 import datetime
+import heapq
+import itertools
+from collections import OrderedDict
 from threading import Lock
-from .device_manager import Device, JumpHost, jump_ssh_boxes
+from .device_manager import Device, JumpHost, inventory
+from .channel_pool import ChannelPool
+from .shell_session import PersistentShell
+from . import metrics as Metrics
 import logging
 
 logger = logging.getLogger("aos-ssh")
 
 # Dictionary to store active SSH client sessions and their last activity time
 # Key: IP Address (str)
-# Value: {'client': paramiko.SSHClient, 'last_activity_time': datetime.datetime, 'lock': threading.Lock}
+# Value: {'client': paramiko.SSHClient, 'last_activity_time': datetime.datetime, 'lock': threading.Lock, 'channels': ChannelPool}
+# 'lock' only guards transport setup and teardown, commands run concurrently on 'channels'.
 active_ssh_sessions = {}
 
 
 # Define the inactivity timeout duration in seconds (5 minutes)
 INACTIVITY_TIMEOUT = 5 * 60
+# Seconds a jump host transport carrying no device session is kept open
+JUMP_IDLE_TIMEOUT = 60
+# Max open device sessions (0: unlimited). When reached, the least recently used idle session
+# is closed before opening a new one.
+MAX_OPEN_SESSIONS = 0
+
+# Expiry scheduler: sessions are checked in deadline order instead of scanning all of them.
+# Heap entries are (deadline timestamp, sequence, key, session_info), one per session_info.
+# _schedule_lock also guards _lru_sessions and the 'device_sessions' of jump sessions.
+_schedule_lock = threading.Condition()
+_expiry_heap : list[tuple] = []
+_expiry_sequence = itertools.count()
+# Open device session keys, least recently used first
+_lru_sessions : OrderedDict[tuple, None] = OrderedDict()
+
+# Concurrent exec channels per device when neither the device nor its jump host sets max_channels
+DEFAULT_MAX_CHANNELS = 4
+# Seconds a command waits for a free channel before giving up
+CHANNEL_WAIT_TIMEOUT = 60
+
+# Execution mode when the device does not set exec_mode:
+#  - exec : each command runs on a new exec channel
+#  - shell: commands run on a persistent interactive shell, falling back to exec when the prompt is not detected
+EXEC_MODE = "exec"
+SHELL_PROMPT = r"\S*-> ?$"
+SHELL_DISABLE_PAGING = "no more"
+SHELL_OPEN_TIMEOUT = 10
+SHELL_COMMAND_TIMEOUT = 60
+
+# Transports opened per jump host when the jump host entry does not set transport_pool_size.
+# Device sessions are spread over them, placing each new session on the least loaded transport.
+JUMP_TRANSPORT_POOL_SIZE = 1
+
+# Interval in seconds of the background health check (0: disabled, sessions are probed inline by each request).
+# When enabled, the request path trusts the cached health flag of a session for 2 intervals.
+HEALTH_CHECK_INTERVAL = 0
+
+
+def configure(ssh_config: dict):
+    """Apply the `ssh` section of aos-ssh-conf.yaml."""
+    global DEFAULT_MAX_CHANNELS, CHANNEL_WAIT_TIMEOUT, EXEC_MODE, SHELL_PROMPT, SHELL_DISABLE_PAGING, SHELL_OPEN_TIMEOUT, SHELL_COMMAND_TIMEOUT
+    global JUMP_TRANSPORT_POOL_SIZE, INACTIVITY_TIMEOUT, JUMP_IDLE_TIMEOUT, MAX_OPEN_SESSIONS
+    DEFAULT_MAX_CHANNELS = ssh_config.get("max_channels_per_device", DEFAULT_MAX_CHANNELS)
+    CHANNEL_WAIT_TIMEOUT = ssh_config.get("channel_wait_timeout", CHANNEL_WAIT_TIMEOUT)
+    EXEC_MODE = ssh_config.get("exec_mode", EXEC_MODE)
+    SHELL_PROMPT = ssh_config.get("shell_prompt", SHELL_PROMPT)
+    SHELL_DISABLE_PAGING = ssh_config.get("shell_disable_paging", SHELL_DISABLE_PAGING)
+    SHELL_OPEN_TIMEOUT = ssh_config.get("shell_open_timeout", SHELL_OPEN_TIMEOUT)
+    SHELL_COMMAND_TIMEOUT = ssh_config.get("shell_command_timeout", SHELL_COMMAND_TIMEOUT)
+    JUMP_TRANSPORT_POOL_SIZE = ssh_config.get("jump_transport_pool_size", JUMP_TRANSPORT_POOL_SIZE)
+    INACTIVITY_TIMEOUT = ssh_config.get("inactivity_timeout", INACTIVITY_TIMEOUT)
+    JUMP_IDLE_TIMEOUT = ssh_config.get("jump_idle_timeout", JUMP_IDLE_TIMEOUT)
+    MAX_OPEN_SESSIONS = ssh_config.get("max_open_sessions", MAX_OPEN_SESSIONS)
+    logger.info(f"Max channels per device: {DEFAULT_MAX_CHANNELS}, channel wait timeout: {CHANNEL_WAIT_TIMEOUT}, exec mode: {EXEC_MODE}")
+
+def _count_sessions(is_jump_box: bool) -> int:
+    return sum(1 for (host, jump_box, jump_name), session_info in list(active_ssh_sessions.items())
+               if jump_box == is_jump_box and session_info.get('client'))
+
+Metrics.register_gauge("aos_ssh_open_sessions", "Open ssh sessions to switches", lambda: {(): _count_sessions(False)})
+Metrics.register_gauge("aos_ssh_jump_transports", "Open ssh transports to jump hosts", lambda: {(): _count_sessions(True)})
+Metrics.register_gauge("aos_ssh_channel_waiters", "Commands waiting for a free channel",
+                       lambda: {(): sum(info['channels'].waiting for info in list(active_ssh_sessions.values()) if 'channels' in info)})
+
 
 def create_ssh_session(host:str, username:str, password:str=None, key_filename:str=None, port:int=22, 
                        jump_client:paramiko.SSHClient=None, jump_private_host:str=None, jump_private_port:int=22): 
@@ -31,7 +102,8 @@ def create_ssh_session(host:str, username:str, password:str=None, key_filename:s
             jump_transport = jump_client.get_transport()
             dest_addr = (host, port)
             local_addr = (jump_private_host if jump_private_host is not None else jump_client.get_transport().getpeername()[0], jump_private_port) # Local address can be arbitrary
-            channel = jump_transport.open_channel("direct-tcpip", dest_addr, local_addr)
+            with Metrics.timed("jump_channel", Metrics.target_label(host)):
+                channel = jump_transport.open_channel("direct-tcpip", dest_addr, local_addr)
         except Exception as e:
             return None, f"Failed to open channel through jump host: {e}"
         except paramiko.AuthenticationException:
@@ -68,25 +140,68 @@ def create_ssh_session(host:str, username:str, password:str=None, key_filename:s
         return None, f"An unexpected error occurred: {e}"
 
 
-def get_session(device : Device):
-    """Get or create an SSH session for the given device, handling jump hosts if necessary."""
+def jump_slot_name(jump_name: str, index: int) -> str:
+    """Session key jump_name of one transport of a jump host pool."""
+    return f"{jump_name}#{index}"
 
-    if device.jump_ssh_name is not None:
-        jump_box = next((j for j in jump_ssh_boxes if j.name == device.jump_ssh_name), None)
-        if jump_box is None:
-            return None, f"Jump host {device.jump_ssh_name} not found for device {device.host}"
-        logger.info(f"Using jump host {jump_box.name} ({jump_box.public_host}) to reach {device.host}")
-        # First, get or create the jump box session
+
+def _transport_active(client: paramiko.SSHClient) -> bool:
+    transport = client.get_transport() if client is not None else None
+    return transport is not None and transport.is_active()
+
+
+def jump_loads(jump_box: JumpHost) -> dict[str, int]:
+    """Number of device sessions carried by each open transport of a jump host pool, by slot name."""
+    size = max(1, jump_box.transport_pool_size or JUMP_TRANSPORT_POOL_SIZE)
+    loads = {}
+    with _schedule_lock:
+        for index in range(size):
+            session_info = active_ssh_sessions.get((jump_box.public_host, True, jump_slot_name(jump_box.name, index)))
+            if session_info is not None and session_info.get('client'):
+                loads[jump_slot_name(jump_box.name, index)] = len(session_info.get('device_sessions', ()))
+    return loads
+
+
+def get_jump_client(jump_box: JumpHost):
+    """
+    Returns (client, session key, error) of the least loaded live transport of the jump host pool,
+    connecting or reconnecting pool transports as needed: sessions of a dead transport are placed
+    on the others or on its replacement.
+    """
+    size = max(1, jump_box.transport_pool_size or JUMP_TRANSPORT_POOL_SIZE)
+    loads = jump_loads(jump_box)
+    error_msg = None
+    for index in sorted(range(size), key=lambda i: loads.get(jump_slot_name(jump_box.name, i), 0)):
+        jump_key = (jump_box.public_host, True, jump_slot_name(jump_box.name, index))
         jump_client, error_msg = get_or_create_session(
             host=jump_box.public_host,
             username=jump_box.user,
             password=jump_box.password,
             port=jump_box.public_port,
             is_jump_box=True,
-            jump_name=jump_box.name)
-        
-        if jump_client is None:
-            return None, f"Failed to connect to jump host {jump_box.name}: {error_msg}"
+            jump_name=jump_key[2])
+        if jump_client is not None:
+            return jump_client, jump_key, None
+    return None, None, error_msg
+
+
+def get_session(device : Device):
+    """Get or create an SSH session for the given device, handling jump hosts if necessary."""
+
+    if device.jump_ssh_name is not None:
+        jump_box = inventory.get_jump_host(device.jump_ssh_name)
+        if jump_box is None:
+            return None, f"Jump host {device.jump_ssh_name} not found for device {device.host}"
+        # Keep the transport already carrying the device session while it is alive,
+        # otherwise place the session on the least loaded transport of the jump host pool
+        session_info = active_ssh_sessions.get((device.host, False, jump_box.name))
+        jump_client = session_info.get('jump_client') if session_info else None
+        jump_key = session_info.get('jump_key') if session_info else None
+        if not _transport_active(jump_client):
+            logger.info(f"Using jump host {jump_box.name} ({jump_box.public_host}) to reach {device.host}")
+            jump_client, jump_key, error_msg = get_jump_client(jump_box)
+            if jump_client is None:
+                return None, f"Failed to connect to jump host {jump_box.name}: {error_msg}"
         client, error_msg = get_or_create_session(
                 host=device.host,
                 port=device.port,
@@ -96,23 +211,29 @@ def get_session(device : Device):
                 jump_name=jump_box.name,
                 jump_client=jump_client,
                 jump_private_host=jump_box.private_host, 
-                jump_private_port=jump_box.private_port)
+                jump_private_port=jump_box.private_port,
+                max_channels=device.max_channels or jump_box.max_channels,
+                jump_key=jump_key)
     else:
         client, error_msg = get_or_create_session(
             host=device.host,
             username=device.user,
             password=device.password,
-            port=device.port)
+            port=device.port,
+            max_channels=device.max_channels)
     return client, error_msg
 
 
 
 def get_or_create_session(host:str, username:str, password:str=None, key_filename:str=None, port:int=22, 
                           is_jump_box:bool=False, jump_name:str=None,
-                          jump_client:paramiko.SSHClient=None, jump_private_host:str=None, jump_private_port:int=22):
+                          jump_client:paramiko.SSHClient=None, jump_private_host:str=None, jump_private_port:int=22,
+                          max_channels:int=None, jump_key:tuple=None):
     """
     Retrieves an existing active session or creates a new one if it doesn't exist or is closed.
     Updates the last_activity_time for the session.
+    max_channels bounds the concurrent exec channels of a device session (DEFAULT_MAX_CHANNELS if not set).
+    jump_key is the session key of the jump transport given as jump_client.
     """
     logger.info(f"Checking session for {host} {username} , port {port}")
     # The dictionary itself needs a small lock just for adding/removing keys
@@ -120,78 +241,250 @@ def get_or_create_session(host:str, username:str, password:str=None, key_filenam
     # We can use a simple global lock here since it's a very fast operation
     # that doesn't involve waiting for network I/O
      # Use host:port as key for jump boxes to allow multiple jump boxes to same host on different ports
-    if (host,is_jump_box,jump_name) not in active_ssh_sessions:
-        active_ssh_sessions[(host,is_jump_box,jump_name)] = {'lock': Lock()} # Add lock for this host first
-
-    session_info = active_ssh_sessions[(host,is_jump_box,jump_name)]
-    with session_info['lock']: # Acquire the lock for this specific session
+    key = (host,is_jump_box,jump_name)
+    session_info = active_ssh_sessions.setdefault(key, {'lock': Lock(), 'key': key}) # Add lock for this host first
+    if not is_jump_box:
+        channels = session_info.setdefault('channels', ChannelPool(max_channels or DEFAULT_MAX_CHANNELS))
+        channels.max_channels = max(1, max_channels or DEFAULT_MAX_CHANNELS)
+    target = Metrics.target_label(host, jump_name, is_jump_box)
+    stage = "jump_connect" if is_jump_box else "connect"
+    with Metrics.timed_enter(session_info['lock'], "session_lock_wait", target): # Acquire the lock for this specific session
         client = session_info.get('client') # Use .get() to handle case where client isn't set yet
 
         # Check if the existing client is still active
         if client:
             try:
                 transport = client.get_transport()
-                if transport and transport.is_active() and transport.send_ignore():
-                    logger.logger(f"Using existing active session for {host}")
+                if not is_health_fresh(session_info):
+                    with Metrics.timed("liveness_probe", target):
+                        if transport is not None and transport.is_active():
+                            transport.send_ignore() # raises if the transport is broken
+                if transport is not None and transport.is_active():
+                    logger.debug(f"Using existing active session for {host}")
                     # Update activity time since session is being accessed
-                    session_info['last_activity_time'] = datetime.datetime.now()
+                    _touch(session_info)
                     return client, None
-                else:
-                    logger.info(f"Session for {host} found but is not active. Reconnecting...")
-                    client.close() # Ensure old transport is closed
-                    client, error_msg = create_ssh_session(host, username, password, key_filename, port,
-                                                           jump_client, jump_private_host, jump_private_port)
-                    if client:
-                        session_info['client'] = client
-                        session_info['is_jump_box'] = is_jump_box
-                        session_info['jump_name'] = jump_name
-                        session_info['jump_client'] = jump_client
-                        session_info['last_activity_time'] = datetime.datetime.now()
-                    return client, error_msg
+                logger.info(f"Session for {host} found but is not active. Reconnecting...")
             except EOFError:
                 logger.info(f"Session for {host} unexpectedly closed. Reconnecting...")
-                client.close()
-                client, error_msg = create_ssh_session(host, username, password, key_filename, port, 
-                                                       jump_client, jump_private_host, jump_private_port)
-                if client:
-                    session_info['client'] = client
-                    session_info['is_jump_box'] = is_jump_box
-                    session_info['jump_name'] = jump_name
-                    session_info['jump_client'] = jump_client
-                    session_info['last_activity_time'] = datetime.datetime.now()
-                return client, error_msg
             except Exception as e:
                 logger.info(f"Error checking session for {host}: {e}. Reconnecting...")
-                if client:
-                    client.close()
-                client, error_msg = create_ssh_session(host, username, password, key_filename, port,
-                                                       jump_client, jump_private_host, jump_private_port)
-                if client:
-                    session_info['client'] = client
-                    session_info['is_jump_box'] = is_jump_box
-                    session_info['jump_name'] = jump_name
-                    session_info['jump_client'] = jump_client
-                    session_info['last_activity_time'] = datetime.datetime.now()
-                return client, error_msg
+            client.close() # Ensure old transport is closed
+            Metrics.RECONNECTS.inc(target=target)
         else:
             logger.info(f"No existing session for {host}. Creating a new one...")
+            if not is_jump_box:
+                _make_room(key)
+
+        with Metrics.timed(stage, target):
             client, error_msg = create_ssh_session(host, username, password, key_filename, port,
                                                    jump_client, jump_private_host, jump_private_port)
-            logger.info(f"create_ssh_session result for {host} , error : {error_msg}")
-            if client:
-                session_info['client'] = client
-                session_info['is_jump_box'] = is_jump_box
-                session_info['jump_name'] = jump_name
-                session_info['jump_client'] = jump_client
-                session_info['last_activity_time'] = datetime.datetime.now()
-            return client, error_msg
+        logger.info(f"create_ssh_session result for {host} , error : {error_msg}")
+        if client:
+            session_info['client'] = client
+            session_info['is_jump_box'] = is_jump_box
+            session_info['jump_name'] = jump_name
+            session_info['jump_client'] = jump_client
+            _touch(session_info)
+            session_info['healthy'] = True
+            session_info['health_checked_at'] = time.monotonic()
+            if is_jump_box:
+                _schedule_expiry(session_info, time.time() + JUMP_IDLE_TIMEOUT)
+            else:
+                with _schedule_lock:
+                    _lru_sessions[key] = None
+                    _lru_sessions.move_to_end(key)
+                _attach_jump(session_info, jump_key)
+                _schedule_expiry(session_info, time.time() + INACTIVITY_TIMEOUT)
+        else:
+            Metrics.FAILURES.inc(stage=stage, target=target)
+        return client, error_msg
+
+
+def _touch(session_info):
+    """Records activity on a session: its inactivity deadline moves and it becomes the most recently used."""
+    session_info['last_activity_time'] = datetime.datetime.now()
+    key = session_info.get('key')
+    if key is not None and not key[1]:
+        with _schedule_lock:
+            if key in _lru_sessions:
+                _lru_sessions.move_to_end(key)
+
+
+def _schedule_expiry(session_info, deadline: float):
+    """Queues a session for an expiry check at deadline, once per session."""
+    with _schedule_lock:
+        if session_info.get('expiry_scheduled') or active_ssh_sessions.get(session_info['key']) is not session_info:
+            return
+        session_info['expiry_scheduled'] = True
+        heapq.heappush(_expiry_heap, (deadline, next(_expiry_sequence), session_info['key'], session_info))
+        _schedule_lock.notify()
+
+
+def _attach_jump(session_info, jump_key):
+    """Records which jump transport carries a device session, releasing the previous one."""
+    with _schedule_lock:
+        if session_info.get('jump_key') == jump_key:
+            return
+        _detach_jump(session_info)
+        jump_info = active_ssh_sessions.get(jump_key) if jump_key is not None else None
+        if jump_info is not None:
+            jump_info.setdefault('device_sessions', set()).add(session_info['key'])
+            session_info['jump_key'] = jump_key
+
+
+def _detach_jump(session_info):
+    """Releases the jump transport of a device session, scheduling its close once it carries no session."""
+    with _schedule_lock:
+        jump_info = active_ssh_sessions.get(session_info.pop('jump_key', None))
+        if jump_info is None:
+            return
+        device_sessions = jump_info.setdefault('device_sessions', set())
+        device_sessions.discard(session_info['key'])
+        if not device_sessions:
+            _schedule_expiry(jump_info, time.time() + JUMP_IDLE_TIMEOUT)
+
+
+def _make_room(key):
+    """Closes least recently used idle sessions until a new session fits in MAX_OPEN_SESSIONS."""
+    if MAX_OPEN_SESSIONS <= 0:
+        return
+    with _schedule_lock:
+        if len(_lru_sessions) < MAX_OPEN_SESSIONS:
+            return
+        candidates = list(_lru_sessions)
+    for candidate in candidates:
+        if len(_lru_sessions) < MAX_OPEN_SESSIONS:
+            return
+        session_info = active_ssh_sessions.get(candidate)
+        if candidate == key or session_info is None or session_info.get('pinned'):
+            continue
+        channels = session_info.get('channels')
+        if channels is not None and (channels.in_use > 0 or channels.waiting > 0):
+            continue # not idle
+        if close_session(*candidate, blocking=False):
+            logger.info(f"Max open sessions ({MAX_OPEN_SESSIONS}) reached, closed least recently used session for {candidate[0]}")
+            Metrics.EVICTIONS.inc()
+    if len(_lru_sessions) >= MAX_OPEN_SESSIONS:
+        logger.warning(f"Max open sessions ({MAX_OPEN_SESSIONS}) reached and no idle session to close, opening session for {key[0]} anyway")
+
+
+def is_health_fresh(session_info) -> bool:
+    """True when the background health check recently found the session healthy."""
+    checked_at = session_info.get('health_checked_at')
+    return (HEALTH_CHECK_INTERVAL > 0 and session_info.get('healthy', False) and checked_at is not None
+            and time.monotonic() - checked_at < 2 * HEALTH_CHECK_INTERVAL)
+
+
+def probe_session(host, is_jump_box, jump_name) -> bool:
+    """
+    Probes a session off the request path and updates its cached health flag.
+    A session being set up by a request is skipped and keeps its previous flag.
+    """
+    session_info = active_ssh_sessions.get((host, is_jump_box, jump_name))
+    if not session_info:
+        return False
+    if not session_info['lock'].acquire(blocking=False):
+        return session_info.get('healthy', False)
+    try:
+        client = session_info.get('client')
+        healthy = False
+        if client:
+            try:
+                transport = client.get_transport()
+                with Metrics.timed("liveness_probe", Metrics.target_label(host, jump_name, is_jump_box)):
+                    if transport is not None and transport.is_active():
+                        transport.send_ignore()
+                healthy = transport is not None and transport.is_active()
+            except Exception as e:
+                logger.info(f"Health check of session for {host} failed: {e}")
+        session_info['healthy'] = healthy
+        session_info['health_checked_at'] = time.monotonic()
+        return healthy
+    finally:
+        session_info['lock'].release()
+
+
+def pin_session(device: Device):
+    """Keeps the session of a device open regardless of inactivity (warm pool)."""
+    session_info = active_ssh_sessions.get((device.host, False, device.jump_ssh_name))
+    if session_info is not None:
+        session_info['pinned'] = True
 
 
-def execute_command(host, command, jump_name=None):
+def _exec_on_channel(client, host, command):
+    """Runs a command on a new exec channel, returns (stdin, stdout, stderr)."""
+    target = Metrics.target_label(host)
+    Metrics.COMMANDS.inc(target=target)
+    try:
+        with Metrics.timed("exec", target):
+            stdin, stdout, stderr = client.exec_command(command)
+        with Metrics.timed("read", target):
+            output = stdout.read().decode().strip()
+            error = stderr.read().decode().strip()
+        return stdin, output, error
+    except paramiko.SSHException as e:
+        logger.info(f"Error executing command on {host}: {e}")
+        Metrics.FAILURES.inc(stage="exec", target=target)
+        return None, None, str(e)
+    except Exception as e:
+        logger.info(f"An unexpected error occurred while executing command: {e}")
+        Metrics.FAILURES.inc(stage="exec", target=target)
+        return None, None, str(e)
+
+
+def _get_shell(session_info, host, client):
+    """Returns the persistent shell of a session, opening it if needed, or None if the prompt can't be detected."""
+    shell = session_info.get('shell')
+    if shell is not None and shell.client is client and shell.channel is not None and not shell.channel.closed:
+        return shell
+    if session_info.get('shell_failed_client') is client:
+        return None # prompt detection already failed on this connection
+    shell = PersistentShell(client, SHELL_PROMPT, SHELL_DISABLE_PAGING, SHELL_OPEN_TIMEOUT)
+    try:
+        shell.open()
+    except Exception as e:
+        logger.info(f"Persistent shell not available on {host}, falling back to exec_command: {e}")
+        shell.close()
+        session_info['shell'] = None
+        session_info['shell_failed_client'] = client
+        return None
+    session_info['shell'] = shell
+    return shell
+
+
+def _exec_in_shell(session_info, host, client, command, blocking=False):
+    """
+    Runs a command on the persistent shell of a session.
+    Returns the output, or None when the caller must fall back to an exec channel
+    (shell busy and not blocking, prompt not detected, command timeout).
+    """
+    shell_lock = session_info.setdefault('shell_lock', Lock())
+    if not shell_lock.acquire(blocking=blocking):
+        return None # shell busy with another command, use an exec channel instead
+    try:
+        shell = _get_shell(session_info, host, client)
+        if shell is None:
+            return None
+        try:
+            return shell.run(command, SHELL_COMMAND_TIMEOUT)
+        except Exception as e:
+            logger.info(f"Persistent shell failed on {host} for '{command}', falling back to exec_command: {e}")
+            shell.close()
+            session_info['shell'] = None
+            return None
+    finally:
+        shell_lock.release()
+
+
+def execute_command(host, command, jump_name=None, exec_mode=None):
     """
     Executes a command on the specified SSH session.
     Assumes the session is already managed by get_or_create_session.
     Updates the last_activity_time for the session.
+    The command runs on its own channel: up to max_channels commands run concurrently on a device,
+    others wait in arrival order and ChannelWaitTimeout is raised after CHANNEL_WAIT_TIMEOUT seconds.
+    In shell exec_mode the command runs on the persistent shell when it is free.
     """
 
 
@@ -200,33 +493,106 @@ def execute_command(host, command, jump_name=None):
         return None, None, None
 
     session_info = active_ssh_sessions[(host,False, jump_name)]
-    with session_info['lock']: # Acquire the lock for this specific session
+    _touch(session_info)
+    if (exec_mode or EXEC_MODE) == "shell" and session_info.get('client'):
+        output = _exec_in_shell(session_info, host, session_info['client'], command)
+        if output is not None:
+            _touch(session_info)
+            return None, output, ""
+
+    with Metrics.timed_enter(session_info['channels'].channel(CHANNEL_WAIT_TIMEOUT), "channel_wait", Metrics.target_label(host)): # Hold one channel of this session
         client = session_info.get('client')
         if not client:
             logger.info(f"No active client found within the session info for {host}.")
             return None, None, None
 
-        try:
-            stdin, stdout, stderr = client.exec_command(command)
-            output = stdout.read().decode().strip()
-            error = stderr.read().decode().strip()
-            
-            # Update activity time after successful command execution
-            session_info['last_activity_time'] = datetime.datetime.now()
-            
-            return stdin, output, error
-        except paramiko.SSHException as e:
-            logger.info(f"Error executing command on {host}: {e}")
-            return None, None, str(e)
-        except Exception as e:
-            logger.info(f"An unexpected error occurred while executing command: {e}")
-            return None, None, str(e)
+        stdin, output, error = _exec_on_channel(client, host, command)
+        # Update activity time after command execution
+        _touch(session_info)
+        return stdin, output, error
+
 
-def close_session(host, is_jump_box, jump_name):
-    """Closes a specific SSH session and removes it from the map."""
+def execute_commands(host, commands, jump_name=None, exec_mode=None):
+    """
+    Executes an ordered list of commands back-to-back on the specified SSH session,
+    holding one channel slot of the session (or its persistent shell in shell exec_mode) for the whole sequence.
+    Returns a list of (command, stdout, stderr, duration_ms) tuples, or None if there is no session.
+    """
+    if (host,False,jump_name) not in active_ssh_sessions:
+        logger.info(f"No active session for {host}. Please establish a connection first.")
+        return None
+
+    session_info = active_ssh_sessions[(host,False, jump_name)]
+    results = []
+    with Metrics.timed_enter(session_info['channels'].channel(CHANNEL_WAIT_TIMEOUT), "channel_wait", Metrics.target_label(host)): # Hold one channel for the whole sequence
+        client = session_info.get('client')
+        if not client:
+            logger.info(f"No active client found within the session info for {host}.")
+            return None
+
+        use_shell = (exec_mode or EXEC_MODE) == "shell"
+        for command in commands:
+            start = time.perf_counter()
+            output = _exec_in_shell(session_info, host, client, command, blocking=True) if use_shell else None
+            if output is not None:
+                error = ""
+            else:
+                stdin, output, error = _exec_on_channel(client, host, command)
+            results.append((command, output, error, (time.perf_counter() - start) * 1000))
+        _touch(session_info)
+    return results
+
+def stream_command(host, command, jump_name=None, cancel: threading.Event=None):
+    """
+    Executes a command on an exec channel and yields ("line", text) items as output is received,
+    then ("exit_status", code).
+    Setting cancel (ex: client disconnected) closes the channel, which stops the command on the switch.
+    """
+    session_info = active_ssh_sessions.get((host,False, jump_name))
+    if session_info is None or not session_info.get('client'):
+        logger.info(f"No active session for {host}. Please establish a connection first.")
+        return
+
+    with Metrics.timed_enter(session_info['channels'].channel(CHANNEL_WAIT_TIMEOUT), "channel_wait", Metrics.target_label(host)): # Hold one channel of this session
+        _touch(session_info)
+        channel = session_info['client'].get_transport().open_session()
+        try:
+            channel.set_combine_stderr(True)
+            channel.settimeout(1)
+            channel.exec_command(command)
+            pending = ""
+            while not (cancel is not None and cancel.is_set()):
+                try:
+                    data = channel.recv(4096)
+                except socket.timeout:
+                    continue
+                if not data:
+                    break
+                _touch(session_info)
+                pending += data.decode(errors="replace")
+                *lines, pending = pending.split("\n")
+                for line in lines:
+                    yield "line", line.rstrip("\r")
+            else:
+                logger.info(f"Streaming of '{command}' on {host} cancelled")
+                return
+            if pending:
+                yield "line", pending.rstrip("\r")
+            yield "exit_status", channel.recv_exit_status()
+        finally:
+            channel.close()
+            _touch(session_info)
+
+def close_session(host, is_jump_box, jump_name, blocking=True) -> bool:
+    """
+    Closes a specific SSH session and removes it from the map.
+    Without blocking, a session being set up by another thread is left open and False is returned.
+    """
     session_info = active_ssh_sessions.get((host,is_jump_box, jump_name))
     if session_info:
-        with session_info['lock']:
+        if not session_info['lock'].acquire(blocking=blocking):
+            return False
+        try:
             client = session_info.get('client')
             if client:
                 try:
@@ -234,59 +600,82 @@ def close_session(host, is_jump_box, jump_name):
                     logger.info(f"Closed session for {host} due to inactivity or explicit call.")
                 except Exception as e:
                     logger.info(f"Error closing session for {host}: {e}")
+        finally:
+            session_info['lock'].release()
         # Remove the entry from the global dict *after* releasing the per-session lock
-        if (host, is_jump_box, jump_name) in active_ssh_sessions:
-            del active_ssh_sessions[(host, is_jump_box, jump_name)]
+        with _schedule_lock:
+            if active_ssh_sessions.get((host, is_jump_box, jump_name)) is session_info:
+                del active_ssh_sessions[(host, is_jump_box, jump_name)]
+            _lru_sessions.pop((host, is_jump_box, jump_name), None)
+            if not is_jump_box:
+                _detach_jump(session_info)
+    return True
 
 
 def close_all_sessions():
     """Closes all active SSH sessions."""
     # Create a list of IPs to avoid RuntimeError due to dictionary size change during iteration
     hosts_to_close = list(active_ssh_sessions.keys()) 
-    for host,jump_name in hosts_to_close:
-        close_session(host,jump_name)
+    for host, is_jump_box, jump_name in hosts_to_close:
+        close_session(host, is_jump_box, jump_name)
+
+
+def close_device_sessions(host: str):
+    """Closes the sessions of a device, whatever the jump host they go through."""
+    for key in list(active_ssh_sessions):
+        if key[0] == host and not key[1]:
+            close_session(*key)
+
+
+def close_jump_host_sessions(jump_name: str):
+    """Closes the device sessions going through a jump host, then the transports of its pool."""
+    keys = [key for key in list(active_ssh_sessions)
+            if (key[1] and key[2].rsplit("#", 1)[0] == jump_name) or (not key[1] and key[2] == jump_name)]
+    for key in sorted(keys, key=lambda key: key[1]):
+        close_session(*key)
+
+
+def _expire(session_info):
+    """Closes a session whose deadline is reached, or reschedules it at its new deadline."""
+    host, is_jump_box, jump_name = session_info['key']
+    now = time.time()
+    last_activity = session_info.get('last_activity_time')
+    last_activity = last_activity.timestamp() if last_activity else now
+    if is_jump_box:
+        if session_info.get('device_sessions'):
+            return # rescheduled when its last device session is released
+        deadline = last_activity + JUMP_IDLE_TIMEOUT
+    else:
+        channels = session_info.get('channels')
+        if session_info.get('pinned') or (channels is not None and channels.in_use > 0):
+            deadline = now + INACTIVITY_TIMEOUT # kept open by the warm pool or commands still running
+        else:
+            deadline = last_activity + INACTIVITY_TIMEOUT
+    if deadline > now:
+        _schedule_expiry(session_info, deadline)
+        return
+    logger.info(f"Session for {host} has been inactive for more than {JUMP_IDLE_TIMEOUT if is_jump_box else INACTIVITY_TIMEOUT} seconds. Closing...")
+    if not close_session(host, is_jump_box, jump_name, blocking=False):
+        _schedule_expiry(session_info, now + 5) # being set up by a request, check again shortly
+
 
-def inactivity_cleanup_thread(interval=30):
+def expiry_thread():
     """
-    A separate thread to periodically check for and close inactive SSH sessions.
+    Closes inactive sessions in deadline order: sleeps until the earliest deadline and
+    only checks the sessions whose deadline is reached.
     """
     while True:
-        current_time = datetime.datetime.now()
-        hosts_to_close = []
-        jump_ssh_boxes_counter : dict[str,int]= {}
-        
-        # Iterate over a copy of keys to safely handle deletions
-        for host, is_jump_box, jump_name in list(active_ssh_sessions.keys()):
-            session_info = active_ssh_sessions.get( (host, is_jump_box, jump_name) )
-            if session_info and 'lock' in session_info:
-                # Use a non-blocking lock acquire (try_acquire) to avoid holding up the cleanup
-                # if another thread has a long-running operation on a session
-                if session_info['lock'].acquire(blocking=False):
-                    try:
-                        is_jump_box : bool = session_info.get('is_jump_box')
-                        jump_name : str = session_info.get('jump_name')
-                        if jump_name and not is_jump_box:
-                            jump_ssh_boxes_counter[jump_name] = jump_ssh_boxes_counter.get(jump_name,0) + 1
-                        last_activity = session_info.get('last_activity_time')
-                        if not is_jump_box and last_activity and (current_time - last_activity).total_seconds() > INACTIVITY_TIMEOUT:
-                            hosts_to_close.append((host,is_jump_box, jump_name))
-                    finally:
-                        session_info['lock'].release()
-        
-        for host, is_jump_box, jump_name in hosts_to_close:
-            logger.info(f"Session for {host} has been inactive for more than {INACTIVITY_TIMEOUT} seconds. Closing...")
-            close_session(host,is_jump_box, jump_name)
-
-        # Now check jump boxes to see if they can be closed (no active sessions using them) 
-        for jump_box in jump_ssh_boxes :
-            if jump_box.name not in jump_ssh_boxes_counter:
-                host = jump_box.public_host
-                session_info = active_ssh_sessions.get( (host, True, jump_box.name) )
-                if session_info :
-                    close_session(host, True, jump_box.name)    
-
-
-        time.sleep(interval)
+        with _schedule_lock:
+            while not _expiry_heap or _expiry_heap[0][0] > time.time():
+                _schedule_lock.wait(_expiry_heap[0][0] - time.time() if _expiry_heap else None)
+            deadline, sequence, key, session_info = heapq.heappop(_expiry_heap)
+            session_info['expiry_scheduled'] = False
+            if active_ssh_sessions.get(key) is not session_info:
+                continue # closed meanwhile
+        try:
+            _expire(session_info)
+        except Exception as e:
+            logger.error(f"Failed to expire session for {key[0]}: {e}")
 
 
 def init_ssh_session_manager():
@@ -294,9 +683,9 @@ def init_ssh_session_manager():
     Initializes the SSH session manager.
     This can be called at the start of your application to set up the cleanup thread.
     """
-    cleanup_thread = threading.Thread(target=inactivity_cleanup_thread, daemon=True)
+    cleanup_thread = threading.Thread(target=expiry_thread, daemon=True)
     cleanup_thread.start()
-    logger.info(f"Inactivity cleanup thread started with a timeout of {INACTIVITY_TIMEOUT} seconds.") 
+    logger.info(f"Session expiry thread started with a timeout of {INACTIVITY_TIMEOUT} seconds, max open sessions: {MAX_OPEN_SESSIONS or 'unlimited'}.") 
             
 
 # --- Example Usage ---
@@ -315,7 +704,7 @@ if __name__ == "__main__":
     # ssh_key_path_2 = "/path/to/your/private_key.pem" # e.g., ~/.ssh/id_rsa
 
     # Start the inactivity cleanup thread
-    cleanup_thread = threading.Thread(target=inactivity_cleanup_thread, daemon=True)
+    cleanup_thread = threading.Thread(target=expiry_thread, daemon=True)
     cleanup_thread.start()
     print(f"Inactivity cleanup thread started with a timeout of {INACTIVITY_TIMEOUT} seconds.")
 
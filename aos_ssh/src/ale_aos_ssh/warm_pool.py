@@ -0,0 +1,87 @@
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from . import sharding
+from .device_manager import Device, inventory
+from . import ssh_session_manager as SSHSessionManager
+
+logger = logging.getLogger("aos-ssh")
+
+# Sessions of devices having one of these tags are opened at startup and kept open, see `warm_pool` section of aos-ssh-conf.yaml
+WARM_TAGS : list[str] = []
+# Sessions opened in parallel
+PARALLELISM = 16
+# Seconds between background health checks of all open sessions (0: disabled)
+HEALTH_CHECK_INTERVAL = 30
+
+
+def configure(warm_pool_config: dict):
+    """Apply the `warm_pool` section of aos-ssh-conf.yaml."""
+    global WARM_TAGS, PARALLELISM, HEALTH_CHECK_INTERVAL
+    WARM_TAGS = warm_pool_config.get("tags", WARM_TAGS)
+    PARALLELISM = warm_pool_config.get("parallelism", PARALLELISM)
+    HEALTH_CHECK_INTERVAL = warm_pool_config.get("health_check_interval", HEALTH_CHECK_INTERVAL) if warm_pool_config else 0
+    SSHSessionManager.HEALTH_CHECK_INTERVAL = HEALTH_CHECK_INTERVAL
+    logger.info(f"Warm pool tags: {WARM_TAGS}, parallelism: {PARALLELISM}, health check interval: {HEALTH_CHECK_INTERVAL}")
+
+
+def warm_devices() -> list[Device]:
+    return [device for device in inventory.select(WARM_TAGS) if sharding.owns(device.host)] if WARM_TAGS else []
+
+
+def _open(device: Device) -> bool:
+    try:
+        client, error_msg = SSHSessionManager.get_session(device)
+    except Exception as e:
+        client, error_msg = None, str(e)
+    if client is None:
+        logger.info(f"Warm pool failed to open session for {device.host}: {error_msg}")
+        return False
+    SSHSessionManager.pin_session(device)
+    return True
+
+
+def open_sessions(devices: list[Device]) -> int:
+    """Open (or reconnect) the sessions of devices in parallel, returns the number of open sessions."""
+    if not devices:
+        return 0
+    with ThreadPoolExecutor(max_workers=PARALLELISM, thread_name_prefix="aos-warm") as executor:
+        return sum(executor.map(_open, devices))
+
+
+def health_check():
+    """Probe all open sessions, then reconnect warm devices whose session is missing or unhealthy."""
+    # Jump hosts first, so that devices behind them reconnect through a checked transport
+    for host, is_jump_box, jump_name in sorted(list(SSHSessionManager.active_ssh_sessions), key=lambda key: not key[1]):
+        SSHSessionManager.probe_session(host, is_jump_box, jump_name)
+    to_reconnect = []
+    for device in warm_devices():
+        session_info = SSHSessionManager.active_ssh_sessions.get((device.host, False, device.jump_ssh_name))
+        if session_info is None or not session_info.get('healthy', False):
+            to_reconnect.append(device)
+    if to_reconnect:
+        logger.info(f"Warm pool reconnecting {len(to_reconnect)} sessions")
+        open_sessions(to_reconnect)
+
+
+def warm_pool_thread():
+    start = time.perf_counter()
+    devices = warm_devices()
+    opened = open_sessions(devices)
+    if devices:
+        logger.info(f"Warm pool opened {opened}/{len(devices)} sessions in {time.perf_counter() - start:.1f}s")
+    while HEALTH_CHECK_INTERVAL > 0:
+        time.sleep(HEALTH_CHECK_INTERVAL)
+        try:
+            health_check()
+        except Exception as e:
+            logger.error(f"Health check failed: {e}")
+
+
+def init_warm_pool():
+    """Start opening warm sessions and health checking in the background."""
+    if not WARM_TAGS and HEALTH_CHECK_INTERVAL <= 0:
+        return
+    threading.Thread(target=warm_pool_thread, daemon=True, name="aos-warm-pool").start()
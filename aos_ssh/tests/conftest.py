@@ -0,0 +1,50 @@
+import socket
+from types import SimpleNamespace
+
+import pytest
+
+from ale_aos_ssh import sharding
+from ale_aos_ssh import ssh_session_manager as SSHSessionManager
+from ale_aos_ssh.device_manager import Device, inventory
+from mock_aos_server import MockAosServer, MockConfig, device_address
+
+
+@pytest.fixture(autouse=True)
+def empty_inventory():
+    """The inventory is a module global shared by all modules, it is emptied in place around each test."""
+    inventory.__init__()
+    yield inventory
+    inventory.__init__()
+    sharding.configure(1)
+
+
+def make_device(host: str, **fields) -> Device:
+    return Device.parse({"host": host, "user": "admin", "password": "switch", **fields})
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def mock_switches():
+    """Mock AOS switches of bench/mock_aos_server.py on device_address(0..3), and a mock jump host on 127.0.0.1."""
+    config = MockConfig(output_lines=5)
+    port, jump_port = free_port(), free_port()
+    switches = MockAosServer(config, port, [device_address(i) for i in range(4)]).start()
+    jump = MockAosServer(config, jump_port, ["127.0.0.1"], forwarding=True).start()
+    yield SimpleNamespace(config=config, port=port, jump_port=jump_port, switches=switches, jump=jump,
+                          hosts=[device_address(i) for i in range(4)])
+    switches.stop()
+    jump.stop()
+
+
+@pytest.fixture
+def ssh_sessions():
+    """The session manager, whose sessions opened by the test are closed afterwards."""
+    yield SSHSessionManager
+    SSHSessionManager.close_all_sessions()
+    SSHSessionManager._expiry_heap.clear()
+    SSHSessionManager._lru_sessions.clear()
@@ -0,0 +1,93 @@
+import json
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from ale_aos_ssh import server
+
+from conftest import make_device
+
+
+@pytest.fixture
+def client(empty_inventory, monkeypatch):
+    for device in (make_device("sw1", tags=["core"]), make_device("sw2", tags=["core"]), make_device("sw3", tags=["edge"])):
+        empty_inventory.set_device(device)
+
+    def run_command(device, command, no_cache=False, priority="interactive", caller=None):
+        if device.host == "sw2":
+            raise ConnectionError("unreachable")
+        return f"{command} on {device.host}", "", None
+
+    monkeypatch.setattr(server, "run_command", run_command)
+    monkeypatch.setattr(server, "check_command", lambda command, device=None: True)
+    return TestClient(server.app)
+
+
+def test_batch_runs_on_selected_hosts_and_tags(client):
+    r = client.post("/commands/batch", json={"command": "show system", "hosts": ["sw3", "unknown"], "tags": ["core"]})
+    assert r.status_code == 200
+    results = {result["host"]: result for result in r.json()["results"]}
+    assert sorted(results) == ["sw1", "sw2", "sw3", "unknown"]
+    assert results["sw1"]["stdout"] == "show system on sw1"
+    assert results["sw2"]["error"] == "unreachable" # one failing switch doesn't fail the batch
+    assert results["unknown"]["error"] == "Device not found"
+
+
+def test_batch_streams_one_json_line_per_host(client):
+    r = client.post("/commands/batch", json={"command": "show system", "tags": ["core", "edge"], "stream": True})
+    assert r.headers["content-type"] == "application/x-ndjson"
+    results = [json.loads(line) for line in r.text.splitlines()]
+    assert sorted(result["host"] for result in results) == ["sw1", "sw2", "sw3"]
+    assert all(result["duration_ms"] >= 0 for result in results)
+
+
+def test_batch_requires_hosts_or_tags(client):
+    assert client.post("/commands/batch", json={"command": "show system"}).status_code == 400
+
+
+def test_batch_commands_behind_a_jump_host_are_bounded(empty_inventory, monkeypatch):
+    for i in range(6):
+        empty_inventory.set_device(make_device(f"sw{i}", jump_ssh_name="bastion"))
+    running, peak = [], []
+    lock = threading.Lock()
+
+    def run_command(device, command, no_cache=False, priority="interactive", caller=None):
+        with lock:
+            running.append(device.host)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(device.host)
+        return "", "", None
+
+    monkeypatch.setattr(server, "run_command", run_command)
+    monkeypatch.setattr(server, "check_command", lambda command, device=None: True)
+    monkeypatch.setattr(server, "jump_host_semaphores", {})
+    monkeypatch.setattr(server, "BATCH_MAX_PER_JUMP_HOST", 2)
+    r = TestClient(server.app).post("/commands/batch", json={"command": "show system", "hosts": [f"sw{i}" for i in range(6)]})
+    assert len(r.json()["results"]) == 6
+    assert max(peak) == 2
+
+
+def test_batch_limits_are_applied_on_reload(monkeypatch):
+    monkeypatch.setattr(server, "batch_executor", None)
+    monkeypatch.setattr(server, "jump_host_semaphores", {})
+    monkeypatch.setattr(server, "BATCH_MAX_WORKERS", 32)
+    monkeypatch.setattr(server, "BATCH_MAX_PER_JUMP_HOST", 8)
+    server.configure_batch({"max_workers": 2, "max_per_jump_host": 1})
+    with server.batch_executor_lock:
+        executor = server.get_batch_executor()
+    semaphore = server.get_jump_host_semaphore("bastion")
+    server.configure_batch({"max_workers": 2, "max_per_jump_host": 1})
+    with server.batch_executor_lock:
+        assert server.get_batch_executor() is executor
+    assert server.get_jump_host_semaphore("bastion") is semaphore
+
+    server.configure_batch({"max_workers": 4, "max_per_jump_host": 3})
+    with server.batch_executor_lock:
+        assert server.get_batch_executor()._max_workers == 4
+    assert server.get_jump_host_semaphore("bastion") is not semaphore
+    with pytest.raises(RuntimeError):
+        executor.submit(print) # the previous executor is shut down
@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+from ale_aos_ssh.channel_pool import ChannelPool, ChannelWaitTimeout
+
+
+def test_acquire_up_to_max_channels():
+    pool = ChannelPool(2)
+    assert pool.acquire(0)
+    assert pool.acquire(0)
+    assert not pool.acquire(0.01)
+    assert pool.in_use == 2
+    assert pool.waiting == 0 # a timed out waiter is removed
+    pool.release()
+    assert pool.acquire(0)
+
+
+def test_waiters_are_served_in_arrival_order():
+    pool = ChannelPool(1)
+    pool.acquire()
+    served = []
+    threads = []
+    for i in range(5):
+        thread = threading.Thread(target=lambda i=i: (pool.acquire(5), served.append(i), pool.release()))
+        thread.start()
+        threads.append(thread)
+        while pool.waiting < i + 1:
+            time.sleep(0.001)
+    pool.release()
+    for thread in threads:
+        thread.join()
+    assert served == [0, 1, 2, 3, 4]
+    assert pool.in_use == 0
+
+
+def test_released_slot_is_handed_to_a_waiter_not_to_a_newcomer():
+    pool = ChannelPool(1)
+    pool.acquire()
+    acquired = threading.Event()
+    waiter = threading.Thread(target=lambda: pool.acquire(5) and acquired.set())
+    waiter.start()
+    while pool.waiting == 0:
+        time.sleep(0.001)
+    pool.release()
+    assert not pool.acquire(0.01) # the slot went to the waiter
+    waiter.join()
+    assert acquired.is_set()
+
+
+def test_lowered_max_channels_is_applied_on_release():
+    pool = ChannelPool(3)
+    for _ in range(3):
+        pool.acquire()
+    pool.max_channels = 1
+    pool.release()
+    pool.release()
+    assert not pool.acquire(0.01)
+    pool.release()
+    assert pool.acquire(0)
+
+
+def test_channel_raises_when_no_channel_is_free():
+    pool = ChannelPool(1)
+    with pool.channel(0):
+        with pytest.raises(ChannelWaitTimeout):
+            with pool.channel(0.01):
+                pass
+    assert pool.in_use == 0
@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+from ale_aos_ssh.collector import Collector, CollectorJob, SnapshotStore
+
+from conftest import make_device
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.db"))
+    store.save([("sw1", "show vlan", 100, "vlan 1", None, None),
+                ("sw1", "show vlan", 200, "vlan 1\nvlan 2", None, None),
+                ("sw2", "show vlan", 150, None, None, "timeout"),
+                ("sw1", "show system", 100, "system", "", None)])
+    return store
+
+
+def test_latest_snapshot_of_each_host_and_command(store):
+    latest = store.latest(command="show vlan")
+    assert [(s["host"], s["collected_at"], s["stdout"], s["error"]) for s in latest] == \
+           [("sw1", 200, "vlan 1\nvlan 2", None), ("sw2", 150, None, "timeout")]
+    assert [s["command"] for s in store.latest(hosts=["sw1"])] == ["show system", "show vlan"]
+
+
+def test_history_is_most_recent_first(store):
+    assert [s["collected_at"] for s in store.history("sw1", "show vlan")] == [200, 100]
+    assert [s["collected_at"] for s in store.history("sw1", "show vlan", since=150)] == [200]
+    assert [s["collected_at"] for s in store.history("sw1", "show vlan", limit=1)] == [200]
+    assert [s["collected_at"] for s in store.history("sw1", "show vlan", until=150)] == [100]
+
+
+def test_purge(store):
+    assert store.purge(150) == 2
+    assert [s["host"] for s in store.latest()] == ["sw1", "sw2"]
+
+
+def test_collector_starts_without_database_when_it_cant_be_opened(tmp_path):
+    collector = Collector()
+    collector.configure({"database": str(tmp_path / "missing" / "snapshots.db"), "jobs": []})
+    assert collector.store is None
+
+
+def test_job_stores_outputs_and_errors_of_tagged_devices(tmp_path, empty_inventory):
+    for device in (make_device("sw1", tags=["core"]), make_device("sw2", tags=["core"]), make_device("sw3")):
+        empty_inventory.set_device(device)
+
+    def run_command(device, command):
+        if device.host == "sw2":
+            raise ConnectionError("unreachable")
+        return f"{command} of {device.host}", "", None
+
+    collector = Collector()
+    collector.configure({"database": str(tmp_path / "snapshots.db")})
+    collector.run_command = run_command
+    assert collector.run_job(CollectorJob("inventory", ["show system"], ["core"])) == 2
+    latest = collector.store.latest()
+    assert [(s["host"], s["stdout"], s["error"]) for s in latest] == \
+           [("sw1", "show system of sw1", None), ("sw2", None, "unreachable")]
+
+
+def test_database_set_by_a_reload_starts_the_collector(tmp_path, empty_inventory):
+    empty_inventory.set_device(make_device("sw1"))
+    collected = []
+    collector = Collector()
+    collector.configure({"jobs": [{"name": "inventory", "commands": ["show system"]}]})
+    collector.start(lambda device, command: collected.append(device.host) or ("system", "", None))
+    assert collector._thread is None
+
+    collector.configure({"database": str(tmp_path / "snapshots.db"), "jobs": [{"name": "inventory", "commands": ["show system"]}]})
+    assert collector._thread.is_alive()
+    deadline = time.time() + 5
+    while not collector.store.latest() and time.time() < deadline:
+        time.sleep(0.01)
+    assert [s["stdout"] for s in collector.store.latest()] == ["system"]
+    assert collected == ["sw1"]
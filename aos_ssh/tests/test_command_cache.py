@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+from ale_aos_ssh.command_cache import CommandCache
+
+
+@pytest.fixture
+def cache():
+    cache = CommandCache()
+    cache.configure({"max_entries": 2, "rules": [{"pattern": "show system", "ttl": 60},
+                                                 {"pattern": "show vlan", "ttl": 0.05}]})
+    return cache
+
+
+def test_cached_until_ttl(cache):
+    calls = []
+    execute = lambda: calls.append(1) or len(calls)
+    assert cache.get_or_execute("sw1", "show vlan", execute) == 1
+    assert cache.get_or_execute("sw1", "show  vlan", execute) == 1 # normalized command
+    time.sleep(0.06)
+    assert cache.get_or_execute("sw1", "show vlan", execute) == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_commands_without_rule_are_not_cached(cache):
+    calls = []
+    for _ in range(2):
+        cache.get_or_execute("sw1", "show chassis", lambda: calls.append(1))
+    assert len(calls) == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_concurrent_identical_requests_share_one_execution(cache):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def execute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "output"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_execute("sw1", "show system", execute)))
+               for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    while cache.stats()["coalesced"] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == ["output"] * 5
+
+
+def test_error_is_raised_to_all_waiters_and_not_cached(cache):
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("ssh failed")
+
+    errors = []
+
+    def call():
+        try:
+            cache.get_or_execute("sw1", "show system", fail)
+        except RuntimeError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while cache.stats()["coalesced"] < 1:
+        time.sleep(0.001)
+    release.set()
+    leader.join()
+    follower.join()
+    assert len(errors) == 2
+    assert cache.get_or_execute("sw1", "show system", lambda: "ok") == "ok"
+
+
+def test_uncacheable_result_is_not_stored(cache):
+    cache.get_or_execute("sw1", "show system", lambda: None, cacheable=lambda result: result is not None)
+    assert cache.get_or_execute("sw1", "show system", lambda: "ok") == "ok"
+
+
+def test_bypass_refreshes_the_entry(cache):
+    cache.get_or_execute("sw1", "show system", lambda: "old")
+    assert cache.get_or_execute("sw1", "show system", lambda: "new", bypass=True) == "new"
+    assert cache.get_or_execute("sw1", "show system", lambda: "other") == "new"
+
+
+def test_least_recently_used_entry_is_evicted(cache):
+    cache.get_or_execute("sw1", "show system", lambda: 1)
+    cache.get_or_execute("sw2", "show system", lambda: 2)
+    cache.get_or_execute("sw1", "show system", lambda: 0) # sw1 most recently used
+    cache.get_or_execute("sw3", "show system", lambda: 3)
+    assert cache.get_or_execute("sw1", "show system", lambda: 0) == 1
+    assert cache.get_or_execute("sw2", "show system", lambda: 0) == 0
+    assert cache.stats()["evictions"] >= 1
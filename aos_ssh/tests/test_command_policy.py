@@ -0,0 +1,57 @@
+from ale_aos_ssh.command_policy import CommandMatcher, CommandPolicy
+
+from conftest import make_device
+
+
+def make_policy() -> CommandPolicy:
+    policy = CommandPolicy()
+    policy.configure(["show system$", "show vlan( \\d+)?$"],
+                     {"read_only": ["show .*"], "diag": ["ping \\S+$"]},
+                     {"core": ["diag"]})
+    return policy
+
+
+def test_patterns_keep_match_semantic():
+    matcher = CommandMatcher(["show system$", "show vlan"])
+    assert matcher.is_allowed("show system")
+    assert matcher.is_allowed("show vlan 10")
+    assert not matcher.is_allowed("xshow system") # anchored at the start
+    assert not matcher.is_allowed("show system; reload") # the $ of one pattern is not lost in the alternation
+
+
+def test_patterns_which_cant_be_combined_are_matched_one_by_one():
+    matcher = CommandMatcher(["show vlan", "(?i)show system"])
+    assert matcher.is_allowed("SHOW SYSTEM")
+    assert not matcher.is_allowed("SHOW VLAN")
+
+
+def test_empty_allowlist_allows_nothing():
+    assert not CommandMatcher([]).is_allowed("show system")
+
+
+def test_device_without_profile_uses_default():
+    policy = make_policy()
+    device = make_device("sw1")
+    assert policy.is_allowed("show vlan 10", device)
+    assert not policy.is_allowed("show chassis", device)
+    assert policy.is_allowed("show system") # no device: default profile
+
+
+def test_device_and_tag_profiles_are_combined():
+    policy = make_policy()
+    device = make_device("sw1", command_profiles=["read_only"], tags=["core"])
+    assert policy.profiles_for(device) == ("read_only", "diag")
+    assert policy.is_allowed("show chassis", device)
+    assert policy.is_allowed("ping 10.0.0.1", device)
+    assert not policy.is_allowed("show system", make_device("sw2", tags=["core"])) # only diag
+
+
+def test_unknown_profile_is_ignored():
+    policy = make_policy()
+    assert policy.profiles_for(make_device("sw1", command_profiles=["missing"])) == ("default",)
+
+
+def test_updated_device_gets_a_new_matcher():
+    policy = make_policy()
+    assert not policy.is_allowed("show chassis", make_device("sw1"))
+    assert policy.is_allowed("show chassis", make_device("sw1", command_profiles=["read_only"]))
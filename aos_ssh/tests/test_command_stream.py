@@ -0,0 +1,89 @@
+import asyncio
+import gc
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from ale_aos_ssh import server
+from ale_aos_ssh.device_scheduler import device_scheduler
+from mock_aos_server import command_output
+
+from conftest import make_device
+
+
+@pytest.fixture
+def client(mock_switches, ssh_sessions, empty_inventory, monkeypatch):
+    empty_inventory.set_device(make_device(mock_switches.hosts[0], port=mock_switches.port))
+    monkeypatch.setattr(server, "check_command", lambda command, device=None: True)
+    return TestClient(server.app)
+
+
+def fake_stream(monkeypatch, ssh_sessions, items, started=None):
+    """Replaces the ssh stream by `items`, an exception item is raised. Returns the cancel events received."""
+    cancels = []
+
+    def stream_command(host, command, jump_name=None, cancel=None):
+        cancels.append(cancel)
+        for item in items:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+            if started is not None:
+                started.set()
+                cancel.wait(5)
+    monkeypatch.setattr(ssh_sessions, "stream_command", stream_command)
+    return cancels
+
+
+def test_stream_lines_then_exit_status(client, mock_switches):
+    host = mock_switches.hosts[0]
+    r = client.post("/command/stream", json={"host": host, "command": "show vlan"})
+    assert r.headers["content-type"] == "application/x-ndjson"
+    items = [json.loads(line) for line in r.text.splitlines()]
+    assert [item["line"] for item in items[:-1]] == command_output("show vlan", 5).split("\r\n")
+    assert items[-1] == {"exit_status": 0}
+    assert host not in device_scheduler._queues
+
+
+def test_stream_error_is_sent_and_the_slot_released(client, mock_switches, ssh_sessions, monkeypatch):
+    host = mock_switches.hosts[0]
+    fake_stream(monkeypatch, ssh_sessions, [("line", "first"), OSError("channel closed")])
+    r = client.post("/command/stream", json={"host": host, "command": "ping 10.0.0.1"})
+    assert [json.loads(line) for line in r.text.splitlines()] == [{"line": "first"}, {"error": "channel closed"}]
+    assert host not in device_scheduler._queues
+
+
+def stream_request(host: str, command: str):
+    """Calls the endpoint directly, without the TestClient which reads the whole response."""
+    request = Request({"type": "http", "headers": [], "client": ("127.0.0.1", 1)})
+    return server.execute_command_stream(server.Command(host=host, command=command), request)
+
+
+def test_client_disconnect_cancels_the_command(client, mock_switches, ssh_sessions, monkeypatch):
+    host = mock_switches.hosts[0]
+    started = threading.Event()
+    cancels = fake_stream(monkeypatch, ssh_sessions, [("line", "64 bytes from 10.0.0.1")], started)
+
+    async def read_first_line():
+        response = await stream_request(host, "ping 10.0.0.1")
+        line = await response.body_iterator.__anext__()
+        assert host in device_scheduler._queues
+        await response.body_iterator.aclose() # what starlette does when the client disconnects
+        return line
+
+    assert json.loads(asyncio.run(read_first_line())) == {"line": "64 bytes from 10.0.0.1"}
+    assert cancels[0].is_set()
+    assert host not in device_scheduler._queues
+
+
+def test_slot_released_when_the_response_is_never_sent(client, mock_switches, ssh_sessions, monkeypatch):
+    host = mock_switches.hosts[0]
+    fake_stream(monkeypatch, ssh_sessions, [("line", "never read")])
+    response = asyncio.run(stream_request(host, "ping 10.0.0.1"))
+    assert host in device_scheduler._queues
+    del response
+    gc.collect()
+    assert host not in device_scheduler._queues
@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from ale_aos_ssh import server
+from ale_aos_ssh.device_scheduler import DeviceBusy, DeviceScheduler
+
+from conftest import make_device
+
+
+def make_scheduler(**config) -> DeviceScheduler:
+    scheduler = DeviceScheduler()
+    scheduler.configure({"max_running_per_device": 1, "max_queued_per_device": 8, "max_waiting": 8,
+                         "queue_timeout": 5, **config})
+    return scheduler
+
+
+def run_queued(scheduler: DeviceScheduler, requests: list[tuple[str, str]]) -> list[str]:
+    """Queues (priority, caller) requests behind a running one, returns the callers in the order they ran."""
+    order = []
+    hold = scheduler.slot("sw1", "interactive", "holder")
+    hold.__enter__()
+    threads = []
+    for priority, caller in requests:
+        def run(priority=priority, caller=caller):
+            with scheduler.slot("sw1", priority, caller):
+                order.append(caller)
+        thread = threading.Thread(target=run)
+        thread.start()
+        threads.append(thread)
+        while scheduler._waiting < len(threads):
+            time.sleep(0.001)
+    hold.__exit__(None, None, None)
+    for thread in threads:
+        thread.join()
+    return order
+
+
+def test_higher_priority_runs_first():
+    scheduler = make_scheduler()
+    order = run_queued(scheduler, [("background", "backup"), ("bulk", "report"), ("interactive", "user")])
+    assert order == ["user", "report", "backup"]
+    assert scheduler._queues == {} and scheduler._waiting == 0
+
+
+def test_callers_take_turns_within_a_priority():
+    scheduler = make_scheduler()
+    order = run_queued(scheduler, [("bulk", "a"), ("bulk", "a"), ("bulk", "a"), ("bulk", "b")])
+    assert order == ["a", "b", "a", "a"]
+
+
+def test_devices_are_scheduled_independently():
+    scheduler = make_scheduler(max_queued_per_device=0)
+    with scheduler.slot("sw1"):
+        with scheduler.slot("sw2"):
+            pass
+
+
+def test_full_device_queue_is_rejected():
+    scheduler = make_scheduler(max_queued_per_device=0)
+    with scheduler.slot("sw1"):
+        with pytest.raises(DeviceBusy) as e:
+            with scheduler.slot("sw1"):
+                pass
+    assert "queue full" in str(e.value)
+    assert e.value.retry_after >= 1
+    assert scheduler._queues == {}
+
+
+def test_waiting_requests_are_bounded_over_all_devices():
+    scheduler = make_scheduler(max_waiting=1, queue_timeout=0.2)
+    with scheduler.slot("sw1"), scheduler.slot("sw2"):
+        waiter = threading.Thread(target=lambda: pytest.raises(DeviceBusy, scheduler._acquire, "sw1", "bulk", ""))
+        waiter.start()
+        while scheduler._waiting == 0:
+            time.sleep(0.001)
+        with pytest.raises(DeviceBusy) as e:
+            with scheduler.slot("sw2"):
+                pass
+        assert "server full" in str(e.value)
+        waiter.join()
+
+
+def test_queue_timeout():
+    scheduler = make_scheduler(queue_timeout=0.05)
+    with scheduler.slot("sw1"):
+        with pytest.raises(DeviceBusy) as e:
+            with scheduler.slot("sw1", "bulk"):
+                pass
+        assert scheduler.queued() == {("interactive",): 0, ("bulk",): 0, ("background",): 0}
+    assert "queued more than" in str(e.value)
+    assert scheduler._queues == {} and scheduler._waiting == 0
+
+
+def test_busy_device_is_answered_with_429_and_retry_after(empty_inventory, monkeypatch):
+    empty_inventory.set_device(make_device("sw1"))
+    scheduler = make_scheduler(max_queued_per_device=0)
+    monkeypatch.setattr(server, "device_scheduler", scheduler)
+    monkeypatch.setattr(server, "check_command", lambda command, device=None: True)
+    with scheduler.slot("sw1"):
+        response = TestClient(server.app).post("/command", json={"host": "sw1", "command": "show system", "no_cache": True},
+                                               headers={"X-Aos-Caller": "test"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert "sw1 busy" in response.json()["detail"]
@@ -0,0 +1,129 @@
+import errno
+import json
+import os
+
+import pytest
+
+from ale_aos_ssh.device_manager import JumpHost
+from ale_aos_ssh.host_store import HostStore
+
+from conftest import make_device
+
+
+@pytest.fixture
+def host_file(tmp_path):
+    path = tmp_path / "aos-ssh-hosts.json"
+    path.write_text(json.dumps({"hosts": [{"host": "sw1", "user": "admin", "password": "switch"}]}))
+    return str(path)
+
+
+def saved_hosts(path: str) -> list[str]:
+    with open(path) as f:
+        return [device["host"] for device in json.load(f)["hosts"]]
+
+
+def test_changes_are_journaled_then_compacted(host_file, empty_inventory):
+    store = HostStore()
+    store.load(host_file)
+    assert store.set_devices([make_device("sw2"), make_device("sw1", port=2222)]) == (1, 1)
+    store.remove_device("sw1")
+    assert store.pending == 3
+    assert saved_hosts(host_file) == ["sw1"] # not compacted yet
+    store.compact()
+    assert saved_hosts(host_file) == ["sw2"]
+    assert os.path.getsize(host_file + ".journal") == 0
+    assert store.pending == 0
+
+
+def test_journal_is_replayed_at_startup(host_file, empty_inventory):
+    store = HostStore()
+    store.load(host_file)
+    store.set_devices([make_device("sw2")], [JumpHost.parse({"name": "bastion", "public_host": "10.0.0.1",
+                                                             "user": "admin", "password": "secret"})])
+    store.remove_device("sw1")
+    store.journal.close() # the process crashed before compacting
+
+    empty_inventory.__init__()
+    HostStore().load(host_file)
+    assert list(empty_inventory.devices) == ["sw2"]
+    assert list(empty_inventory.jump_hosts) == ["bastion"]
+    assert saved_hosts(host_file) == ["sw2"]
+    assert os.path.getsize(host_file + ".journal") == 0
+
+
+def test_truncated_journal_entry_is_ignored(host_file, empty_inventory):
+    with open(host_file + ".journal", "w") as f:
+        f.write(json.dumps({"op": "remove_device", "host": "sw1"}) + "\n")
+        f.write('{"op": "set_device", "dev')
+    HostStore().load(host_file)
+    assert list(empty_inventory.devices) == []
+
+
+def test_host_file_is_rewritten_in_place_when_it_cant_be_replaced(host_file, empty_inventory, monkeypatch):
+    store = HostStore()
+    store.load(host_file)
+    store.set_devices([make_device("sw2")])
+    inode = os.stat(host_file).st_ino
+
+    def busy(src, dst):
+        if dst == host_file:
+            raise OSError(errno.EBUSY, "Device or resource busy")
+        os.rename(src, dst)
+
+    monkeypatch.setattr(os, "replace", busy)
+    store.compact()
+    assert os.stat(host_file).st_ino == inode
+    assert saved_hosts(host_file) == ["sw1", "sw2"]
+    assert not os.path.exists(host_file + ".compact")
+    assert os.path.getsize(host_file + ".journal") == 0
+    assert [name for name in os.listdir(os.path.dirname(host_file)) if name.endswith(".tmp")] == []
+
+
+def test_compact_file_left_by_an_interrupted_rewrite_is_loaded(host_file, empty_inventory):
+    with open(host_file + ".compact", "w") as f:
+        json.dump({"hosts": [{"host": "sw1", "user": "admin", "password": "switch"},
+                             {"host": "sw2", "user": "admin", "password": "switch"}]}, f)
+    with open(host_file, "w"):
+        pass # truncated when the process died
+    HostStore().load(host_file)
+    assert sorted(empty_inventory.devices) == ["sw1", "sw2"]
+    assert saved_hosts(host_file) == ["sw1", "sw2"]
+    assert not os.path.exists(host_file + ".compact")
+
+
+def test_reload_applies_changes_made_by_others(host_file, empty_inventory):
+    store = HostStore()
+    store.load(host_file)
+    store.set_devices([make_device("sw2")])
+    store.compact()
+    assert not store.changed_on_disk()
+
+    with open(host_file, "w") as f:
+        json.dump({"hosts": [{"host": "sw1", "user": "admin", "password": "changed"},
+                             {"host": "sw3", "user": "admin", "password": "switch"}]}, f)
+    os.utime(host_file, ns=(0, 0)) # the modification time differs even on coarse clocks
+    assert store.changed_on_disk()
+    stale_devices, stale_jump_hosts = store.reload()
+    assert sorted(device.host for device in stale_devices) == ["sw1", "sw2"]
+    assert stale_jump_hosts == []
+    assert sorted(empty_inventory.devices) == ["sw1", "sw3"]
+    assert not store.changed_on_disk()
+
+
+def test_read_only_store_never_writes(host_file, empty_inventory):
+    store = HostStore()
+    store.read_only = True
+    store.load(host_file)
+    store.set_devices([make_device("sw2")])
+    store.flush()
+    assert not os.path.exists(host_file + ".journal")
+    assert saved_hosts(host_file) == ["sw1"]
+
+
+def test_flush_compacts_pending_changes(host_file, empty_inventory):
+    store = HostStore()
+    store.load(host_file)
+    store.set_devices([make_device("sw2")])
+    store.flush()
+    assert saved_hosts(host_file) == ["sw1", "sw2"]
+    assert store.pending == 0
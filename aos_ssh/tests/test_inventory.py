@@ -0,0 +1,64 @@
+from fastapi.testclient import TestClient
+
+from ale_aos_ssh import server
+from ale_aos_ssh.device_manager import Inventory, JumpHost
+
+from conftest import make_device
+
+
+def make_inventory() -> Inventory:
+    inventory = Inventory()
+    inventory.set_device(make_device("sw1", tags=["core", "paris"]))
+    inventory.set_device(make_device("sw2", tags=["edge", "paris"]))
+    inventory.set_device(make_device("sw3", tags=["edge"]))
+    return inventory
+
+
+def test_select_by_tags():
+    inventory = make_inventory()
+    assert [device.host for device in inventory.select()] == ["sw1", "sw2", "sw3"]
+    assert [device.host for device in inventory.select(["edge"])] == ["sw2", "sw3"]
+    assert [device.host for device in inventory.select(["core", "paris"])] == ["sw1", "sw2"]
+    assert inventory.select(["unknown"]) == []
+
+
+def test_replace_and_remove_update_the_tag_index():
+    inventory = make_inventory()
+    previous = inventory.set_device(make_device("sw1", tags=["edge"]))
+    assert previous.tags == ["core", "paris"]
+    assert "core" not in inventory.tag_index
+    assert [device.host for device in inventory.select(["paris"])] == ["sw2"]
+    assert [device.host for device in inventory.select(["edge"])] == ["sw2", "sw3", "sw1"]
+
+    assert inventory.remove_device("sw3").host == "sw3"
+    assert inventory.remove_device("sw3") is None
+    assert inventory.get_device("sw3") is None
+    assert [device.host for device in inventory.select(["edge"])] == ["sw2", "sw1"]
+    assert len(inventory) == 2
+
+
+def test_list_page():
+    inventory = make_inventory()
+    assert inventory.list_page(["core", "edge"], offset=1, limit=1) == (3, [{"host": "sw2", "tags": ["edge", "paris"]}])
+    assert inventory.list_page(offset=2) == (3, [{"host": "sw3", "tags": ["edge"]}])
+
+
+def test_jump_hosts_by_name():
+    inventory = Inventory()
+    jump = JumpHost.parse({"name": "bastion", "public_host": "1.2.3.4", "private_host": "10.0.0.1",
+                           "user": "admin", "password": "switch"})
+    inventory.set_jump_host(jump)
+    assert inventory.get_jump_host("bastion") is jump
+    assert jump.public_port == 22 and jump.private_port == 22
+    assert inventory.remove_jump_host("bastion") is jump
+    assert inventory.get_jump_host("bastion") is None
+
+
+def test_devices_endpoint_pages_with_total_count(empty_inventory):
+    for i in range(5):
+        empty_inventory.set_device(make_device(f"sw{i}", tags=["edge"] if i % 2 else ["core"]))
+    client = TestClient(server.app)
+    r = client.get("/devices", params={"tags": "core", "offset": 1, "limit": 1})
+    assert r.headers["X-Total-Count"] == "3"
+    assert r.json() == [{"host": "sw2", "tags": ["core"]}]
+    assert [device["host"] for device in client.get("/devices").json()] == [f"sw{i}" for i in range(5)]
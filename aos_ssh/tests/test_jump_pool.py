@@ -0,0 +1,56 @@
+import pytest
+
+from ale_aos_ssh.device_manager import JumpHost
+
+from conftest import make_device
+
+
+@pytest.fixture
+def jump_devices(mock_switches, ssh_sessions, empty_inventory):
+    empty_inventory.set_jump_host(JumpHost.parse({
+        "name": "bastion", "public_host": "127.0.0.1", "public_port": mock_switches.jump_port,
+        "private_host": "127.0.0.1", "user": "admin", "password": "switch", "transport_pool_size": 2}))
+    devices = [make_device(host, port=mock_switches.port, jump_ssh_name="bastion") for host in mock_switches.hosts]
+    for device in devices:
+        empty_inventory.set_device(device)
+    return devices
+
+
+def jump_key_of(ssh_sessions, device):
+    return ssh_sessions.active_ssh_sessions[(device.host, False, "bastion")]["jump_key"]
+
+
+def test_sessions_are_spread_over_the_jump_transports(jump_devices, ssh_sessions, empty_inventory):
+    for device in jump_devices:
+        client, error_msg = ssh_sessions.get_session(device)
+        assert client is not None, error_msg
+    assert ssh_sessions.jump_loads(empty_inventory.get_jump_host("bastion")) == {"bastion#0": 2, "bastion#1": 2}
+    # A session keeps its transport while it is alive
+    keys = [jump_key_of(ssh_sessions, device) for device in jump_devices]
+    for device in jump_devices:
+        ssh_sessions.get_session(device)
+    assert [jump_key_of(ssh_sessions, device) for device in jump_devices] == keys
+
+
+def test_closed_session_frees_its_transport_slot(jump_devices, ssh_sessions, empty_inventory):
+    jump = empty_inventory.get_jump_host("bastion")
+    for device in jump_devices[:3]:
+        ssh_sessions.get_session(device)
+    ssh_sessions.close_session(jump_devices[0].host, False, "bastion")
+    ssh_sessions.close_session(jump_devices[2].host, False, "bastion")
+    assert ssh_sessions.jump_loads(jump) == {"bastion#0": 0, "bastion#1": 1}
+    ssh_sessions.get_session(jump_devices[3])
+    assert jump_key_of(ssh_sessions, jump_devices[3]) == ("127.0.0.1", True, "bastion#0")
+
+
+def test_sessions_of_a_dead_transport_are_placed_again(jump_devices, ssh_sessions, empty_inventory):
+    for device in jump_devices:
+        ssh_sessions.get_session(device)
+    dead_key = jump_key_of(ssh_sessions, jump_devices[0])
+    ssh_sessions.active_ssh_sessions[dead_key]["client"].get_transport().close()
+    for device in jump_devices:
+        client, error_msg = ssh_sessions.get_session(device)
+        assert client is not None and client.get_transport().is_active(), error_msg
+        jump_client = ssh_sessions.active_ssh_sessions[jump_key_of(ssh_sessions, device)]["client"]
+        assert jump_client.get_transport().is_active()
+    assert sum(ssh_sessions.jump_loads(empty_inventory.get_jump_host("bastion")).values()) == 4
@@ -0,0 +1,65 @@
+from fastapi.testclient import TestClient
+
+from ale_aos_ssh import metrics as Metrics
+from ale_aos_ssh import server
+from ale_aos_ssh.metrics import Counter, Gauge, Histogram
+
+from conftest import make_device
+
+
+def test_counter_render():
+    counter = Counter("aos_ssh_test_total", "Test counter", ("target",))
+    counter.inc(target="sw1")
+    counter.inc(2, target="sw1")
+    counter.inc(target='sw"2')
+    assert counter.render() == [
+        "# HELP aos_ssh_test_total Test counter",
+        "# TYPE aos_ssh_test_total counter",
+        'aos_ssh_test_total{target="sw1"} 3',
+        'aos_ssh_test_total{target="sw\\"2"} 1',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("aos_ssh_test_seconds", "Test histogram", ("stage",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.7, 5):
+        histogram.observe(value, stage="exec")
+    assert histogram.render()[2:] == [
+        'aos_ssh_test_seconds_bucket{stage="exec",le="0.1"} 1',
+        'aos_ssh_test_seconds_bucket{stage="exec",le="1"} 3',
+        'aos_ssh_test_seconds_bucket{stage="exec",le="+Inf"} 4',
+        'aos_ssh_test_seconds_sum{stage="exec"} 6.25',
+        'aos_ssh_test_seconds_count{stage="exec"} 4',
+    ]
+
+
+def test_failing_gauge_renders_without_values():
+    def fail():
+        raise RuntimeError("no sessions")
+    assert Gauge("aos_ssh_test", "Test gauge", callback=fail).render() == ["# HELP aos_ssh_test Test gauge",
+                                                                           "# TYPE aos_ssh_test gauge"]
+    assert Gauge("aos_ssh_test", "Test gauge", callback=lambda: {(): 2}).render()[2] == "aos_ssh_test 2"
+
+
+def test_target_label(empty_inventory, monkeypatch):
+    monkeypatch.setattr(Metrics, "_label_values", set())
+    monkeypatch.setattr(Metrics, "MAX_LABEL_VALUES", 2)
+    assert Metrics.target_label("sw1") == "sw1"
+    assert Metrics.target_label("sw2", "bastion", is_jump_box=True) == "jump:bastion"
+    assert Metrics.target_label("sw3") == Metrics.OTHER_LABEL
+    assert Metrics.target_label("sw1") == "sw1"
+
+    empty_inventory.set_device(make_device("sw4", tags=["core"]))
+    monkeypatch.setattr(Metrics, "_label_values", set())
+    monkeypatch.setattr(Metrics, "LABEL_BY", "tag")
+    assert Metrics.target_label("sw4") == "core"
+    monkeypatch.setattr(Metrics, "LABEL_BY", "none")
+    assert Metrics.target_label("sw4") == ""
+
+
+def test_metrics_endpoint():
+    r = TestClient(server.app).get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    for metric in Metrics.metrics:
+        assert f"# TYPE {metric.name} {metric.kind}\n" in r.text
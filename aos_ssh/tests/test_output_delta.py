@@ -0,0 +1,41 @@
+from ale_aos_ssh.output_delta import OutputHistory, line_delta
+
+
+def test_same_output_has_no_delta():
+    assert line_delta(["a", "b"], ["a", "b"]) == []
+
+
+def test_changed_fields_of_a_table_row():
+    previous = ["Port  Status  Speed", "1/1/1 up 1000", "1/1/2 up 1000"]
+    current = ["Port  Status  Speed", "1/1/1 down 1000", "1/1/2 up 1000"]
+    assert line_delta(previous, current) == ["~2: 1/1/1 [up->down] 1000"]
+
+
+def test_added_and_removed_rows():
+    previous = ["header", "1/1/1 up", "1/1/2 up"]
+    current = ["header", "1/1/2 up", "1/1/3 up"]
+    assert line_delta(previous, current) == ["-2: 1/1/1 up", "+3: 1/1/3 up"]
+
+
+def test_rewritten_line_is_removed_and_added():
+    assert line_delta(["a b"], ["a b c"]) == ["-1: a b", "+1: a b c"]
+
+
+def test_history_swaps_the_previous_output():
+    history = OutputHistory()
+    assert history.swap("sw1", "show vlan", "v1") is None
+    _, previous = history.swap("sw1", "show  vlan", "v2")
+    assert previous == "v1"
+    assert history.swap("sw2", "show vlan", "v1") is None
+
+
+def test_history_is_bounded():
+    history = OutputHistory(max_entries=2, max_bytes=10)
+    history.swap("sw1", "c", "1")
+    history.swap("sw2", "c", "2")
+    history.swap("sw3", "c", "3")
+    assert history.swap("sw1", "c", "1") is None # least recently used dropped
+    history.swap("sw4", "c", "0123456789")
+    assert history.swap("sw3", "c", "3") is None # dropped to stay under max_bytes
+    history.swap("sw5", "c", "too long output") # not stored
+    assert history.swap("sw5", "c", "x") is None
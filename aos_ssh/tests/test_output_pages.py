@@ -0,0 +1,55 @@
+import re
+
+import pytest
+
+from ale_aos_ssh.output_pages import OutputPages, select_lines
+
+OUTPUT = "\n".join(f"1/1/{port} up" if port % 2 else f"1/1/{port} down" for port in range(1, 11))
+
+
+def test_select_lines_filters_then_slices():
+    assert select_lines(OUTPUT, include="down", exclude="1/1/10") == ["1/1/2 down", "1/1/4 down", "1/1/6 down", "1/1/8 down"]
+    assert select_lines(OUTPUT, include="down", line_start=1, line_end=3) == ["1/1/4 down", "1/1/6 down"]
+    assert select_lines(OUTPUT) == OUTPUT.splitlines()
+
+
+def test_select_lines_raises_on_invalid_regex():
+    with pytest.raises(re.error):
+        select_lines(OUTPUT, include="(")
+
+
+def test_short_output_has_no_cursor():
+    pages = OutputPages()
+    assert pages.first_page(["a", "b"], 2) == (["a", "b"], None)
+
+
+def test_pages_are_read_with_the_cursor():
+    pages = OutputPages()
+    pages.id_prefix = "1_"
+    lines = OUTPUT.splitlines()
+    first, cursor = pages.first_page(lines, 4)
+    assert first == lines[:4]
+    assert cursor.startswith("1_") and cursor.endswith(".4")
+    read = []
+    while cursor:
+        page, cursor, start, total = pages.page(cursor)
+        assert start == len(first) + len(read) and total == 10
+        read += page
+    assert first + read == lines
+
+
+def test_unknown_cursor():
+    pages = OutputPages()
+    assert pages.page("missing.4") is None
+    assert pages.page("not a cursor") is None
+
+
+def test_outputs_expire_and_are_bounded():
+    pages = OutputPages(ttl=0)
+    _, cursor = pages.first_page(["a", "b", "c"], 1)
+    assert pages.page(cursor) is None
+
+    pages = OutputPages(max_entries=2)
+    cursors = [pages.first_page(["a", "b", "c"], 1)[1] for _ in range(3)]
+    assert pages.page(cursors[0]) is None
+    assert pages.page(cursors[2])[0] == ["b"]
@@ -0,0 +1,71 @@
+from ale_aos_ssh.output_parsers import get_parser, parse_output, parse_table
+
+SHOW_VLAN = """
+ vlan    type   admin   oper    ip    mtu          name
+------+-------+-------+------+------+------+------------------
+1       std      Ena     Ena    Ena   1500    VLAN 1
+100     std      Ena     Dis    Dis   1500    users
+"""
+
+SHOW_VLAN_MEMBERS = """
+Legend: * = Forward, B = Block
+
+                                  Port
+ vlan        port       type     status
+---------+-----------+---------+--------
+ 1          1/1/1      default   forwarding
+"""
+
+SHOW_SYSTEM = """System:
+  Description:  Alcatel-Lucent Enterprise OS6860E-24 8.9.94.R04 GA, June 14, 2023.,
+  Name:         sw1,
+  Date & Time: THU MAR 07 2024 09:31:54 (CET)
+"""
+
+SHOW_INTERFACES = """Chassis/Slot/Port  : 1/1/1
+ Operational Status     : up,
+ Bytes Received  :  7467420, Unicast Frames :  21354,
+Chassis/Slot/Port  : 1/1/2
+ Operational Status     : down,
+"""
+
+
+def test_table_columns_and_rows():
+    assert parse_output("show vlan", SHOW_VLAN) == {
+        "columns": ["vlan", "type", "admin", "oper", "ip", "mtu", "name"],
+        "rows": [
+            ["1", "std", "Ena", "Ena", "Ena", "1500", "VLAN 1"],
+            ["100", "std", "Ena", "Dis", "Dis", "1500", "users"],
+        ],
+        "summary": [],
+    }
+
+
+def test_table_multi_line_headers_and_summary():
+    table = parse_table(SHOW_VLAN_MEMBERS)
+    assert table["columns"] == ["vlan", "port", "type", "port_status"]
+    assert table["rows"] == [["1", "1/1/1", "default", "forwarding"]]
+    assert table["summary"] == ["Legend: * = Forward, B = Block"]
+
+
+def test_key_values():
+    result = parse_output("show system", SHOW_SYSTEM)
+    assert result["name"] == "sw1"
+    assert result["description"].startswith("Alcatel-Lucent Enterprise OS6860E-24")
+    assert result["date_time"] == "THU MAR 07 2024 09:31:54 (CET)"
+
+
+def test_interfaces():
+    assert parse_output("show interfaces", SHOW_INTERFACES) == [
+        {"chassis_slot_port": "1/1/1", "operational_status": "up", "bytes_received": "7467420", "unicast_frames": "21354"},
+        {"chassis_slot_port": "1/1/2", "operational_status": "down"},
+    ]
+
+
+def test_parser_lookup():
+    assert get_parser("show  vlan   10") is parse_table
+    assert get_parser("show vlan 10 members port 1/1/1") is parse_table
+    assert get_parser("show configuration snapshot") is None
+    assert parse_output("show configuration snapshot", SHOW_VLAN) is None
+    assert parse_output("show vlan", None) is None
+    assert parse_output("show vlan", "no table here") is None
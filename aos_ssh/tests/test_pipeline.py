@@ -0,0 +1,45 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from ale_aos_ssh import server
+from mock_aos_server import command_output
+
+from conftest import make_device
+
+
+@pytest.fixture
+def client(mock_switches, ssh_sessions, empty_inventory, monkeypatch):
+    empty_inventory.set_device(make_device(mock_switches.hosts[0], port=mock_switches.port))
+    empty_inventory.set_device(make_device(mock_switches.hosts[1], port=mock_switches.port, password="wrong"))
+    monkeypatch.setattr(server, "check_command", lambda command, device=None: not command.startswith("reload"))
+    return TestClient(server.app)
+
+
+def test_commands_run_in_order_with_their_latency(client, mock_switches):
+    commands = ["show system", "show chassis", "show hardware-info"]
+    r = client.post("/commands/pipeline", json={"host": mock_switches.hosts[0], "commands": commands})
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert [result["command"] for result in results] == commands
+    assert [result["stdout"] for result in results] == [command_output(command, 5).strip() for command in commands]
+    assert all(result["duration_ms"] > 0 for result in results)
+    assert r.json()["duration_ms"] >= sum(result["duration_ms"] for result in results)
+
+
+def test_nothing_runs_when_one_command_is_not_allowed(client, mock_switches):
+    commands = mock_switches.switches.commands
+    r = client.post("/commands/pipeline", json={"host": mock_switches.hosts[0], "commands": ["show system", "reload all"]})
+    assert r.status_code == 403
+    assert "reload all" in r.json()["detail"]
+    assert mock_switches.switches.commands == commands
+
+
+def test_nothing_runs_without_session(client, mock_switches):
+    r = client.post("/commands/pipeline", json={"host": mock_switches.hosts[1], "commands": ["show system"]})
+    assert r.status_code == 404
+    assert "Authentication failed" in r.json()["detail"]
+
+
+def test_invalid_pipelines(client, mock_switches):
+    assert client.post("/commands/pipeline", json={"host": mock_switches.hosts[0], "commands": []}).status_code == 400
+    assert client.post("/commands/pipeline", json={"host": "unknown", "commands": ["show system"]}).status_code == 404
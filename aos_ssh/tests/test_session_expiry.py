@@ -0,0 +1,75 @@
+import datetime
+import time
+
+import pytest
+
+from ale_aos_ssh import metrics as Metrics
+
+from conftest import make_device
+
+
+@pytest.fixture
+def devices(mock_switches, ssh_sessions, empty_inventory):
+    devices = [make_device(host, port=mock_switches.port) for host in mock_switches.hosts]
+    for device in devices:
+        empty_inventory.set_device(device)
+    return devices
+
+
+def session_of(ssh_sessions, device):
+    return ssh_sessions.active_ssh_sessions.get((device.host, False, None))
+
+
+def evictions() -> float:
+    return Metrics.EVICTIONS._values.get((), 0)
+
+
+def test_least_recently_used_idle_session_is_evicted(devices, ssh_sessions, monkeypatch):
+    monkeypatch.setattr(ssh_sessions, "MAX_OPEN_SESSIONS", 2)
+    before = evictions()
+    ssh_sessions.get_session(devices[0])
+    ssh_sessions.get_session(devices[1])
+    ssh_sessions.get_session(devices[0]) # devices[1] becomes the least recently used
+    ssh_sessions.get_session(devices[2])
+    assert session_of(ssh_sessions, devices[1]) is None
+    assert list(ssh_sessions._lru_sessions) == [(devices[0].host, False, None), (devices[2].host, False, None)]
+    assert evictions() == before + 1
+
+
+def test_pinned_and_busy_sessions_are_not_evicted(devices, ssh_sessions, monkeypatch):
+    monkeypatch.setattr(ssh_sessions, "MAX_OPEN_SESSIONS", 2)
+    ssh_sessions.get_session(devices[0])
+    ssh_sessions.get_session(devices[1])
+    ssh_sessions.pin_session(devices[0])
+    channels = session_of(ssh_sessions, devices[1])["channels"]
+    channels.acquire(0)
+    ssh_sessions.get_session(devices[2]) # over the limit rather than closing a session in use
+    assert all(session_of(ssh_sessions, device) is not None for device in devices[:3])
+    channels.release()
+    ssh_sessions.get_session(devices[3])
+    assert session_of(ssh_sessions, devices[1]) is None
+    assert session_of(ssh_sessions, devices[0]) is not None
+
+
+def test_expire_closes_inactive_sessions_and_reschedules_active_ones(devices, ssh_sessions, monkeypatch):
+    monkeypatch.setattr(ssh_sessions, "INACTIVITY_TIMEOUT", 60)
+    for device in devices[:3]:
+        ssh_sessions.get_session(device)
+    # One heap entry per session, in deadline order
+    assert sorted(entry[2] for entry in ssh_sessions._expiry_heap) == sorted((d.host, False, None) for d in devices[:3])
+    ssh_sessions._expiry_heap.clear()
+    for session_info in ssh_sessions.active_ssh_sessions.values():
+        session_info["expiry_scheduled"] = False
+
+    idle, active, pinned = (session_of(ssh_sessions, device) for device in devices[:3])
+    idle["last_activity_time"] = datetime.datetime.now() - datetime.timedelta(seconds=120)
+    pinned["last_activity_time"] = datetime.datetime.now() - datetime.timedelta(seconds=120)
+    ssh_sessions.pin_session(devices[2])
+    for session_info in (idle, active, pinned):
+        ssh_sessions._expire(session_info)
+
+    assert session_of(ssh_sessions, devices[0]) is None
+    deadlines = {entry[2][0]: entry[0] for entry in ssh_sessions._expiry_heap}
+    assert sorted(deadlines) == sorted([devices[1].host, devices[2].host])
+    assert deadlines[devices[1].host] == pytest.approx(active["last_activity_time"].timestamp() + 60, abs=1)
+    assert deadlines[devices[2].host] == pytest.approx(time.time() + 60, abs=1)
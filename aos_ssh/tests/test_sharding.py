@@ -0,0 +1,34 @@
+import zlib
+
+from ale_aos_ssh import sharding
+
+
+def test_single_process_owns_every_host():
+    sharding.configure(1)
+    assert sharding.owns("sw1")
+    assert sharding.is_writer()
+
+
+def test_hosts_are_spread_over_the_workers_with_a_stable_hash():
+    hosts = [f"10.0.{i // 256}.{i % 256}" for i in range(1000)]
+    assignments = [sharding.worker_for(host, 4) for host in hosts]
+    assert assignments == [zlib.crc32(host.encode()) % 4 for host in hosts]
+    assert all(150 < assignments.count(worker) < 350 for worker in range(4))
+
+
+def test_each_host_is_owned_by_one_worker():
+    hosts = [f"sw{i}" for i in range(100)]
+    owners = {host: [] for host in hosts}
+    for worker_index in range(3):
+        sharding.configure(3, worker_index)
+        for host in hosts:
+            if sharding.owns(host):
+                owners[host].append(worker_index)
+    assert all(len(workers) == 1 for workers in owners.values())
+
+
+def test_only_the_first_worker_writes():
+    sharding.configure(3, 0)
+    assert sharding.is_writer()
+    sharding.configure(3, 1)
+    assert not sharding.is_writer()
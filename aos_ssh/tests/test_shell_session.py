@@ -0,0 +1,64 @@
+import paramiko
+import pytest
+from fastapi.testclient import TestClient
+
+from ale_aos_ssh import server
+from ale_aos_ssh.shell_session import PersistentShell, ShellPromptTimeout
+from mock_aos_server import command_output
+
+from conftest import make_device
+
+
+def shell_output(command: str) -> str:
+    return command_output(command, 5).replace("\r", "").strip()
+
+
+@pytest.fixture
+def ssh_client(mock_switches):
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    client.connect(mock_switches.hosts[0], port=mock_switches.port, username="admin", password="switch")
+    yield client
+    client.close()
+
+
+def test_each_command_gets_its_own_output(ssh_client):
+    shell = PersistentShell(ssh_client, r"\S*-> ?$", "no more", timeout=5)
+    shell.open()
+    assert shell.prompt == "mock-aos-> "
+    for command in ("show system", "show chassis", "show system", "show vlan"):
+        assert shell.run(command, 5) == shell_output(command)
+    shell.close()
+
+
+def test_open_fails_without_prompt(ssh_client):
+    shell = PersistentShell(ssh_client, r"^Console>$", timeout=1)
+    with pytest.raises(ShellPromptTimeout):
+        shell.open()
+    shell.close()
+
+
+@pytest.fixture
+def client(mock_switches, ssh_sessions, empty_inventory, monkeypatch):
+    empty_inventory.set_device(make_device(mock_switches.hosts[0], port=mock_switches.port, exec_mode="shell"))
+    monkeypatch.setattr(server, "check_command", lambda command, device=None: True)
+    return TestClient(server.app)
+
+
+def test_shell_mode_commands(client, mock_switches, ssh_sessions):
+    host = mock_switches.hosts[0]
+    for command in ("show vlan", "show system"):
+        r = client.post("/command", json={"host": host, "command": command, "no_cache": True})
+        assert r.json()["stdout"] == shell_output(command)
+    r = client.post("/command", json={"host": host, "command": "show vlan", "no_cache": True, "format": "structured"})
+    assert r.json()["structured"] is not None
+    assert ssh_sessions.active_ssh_sessions[(host, False, None)]["shell"] is not None
+
+
+def test_shell_mode_falls_back_to_exec_without_prompt(client, mock_switches, ssh_sessions, monkeypatch):
+    monkeypatch.setattr(ssh_sessions, "SHELL_PROMPT", r"^Console>$")
+    monkeypatch.setattr(ssh_sessions, "SHELL_OPEN_TIMEOUT", 1)
+    host = mock_switches.hosts[0]
+    r = client.post("/command", json={"host": host, "command": "show system", "no_cache": True})
+    assert r.json()["stdout"] == command_output("show system", 5).strip()
+    assert ssh_sessions.active_ssh_sessions[(host, False, None)]["shell"] is None
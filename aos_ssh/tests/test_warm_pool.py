@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from ale_aos_ssh import sharding
+from ale_aos_ssh import warm_pool as WarmPool
+
+from conftest import make_device
+
+
+@pytest.fixture
+def warm_inventory(mock_switches, ssh_sessions, empty_inventory, monkeypatch):
+    monkeypatch.setattr(WarmPool, "WARM_TAGS", ["core"])
+    hosts = mock_switches.hosts
+    empty_inventory.set_device(make_device(hosts[0], port=mock_switches.port, tags=["core"]))
+    empty_inventory.set_device(make_device(hosts[1], port=mock_switches.port, tags=["core"], password="wrong"))
+    empty_inventory.set_device(make_device(hosts[2], port=mock_switches.port, tags=["edge"]))
+    return empty_inventory
+
+
+def test_warm_devices_are_selected_by_tag_and_shard(warm_inventory, mock_switches, monkeypatch):
+    assert [device.host for device in WarmPool.warm_devices()] == mock_switches.hosts[:2]
+    monkeypatch.setattr(sharding, "owns", lambda host: host != mock_switches.hosts[0])
+    assert [device.host for device in WarmPool.warm_devices()] == mock_switches.hosts[1:2]
+    monkeypatch.setattr(WarmPool, "WARM_TAGS", [])
+    assert WarmPool.warm_devices() == []
+
+
+def test_open_sessions_pins_the_opened_sessions(warm_inventory, mock_switches, ssh_sessions):
+    assert WarmPool.open_sessions(WarmPool.warm_devices()) == 1
+    session_info = ssh_sessions.active_ssh_sessions[(mock_switches.hosts[0], False, None)]
+    assert session_info["pinned"] and session_info["healthy"]
+    assert not ssh_sessions.active_ssh_sessions.get((mock_switches.hosts[1], False, None), {}).get("client")
+    assert (mock_switches.hosts[2], False, None) not in ssh_sessions.active_ssh_sessions
+
+
+def test_health_check_reconnects_broken_warm_sessions(warm_inventory, mock_switches, ssh_sessions):
+    WarmPool.open_sessions(WarmPool.warm_devices())
+    session_info = ssh_sessions.active_ssh_sessions[(mock_switches.hosts[0], False, None)]
+    client = session_info["client"]
+    checked_at = session_info["health_checked_at"]
+    time.sleep(0.01)
+    WarmPool.health_check()
+    assert session_info["client"] is client and session_info["healthy"]
+    assert session_info["health_checked_at"] > checked_at
+
+    client.get_transport().close()
+    WarmPool.health_check()
+    assert session_info["client"] is not client
+    assert session_info["healthy"] and session_info["client"].get_transport().is_active()
+
+
+def test_fresh_health_flag_skips_the_inline_probe(warm_inventory, mock_switches, ssh_sessions, monkeypatch):
+    WarmPool.open_sessions(WarmPool.warm_devices())
+    session_info = ssh_sessions.active_ssh_sessions[(mock_switches.hosts[0], False, None)]
+    assert not ssh_sessions.is_health_fresh(session_info) # background health check disabled
+    monkeypatch.setattr(ssh_sessions, "HEALTH_CHECK_INTERVAL", 30)
+    assert ssh_sessions.is_health_fresh(session_info)
+    session_info["health_checked_at"] -= 60
+    assert not ssh_sessions.is_health_fresh(session_info)